@@ -13,7 +13,8 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 
-from app.services.comic_composer import add_dialogues_to_image
+from app.services.comic_composer import add_dialogues_to_image_async
+from app.services.render_pool import render_pool, RenderQueueFull
 
 # 创建路由器
 router = APIRouter(prefix="/api/v1/dialogue", tags=["Dialogue Composer"])
@@ -56,8 +57,8 @@ async def compose_dialogue(req: DialogueComposerRequest):
     print(f"   对话数量: {len(req.dialogues)}")
     
     try:
-        # 调用对话框合成服务
-        result_image = add_dialogues_to_image(
+        # 调用对话框合成服务（在渲染进程池中执行，不阻塞事件循环）
+        result_image = await add_dialogues_to_image_async(
             image_base64=req.image_base64,
             dialogues=req.dialogues,
             camera_angle=req.camera_angle
@@ -72,6 +73,9 @@ async def compose_dialogue(req: DialogueComposerRequest):
             "message": f"成功添加 {len(req.dialogues)} 个对话框"
         }
         
+    except RenderQueueFull as e:
+        print(f"⚠️(API) 渲染队列已满: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"❌(API) 对话框合成失败: {e}")
         import traceback
@@ -79,6 +83,12 @@ async def compose_dialogue(req: DialogueComposerRequest):
         raise HTTPException(status_code=500, detail=f"对话框合成失败: {str(e)}")
 
 
+@router.get("/metrics")
+async def render_metrics():
+    """渲染进程池指标：队列深度、执行中任务数、平均/最大渲染时间等"""
+    return {"ok": True, "render_pool": render_pool.stats()}
+
+
 @router.get("/health")
 async def health_check():
     """健康检查"""
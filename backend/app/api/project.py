@@ -25,9 +25,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 
 # 导入数据库层
 from app.db import (
-    db_client, create_project, get_projects_by_user,
-    get_project_by_id, get_public_projects, delete_project,
-    update_character, update_source_text,
+    db_client, create_project, get_projects_by_user, get_project_summaries_by_user,
+    get_project_by_id, get_public_projects_page, delete_project,
+    update_character, update_source_text, get_project_chapter_summaries,
     ProjectVisibility
 )
 
@@ -157,7 +157,7 @@ async def get_projects_rest(user_id: str = None):
     功能说明：
     - 使用RESTful GET /api/v1/projects 接口获取项目列表
     - 返回用户的所有项目
-    - 包含项目的基本信息和统计
+    - 包含项目的基本信息和统计（只查询列表需要的列，不返回风格提示词）
     
     参数：
         user_id: 用户ID（从查询参数中获取）
@@ -175,8 +175,8 @@ async def get_projects_rest(user_id: str = None):
         raise HTTPException(status_code=500, detail="数据库未连接")
     
     try:
-        # 查询用户项目
-        projects = await get_projects_by_user(user_id)
+        # 查询用户项目（列表视图只需要基本信息）
+        projects = await get_project_summaries_by_user(user_id)
         
         # 转换为响应格式
         project_list = []
@@ -198,7 +198,6 @@ async def get_projects_rest(user_id: str = None):
                 "title": project.title,
                 "description": project.description,
                 "upload_method": project.upload_method,
-                "default_style_prompt": project.default_style_prompt,
                 "visibility": project.visibility.value if hasattr(project.visibility, 'value') else str(project.visibility),
                 "created_at": format_date(project.created_at),
                 "updated_at": format_date(project.updated_at),
@@ -370,8 +369,8 @@ async def get_project_chapters(project_id: str):
     
     功能说明：
     - 获取项目下的所有章节
-    - 返回每个章节的分镜数量
-    - 支持按章节编号排序
+    - 返回每个章节的分镜数量（一次查询，在数据库中统计）
+    - 按章节顺序（order_index、章节编号）排序
     
     参数：
         project_id: 项目ID
@@ -385,39 +384,31 @@ async def get_project_chapters(project_id: str):
         raise HTTPException(status_code=500, detail="数据库未连接")
     
     try:
-        from app.db import get_source_texts_by_project, get_storyboards_by_text_id
+        rows = await get_project_chapter_summaries(project_id)
+        if rows is None:
+            raise RuntimeError("查询章节列表失败")
         
-        # 获取项目的所有章节
-        chapters = await get_source_texts_by_project(project_id)
+        # 格式化日期字段
+        def format_date(date_value):
+            if not date_value:
+                return ""
+            if isinstance(date_value, str):
+                return date_value
+            if hasattr(date_value, 'isoformat'):
+                return date_value.isoformat()
+            return str(date_value)
         
-        # 为每个章节添加分镜数量
-        chapter_list = []
-        for chapter in chapters:
-            # 获取该章节的分镜数量
-            storyboards = await get_storyboards_by_text_id(chapter.text_id)
-            
-            # 格式化日期字段
-            def format_date(date_value):
-                if not date_value:
-                    return ""
-                if isinstance(date_value, str):
-                    return date_value
-                if hasattr(date_value, 'isoformat'):
-                    return date_value.isoformat()
-                return str(date_value)
-            
-            chapter_dict = {
-                "text_id": chapter.text_id,
-                "chapter_number": chapter.chapter_number,
-                "chapter_name": chapter.chapter_name or chapter.title,
-                "storyboard_count": len(storyboards),
-                "processing_status": chapter.processing_status,
-                "created_at": format_date(chapter.created_at)
+        chapter_list = [
+            {
+                "text_id": row.get("text_id"),
+                "chapter_number": row.get("chapter_number"),
+                "chapter_name": row.get("chapter_name") or row.get("title"),
+                "storyboard_count": row["storyboard_count"],
+                "processing_status": row.get("processing_status") or "pending",
+                "created_at": format_date(row.get("created_at"))
             }
-            chapter_list.append(chapter_dict)
-        
-        # 按 order_index 排序
-        chapter_list.sort(key=lambda x: x.get('order_index', 0))
+            for row in rows
+        ]
         
         print(f"✅(API) 获取项目章节成功，共 {len(chapter_list)} 个章节")
         return {"ok": True, "chapters": chapter_list}
@@ -521,13 +512,20 @@ async def get_project(project_id: str):
 
 
 @router.get("/api/v1/public-projects", tags=["Project"])
-async def get_public_projects_endpoint(limit: int = 20, offset: int = 0):
+async def get_public_projects_endpoint(
+    limit: int = 20,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+    user_id: Optional[str] = None
+):
     """
     获取公开项目列表
     
     功能说明：
     - 查询所有设置为公开的项目
-    - 支持分页查询（limit和offset）
+    - 支持分页查询：推荐使用游标（cursor），也兼容 limit 和 offset
+    - 过滤、排序、分页都在数据库中完成，每次只读取一页
     - 用于展示社区作品和灵感
     
     使用场景：
@@ -536,15 +534,17 @@ async def get_public_projects_endpoint(limit: int = 20, offset: int = 0):
     - 灵感来源和参考
     
     参数：
-        limit: 每页数量（默认20）
-        offset: 偏移量（默认0）
+        limit: 每页数量（默认20，最多100）
+        offset: 偏移量（默认0，提供 cursor 时忽略）
+        cursor: 上一页返回的 next_cursor，用于获取下一页
+        sort: 排序方式 newest（默认）/ oldest / updated / title
+        user_id: 只返回该用户的公开项目
     
     返回：
-        dict: 包含公开项目列表的JSON响应
+        dict: 包含公开项目列表和下一页游标（没有下一页时为null）的JSON响应
     """
     print(f"🌐(API) 收到获取公开项目请求:")
-    print(f"   limit: {limit}")
-    print(f"   offset: {offset}")
+    print(f"   limit: {limit}, offset: {offset}, sort: {sort}, cursor: {'有' if cursor else '无'}")
     
     # 检查数据库连接状态
     if not db_client.is_connected:
@@ -552,16 +552,65 @@ async def get_public_projects_endpoint(limit: int = 20, offset: int = 0):
     
     try:
         # 查询公开项目
-        projects = await get_public_projects(limit=limit, offset=offset)
+        projects, next_cursor = await get_public_projects_page(
+            limit=limit, cursor=cursor, offset=offset, sort=sort, user_id=user_id
+        )
         
         print(f"✅(API) 获取公开项目成功，共 {len(projects)} 个项目")
-        return {"ok": True, "projects": [project.to_dict() for project in projects]}
+        return {"ok": True, "projects": [project.to_dict() for project in projects], "next_cursor": next_cursor}
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"❌(API) 获取公开项目失败: {e}")
         raise HTTPException(status_code=500, detail=f"获取公开项目失败: {str(e)}")
 
 
+@router.get("/api/v1/search-projects", tags=["Project"])
+async def search_projects_endpoint(
+    q: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    sort: str = "newest"
+):
+    """
+    搜索公开项目
+    
+    功能说明：
+    - 在数据库中按标题或描述搜索公开项目（不区分大小写的包含匹配，由 pg_trgm 索引加速）
+    - 支持游标分页和排序，参数与 /api/v1/public-projects 一致
+    
+    参数：
+        q: 搜索关键词
+        limit: 每页数量（默认20，最多100）
+        cursor: 上一页返回的 next_cursor
+        sort: 排序方式 newest（默认）/ oldest / updated / title
+    
+    返回：
+        dict: 包含匹配项目列表和下一页游标的JSON响应
+    """
+    print(f"🔍(API) 收到搜索项目请求: {q}")
+    
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="搜索关键词不能为空")
+    
+    # 检查数据库连接状态
+    if not db_client.is_connected:
+        raise HTTPException(status_code=500, detail="数据库未连接")
+    
+    try:
+        projects, next_cursor = await get_public_projects_page(limit=limit, cursor=cursor, keyword=q, sort=sort)
+        
+        print(f"✅(API) 搜索项目成功，共 {len(projects)} 个项目")
+        return {"ok": True, "projects": [project.to_dict() for project in projects], "next_cursor": next_cursor}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"❌(API) 搜索项目失败: {e}")
+        raise HTTPException(status_code=500, detail=f"搜索项目失败: {str(e)}")
+
+
 class CharacterUpdate(BaseModel):
     """角色更新请求模型"""
     description: Optional[str] = None
@@ -14,22 +14,36 @@
 # - 统一的错误处理和状态码返回
 # - 为前端提供清晰的数据接口
 
-from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Query, File, Form, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Optional, List, Set
+import asyncio
+import io
+import itertools
+import json
 import os
 import sys
 
 # 添加 backend 目录到 Python 路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import config
 
 # 导入数据库层和服务层
 from app.db import (
-    db_client, create_source_text, create_character, create_storyboard_panel,
-    get_characters_by_project, get_storyboards_by_text_id, update_storyboard_panel,
-    update_source_text_status, get_source_text_by_id, delete_storyboard_panel
+    db_client, create_source_text, create_characters_batch, create_storyboard_panels_batch,
+    get_characters_by_project, get_storyboards_by_text_id, get_storyboard_summaries_by_text_id, update_storyboard_panel,
+    update_source_text_status, get_source_text_by_id, delete_storyboard_panel,
+    delete_storyboards_by_text_id, delete_storyboard_panels, update_storyboard_panel_indexes,
+    update_source_text, get_project_by_id, create_source_texts_batch, get_next_source_text_order
 )
-from app.services import ai_parser
+from app.services import ai_parser, text_segmenter
+from app.services.chapter_splitter import iter_chapters
+from app.services.image_store import image_store
+from app.services.incremental_parse import plan_incremental_parse
+from app.services.job_queue import job_queue
+from app.services.parse_progress import parse_progress, TERMINAL_STATUSES
+from app.api import storyboard_image_gen
 
 # 创建分镜相关的路由器
 router = APIRouter()
@@ -52,19 +66,196 @@ class ParseRequest(BaseModel):
     chapter_name: str | None = None   # 章节名称
 
 
+class ReparseRequest(BaseModel):
+    """
+    原文修改后重新解析的请求模型
+    
+    默认增量模式：只为修改过的文本重新生成分镜，保留其余分镜和已生成的图片
+    """
+    text: str                         # 修改后的完整原文（必需）
+    title: str | None = None          # 小说标题（可选，用于AI上下文）
+    incremental: bool = True          # 是否增量解析（False 时删除全部旧分镜重新生成）
+
+
 # ==================== 后台处理函数 ====================
 
+# 持久化任务队列中的任务类型
+PARSE_TEXT_JOB = "parse_text"
+REPARSE_TEXT_JOB = "reparse_text"
+
+# 整本小说入库时每批写入的章节数（一次批量插入 + 一次批量入队）
+CHAPTER_BATCH_SIZE = 20
+
+
+async def _save_new_characters(
+    project_id: str,
+    characters_from_ai: List[Dict[str, Any]],
+    name_to_id_map: Dict[str, str]
+) -> int:
+    """批量保存AI识别出的新角色（同名角色只保留第一次出现的描述），并更新名称到ID的映射"""
+    chars_to_create = []
+    pending_names = set()
+    for char_data in characters_from_ai:
+        char_name = char_data.get("name")
+        if char_name and char_name not in name_to_id_map and char_name not in pending_names:
+            pending_names.add(char_name)
+            chars_to_create.append({"name": char_name, "description": char_data.get("description")})
+    new_chars = await create_characters_batch(project_id, chars_to_create)
+    for new_char in new_chars:
+        name_to_id_map[new_char.name] = new_char.character_id
+    return len(new_chars)
+
+
+class _StreamingPanelWriter:
+    """
+    流式生成时按原文顺序保存分镜
+    
+    多个段落并发流式生成，但 panel_index 必须与原文顺序一致：
+    - 排在最前面且未完成的段落（头部段落）的分镜一到达就写入数据库
+    - 其余段落的分镜先缓存，轮到它成为头部段落时一次性批量写入
+    - 某段的新角色列表到达（或该段结束）之前不写入它的分镜，保证对白能关联到角色ID
+    - 对白说话人是后面段落才声明的角色时，写入时还没有角色ID，
+      等后面段落的角色保存后再回填这些分镜的 panel_elements
+    写入通过锁串行化，写入期间到达的分镜会在下一次写入时合并为一批。
+    """
+    
+    def __init__(self, project_id: str, text_id: str, name_to_id_map: Dict[str, str], segment_count: int):
+        self.project_id = project_id
+        self.text_id = text_id
+        self.name_to_id_map = name_to_id_map
+        self.pending_panels: List[List[dict]] = [[] for _ in range(segment_count)]
+        self.pending_characters: List[Optional[List[dict]]] = [None] * segment_count
+        self.characters_seen = [False] * segment_count
+        self.finished = [False] * segment_count
+        self.head = 0
+        self.next_index = 0
+        self.panels_total = 0
+        self.panels_written = 0
+        self.characters_created = 0
+        # storyboard_id -> 原始分镜数据（panel_elements 中有尚未解析为角色ID的说话人）
+        self.unresolved_panels: Dict[str, dict] = {}
+        # storyboard_id -> 上次写入该分镜时已经解析为角色ID的说话人名称
+        self.resolved_speakers: Dict[str, Set[str]] = {}
+        self._lock = asyncio.Lock()
+    
+    async def add_characters(self, segment: int, characters: List[dict]):
+        # 输出被截断续写时同一段的新角色可能分多次到达
+        self.pending_characters[segment] = (self.pending_characters[segment] or []) + characters
+        self.characters_seen[segment] = True
+        await self._flush()
+    
+    async def add_storyboard(self, segment: int, storyboard: dict):
+        self.pending_panels[segment].append(storyboard)
+        self.panels_total += 1
+        await self._flush()
+    
+    async def finish(self, segment: int):
+        self.finished[segment] = True
+        await self._flush()
+    
+    async def _flush(self):
+        async with self._lock:
+            written_before = self.panels_written
+            while self.head < len(self.finished):
+                head = self.head
+                if self.pending_characters[head]:
+                    characters, self.pending_characters[head] = self.pending_characters[head], None
+                    saved = await _save_new_characters(self.project_id, characters, self.name_to_id_map)
+                    self.characters_created += saved
+                    if saved and self.unresolved_panels:
+                        await self._patch_unresolved_speakers()
+                if not self.characters_seen[head] and not self.finished[head]:
+                    break
+                if self.pending_panels[head]:
+                    panels, self.pending_panels[head] = self.pending_panels[head], []
+                    created = await create_storyboard_panels_batch(
+                        self.project_id, self.text_id, panels, self.name_to_id_map, self.next_index
+                    )
+                    self._remember_unresolved(panels, created, self.next_index)
+                    self.next_index += len(panels)
+                    self.panels_written += len(created)
+                if not self.finished[head]:
+                    break
+                self.head += 1
+            if self.panels_written != written_before:
+                await parse_progress.publish(
+                    self.text_id, panels_written=self.panels_written, characters_created=self.characters_created
+                )
+    
+    def _has_unresolved_speaker(self, panel_data: dict) -> bool:
+        return any(
+            element.get("character_name") and element["character_name"] not in self.name_to_id_map
+            for element in panel_data.get("panel_elements") or []
+        )
+    
+    def _resolvable_speakers(self, panel_data: dict) -> Set[str]:
+        return {
+            element["character_name"]
+            for element in panel_data.get("panel_elements") or []
+            if element.get("character_name") in self.name_to_id_map
+        }
+    
+    def _remember_unresolved(self, panels: List[dict], created: List[Any], start_index: int):
+        """记录刚写入的分镜中说话人还没有角色ID的分镜（按 panel_index 对应原始数据）"""
+        created_by_index = {panel.panel_index: panel.storyboard_id for panel in created}
+        for i, panel_data in enumerate(panels):
+            storyboard_id = created_by_index.get(start_index + i)
+            if storyboard_id and self._has_unresolved_speaker(panel_data):
+                self.unresolved_panels[storyboard_id] = panel_data
+                self.resolved_speakers[storyboard_id] = self._resolvable_speakers(panel_data)
+    
+    async def _patch_unresolved_speakers(self):
+        """新角色保存后，回填已写入分镜中现在可以解析的说话人角色ID（只在可解析的说话人增加时重写）"""
+        for storyboard_id, panel_data in list(self.unresolved_panels.items()):
+            resolvable = self._resolvable_speakers(panel_data)
+            if resolvable <= self.resolved_speakers[storyboard_id]:
+                continue
+            elements = panel_data.get("panel_elements") or []
+            panel_elements = [
+                {
+                    "character_id": self.name_to_id_map.get(element.get("character_name")) if element.get("character_name") else None,
+                    "dialogue": element.get("dialogue")
+                }
+                for element in elements
+            ]
+            if await update_storyboard_panel(storyboard_id, {"panel_elements": panel_elements}):
+                print(f"   (BG) 已回填分镜 {storyboard_id} 的说话人角色ID")
+                self.resolved_speakers[storyboard_id] = resolvable
+                if not self._has_unresolved_speaker(panel_data):
+                    del self.unresolved_panels[storyboard_id]
+                    del self.resolved_speakers[storyboard_id]
+
+
 async def process_text_background(
     project_id: str,
     text_id: str,
     text_content: str,
-    title: Optional[str]
+    title: Optional[str],
+    attempt: int = 1,
+    max_attempts: int = 1,
+    replace_existing: bool = False
 ):
-    """后台执行 AI 解析和数据库保存"""
-    print(f"🔄(Background) 开始处理 text_id: {text_id}")
+    """
+    后台执行 AI 解析和数据库保存
+    
+    由持久化任务队列的worker调用，失败时抛出异常交给队列重试，
+    因此必须可重复执行：重试时先清理上一次写入的分镜。
+    各阶段的进度通过 parse_progress 发布，供SSE接口推送给前端。
+    replace_existing 为 True 时（全量重新解析）首次执行也会先清理旧分镜。
+    """
+    print(f"🔄(Background) 开始处理 text_id: {text_id} (第 {attempt} 次)")
     try:
         # 标记状态为 processing
         await update_source_text_status(text_id, 'processing')
+        await parse_progress.publish(
+            text_id, reset=True, status='processing', stage='loading_characters',
+            attempt=attempt, max_attempts=max_attempts
+        )
+        
+        if attempt > 1 or replace_existing:
+            old_storyboards = await get_storyboard_summaries_by_text_id(text_id)
+            await delete_storyboards_by_text_id(text_id)
+            await image_store.release([sb.storyboard_id for sb in old_storyboards])
 
         # --- 这里是原来 parse_text 中的核心 AI 处理逻辑 ---
         # 1. 获取已存在角色
@@ -77,84 +268,375 @@ async def process_text_background(
         all_new_characters_from_ai = []
         all_storyboards_from_ai = []
         
-        # 决定是否需要分段 (可以在这里加一个简单的字数判断)
-        needs_segmentation = len(text_content) > 1500 # 举例：超过1500字则分段
+        # 决定是否需要分段：超过token预算允许的单段字数时分段
+        _, _, max_segment_size = ai_parser.segment_limits(text_content, title, existing_char_list_for_ai)
+        needs_segmentation = len(text_content) > max_segment_size
+        
+        # 流式模式下分镜边生成边写入，由 writer 负责保存角色和分镜
+        writer: Optional[_StreamingPanelWriter] = None
+        
+        async def generate_segment(i: int, content: str) -> dict:
+            if writer is None:
+                return await ai_parser.generate_storyboard_for_segment(
+                    content, title, i + 1, existing_char_list_for_ai
+                )
+            result = {"characters": [], "storyboards": []}
+            async for kind, value in ai_parser.stream_storyboard_for_segment(
+                content, title, i + 1, existing_char_list_for_ai
+            ):
+                if kind == "characters":
+                    await writer.add_characters(i, value)
+                elif kind == "storyboard":
+                    await writer.add_storyboard(i, value)
+                else:
+                    result = value
+            await writer.finish(i)
+            return result
 
         if needs_segmentation:
             print(f"   (BG) 长文本，开始分段处理...")
-            segments = await ai_parser.segment_text(text_content, existing_char_list_for_ai)
-            print(f"   (BG) 分段完成，共 {len(segments)} 段")
+            await parse_progress.publish(text_id, stage='segmenting')
+            segments = await ai_parser.segment_text(text_content, existing_char_list_for_ai, title)
+            print(f"   (BG) 分段完成，共 {len(segments)} 段，并发数: {config.segment_concurrency}")
+            await parse_progress.publish(
+                text_id, stage='storyboarding', segments_total=len(segments), segments_done=0
+            )
+            segments_done = 0
+            if config.llm_stream:
+                writer = _StreamingPanelWriter(project_id, text_id, name_to_id_map, len(segments))
 
-            for i, segment in enumerate(segments):
-                print(f"   (BG) 处理第 {i+1}/{len(segments)} 段...")
-                ai_response_segment = await ai_parser.generate_storyboard_for_segment(
-                    segment["content"], title, i + 1, existing_char_list_for_ai
-                )
+            # 各段并发生成分镜，用信号量限制同时进行的AI调用数
+            semaphore = asyncio.Semaphore(max(1, config.segment_concurrency))
+
+            async def process_segment(i: int, segment: dict) -> dict:
+                nonlocal segments_done
+                async with semaphore:
+                    print(f"   (BG) 处理第 {i+1}/{len(segments)} 段...")
+                    ai_response_segment = await generate_segment(i, segment["content"])
+                    print(f"   (BG) 第 {i+1} 段完成")
+                    segments_done += 1
+                    await parse_progress.publish(text_id, segments_done=segments_done, last_segment=i + 1)
+                    return ai_response_segment
+
+            # gather 按输入顺序返回结果，保证分镜顺序与原文一致、新角色按段落顺序合并
+            segment_results = await asyncio.gather(
+                *[process_segment(i, segment) for i, segment in enumerate(segments)]
+            )
+            for ai_response_segment in segment_results:
                 all_new_characters_from_ai.extend(ai_response_segment.get("characters", []))
                 all_storyboards_from_ai.extend(ai_response_segment.get("storyboards", []))
-                print(f"   (BG) 第 {i+1} 段完成")
         else:
             print(f"   (BG) 短文本，直接处理...")
-            ai_response_single = await ai_parser.generate_storyboard_for_segment(
-                text_content, title, 1, existing_char_list_for_ai
-            )
+            await parse_progress.publish(text_id, stage='storyboarding', segments_total=1, segments_done=0)
+            if config.llm_stream:
+                writer = _StreamingPanelWriter(project_id, text_id, name_to_id_map, 1)
+            ai_response_single = await generate_segment(0, text_content)
             all_new_characters_from_ai = ai_response_single.get("characters", [])
             all_storyboards_from_ai = ai_response_single.get("storyboards", [])
+            await parse_progress.publish(text_id, segments_done=1, last_segment=1)
 
         print(f"   (BG) AI 处理完成，共识别 {len(all_new_characters_from_ai)} 个新角色，生成 {len(all_storyboards_from_ai)} 个分镜面板")
 
-        # 3. 保存新角色
+        if writer is not None:
+            # 流式模式下角色和分镜已在生成过程中写入
+            print(f"   (BG) 已流式保存 {writer.panels_written}/{writer.panels_total} 个分镜面板")
+            await parse_progress.publish(
+                text_id, panels_total=writer.panels_total, panels_written=writer.panels_written
+            )
+            all_new_characters_from_ai = []
+            all_storyboards_from_ai = []
+        else:
+            await parse_progress.publish(
+                text_id, stage='saving', panels_total=len(all_storyboards_from_ai), panels_written=0
+            )
+
+        # 3. 批量保存新角色（同名角色只保留第一次出现的描述）
         if all_new_characters_from_ai:
             print(f"   (BG) 保存新角色...")
-            for char_data in all_new_characters_from_ai:
-                char_name = char_data.get("name")
-                if char_name and char_name not in name_to_id_map:
-                    new_char = await create_character(project_id, char_name, char_data.get("description"))
-                    if new_char:
-                        name_to_id_map[new_char.name] = new_char.character_id
+            created_count = await _save_new_characters(project_id, all_new_characters_from_ai, name_to_id_map)
+            await parse_progress.publish(text_id, characters_created=created_count)
         
-        # 4. 保存分镜面板
+        # 4. 批量保存分镜面板
         if all_storyboards_from_ai:
             print(f"   (BG) 保存分镜面板...")
-            for i, panel_data in enumerate(all_storyboards_from_ai):
-                await create_storyboard_panel(project_id, text_id, i, panel_data, name_to_id_map)
+            created_panels = await create_storyboard_panels_batch(
+                project_id, text_id, all_storyboards_from_ai, name_to_id_map
+            )
+            print(f"   (BG) 已保存 {len(created_panels)}/{len(all_storyboards_from_ai)} 个分镜面板")
+            await parse_progress.publish(text_id, panels_written=len(created_panels))
         # --- AI 处理逻辑结束 ---
 
         # 标记状态为 completed
         await update_source_text_status(text_id, 'completed')
+        await parse_progress.publish(text_id, status='completed', stage='done')
         print(f"✅(Background) 处理完成 text_id: {text_id}")
 
     except Exception as e:
         print(f"❌(Background) 处理失败 text_id: {text_id}: {e}")
         import traceback
         error_msg = traceback.format_exc()
-        # 标记状态为 failed 并记录错误
+        # 标记状态为 failed 并记录错误，再交给任务队列决定是否重试
         await update_source_text_status(text_id, 'failed', error_msg)
+        # 还有重试机会时推送 retrying，避免前端提前结束订阅
+        await parse_progress.publish(
+            text_id, status='failed' if attempt >= max_attempts else 'retrying', error=str(e)
+        )
+        raise
+
+
+async def reparse_text_background(
+    project_id: str,
+    text_id: str,
+    text_content: str,
+    title: Optional[str],
+    attempt: int = 1,
+    max_attempts: int = 1,
+    incremental: bool = True
+):
+    """
+    原文修改后重新解析（增量模式）
+    
+    对比新原文与数据库中的 raw_content，只为修改过的文本区域重新生成分镜，
+    未受影响的分镜（包括已生成的图片）原样保留，并按新原文顺序重排 panel_index。
+    
+    以下情况退回全量重新解析：关闭增量模式、旧原文没有分镜、任务重试
+    （上一次执行可能已写入部分结果，无法再可靠地对比）。
+    """
+    source_text = await get_source_text_by_id(text_id)
+    if source_text is None:
+        raise ValueError(f"原文不存在: {text_id}")
+    
+    old_panels = await get_storyboards_by_text_id(text_id) if incremental and attempt == 1 else []
+    if not old_panels:
+        print(f"🔄(Background) 全量重新解析 text_id: {text_id}")
+        await update_source_text(text_id, raw_content=text_content)
+        await process_text_background(
+            project_id, text_id, text_content, title, attempt, max_attempts, replace_existing=True
+        )
+        return
+    
+    print(f"🔄(Background) 增量重新解析 text_id: {text_id}")
+    try:
+        await update_source_text_status(text_id, 'processing')
+        await parse_progress.publish(
+            text_id, reset=True, status='processing', stage='diffing',
+            attempt=attempt, max_attempts=max_attempts
+        )
+        
+        # 1. 计算需要保留和重新生成的部分
+        plan = plan_incremental_parse(
+            source_text.raw_content or "",
+            text_content,
+            [{"storyboard_id": p.storyboard_id, "original_text_snippet": p.original_text_snippet} for p in old_panels]
+        )
+        regions = [item for item in plan["items"] if item["kind"] == "regenerate"]
+        kept_count = len(plan["items"]) - len(regions)
+        print(f"   (BG) 保留 {kept_count} 个分镜，删除 {len(plan['removed_ids'])} 个，重新生成 {len(regions)} 个区域")
+        
+        # 2. 为每个修改区域生成分镜（过长的区域用本地分段引擎切分）
+        existing_db_chars = await get_characters_by_project(project_id)
+        existing_char_list_for_ai = [{"name": c.name, "description": c.description} for c in existing_db_chars]
+        name_to_id_map = {c.name: c.character_id for c in existing_db_chars}
+        
+        chunks = []
+        for region_index, region in enumerate(regions):
+            limits = ai_parser.segment_limits(region["text"], title, existing_char_list_for_ai)
+            if len(region["text"]) > limits[2]:
+                contents = [seg["content"] for seg in text_segmenter.segment_text_local(region["text"], *limits)]
+            else:
+                contents = [region["text"]]
+            chunks.extend((region_index, content) for content in contents)
+        
+        await parse_progress.publish(
+            text_id, stage='storyboarding', segments_total=len(chunks), segments_done=0,
+            panels_kept=kept_count
+        )
+        semaphore = asyncio.Semaphore(max(1, config.segment_concurrency))
+        segments_done = 0
+        
+        async def process_chunk(i: int, content: str) -> dict:
+            nonlocal segments_done
+            async with semaphore:
+                ai_response = await ai_parser.generate_storyboard_for_segment(
+                    content, title, i + 1, existing_char_list_for_ai
+                )
+                segments_done += 1
+                await parse_progress.publish(text_id, segments_done=segments_done, last_segment=i + 1)
+                return ai_response
+        
+        chunk_results = await asyncio.gather(
+            *[process_chunk(i, content) for i, (_, content) in enumerate(chunks)]
+        )
+        region_storyboards: List[List[dict]] = [[] for _ in regions]
+        new_characters = []
+        for (region_index, _), ai_response in zip(chunks, chunk_results):
+            region_storyboards[region_index].extend(ai_response.get("storyboards", []))
+            new_characters.extend(ai_response.get("characters", []))
+        
+        # 3. 保存新角色
+        await parse_progress.publish(
+            text_id, stage='saving', panels_total=sum(len(sb) for sb in region_storyboards), panels_written=0
+        )
+        if new_characters:
+            created_count = await _save_new_characters(project_id, new_characters, name_to_id_map)
+            await parse_progress.publish(text_id, characters_created=created_count)
+        
+        # 4. 按新原文顺序分配 panel_index：保留的分镜只改索引，新区域的分镜批量插入
+        index_by_id = {}
+        inserts = []
+        next_index = 0
+        region_index = 0
+        for item in plan["items"]:
+            if item["kind"] == "keep":
+                index_by_id[item["storyboard_id"]] = next_index
+                next_index += 1
+            else:
+                storyboards = region_storyboards[region_index]
+                region_index += 1
+                if storyboards:
+                    inserts.append((next_index, storyboards))
+                    next_index += len(storyboards)
+        
+        old_index_by_id = {p.storyboard_id: p.panel_index for p in old_panels}
+        moved = {sid: idx for sid, idx in index_by_id.items() if old_index_by_id.get(sid) != idx}
+        
+        created_lists = await asyncio.gather(*[
+            create_storyboard_panels_batch(project_id, text_id, storyboards, name_to_id_map, start_index)
+            for start_index, storyboards in inserts
+        ])
+        panels_written = sum(len(created) for created in created_lists)
+        if not await update_storyboard_panel_indexes(project_id, text_id, moved):
+            raise RuntimeError("更新分镜顺序失败")
+        if not await delete_storyboard_panels(plan["removed_ids"]):
+            raise RuntimeError("删除旧分镜失败")
+        await image_store.release(plan["removed_ids"])
+        await update_source_text(text_id, raw_content=text_content)
+        await parse_progress.publish(text_id, panels_written=panels_written)
+        
+        await update_source_text_status(text_id, 'completed')
+        await parse_progress.publish(text_id, status='completed', stage='done')
+        print(f"✅(Background) 增量重新解析完成 text_id: {text_id}，新写入 {panels_written} 个分镜")
+    
+    except Exception as e:
+        print(f"❌(Background) 增量重新解析失败 text_id: {text_id}: {e}")
+        import traceback
+        await update_source_text_status(text_id, 'failed', traceback.format_exc())
+        await parse_progress.publish(
+            text_id, status='failed' if attempt >= max_attempts else 'retrying', error=str(e)
+        )
+        raise
+
+
+async def _ingest_chapters(project_id: str, chapters, title: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    整本小说按章节入库，每章一条原文记录和一个解析任务
+    
+    章节由生成器逐批读取（在线程中执行，不阻塞事件循环），每批一次批量插入、一次批量入队，
+    各章节的解析任务由任务队列的多个worker并行执行。
+    
+    参数：
+        project_id: 项目ID
+        chapters: chapter_splitter.iter_chapters 返回的章节迭代器
+        title: 小说标题（用作AI上下文，以及没有章节名的内容的标题）
+    
+    返回：
+        list: 每章的 text_id、job_id、chapter_number、chapter_name
+    """
+    order_index = await get_next_source_text_order(project_id)
+    results = []
+    while True:
+        batch = await asyncio.to_thread(lambda: list(itertools.islice(chapters, CHAPTER_BATCH_SIZE)))
+        if not batch:
+            break
+        
+        source_texts = await create_source_texts_batch(project_id, [
+            {
+                "title": chapter["chapter_name"] or title or "Untitled Chapter",
+                "raw_content": chapter["content"],
+                "order_index": order_index + i,
+                "chapter_number": chapter["chapter_number"],
+                "chapter_name": chapter["chapter_name"]
+            }
+            for i, chapter in enumerate(batch)
+        ])
+        if len(source_texts) != len(batch):
+            raise RuntimeError(f"保存章节失败（{len(source_texts)}/{len(batch)}）")
+        order_index += len(batch)
+        
+        # 先发布排队中的进度再入队：worker 可能立即领取任务并发布 processing（甚至很快失败），
+        # 入队后再重置进度会覆盖它
+        for source_text in source_texts:
+            await parse_progress.publish(source_text.text_id, reset=True, status='pending', stage='queued')
+        job_ids = await job_queue.enqueue_many(
+            PARSE_TEXT_JOB,
+            [
+                {
+                    "project_id": project_id,
+                    "text_id": source_text.text_id,
+                    "text_content": chapter["content"],
+                    "title": title
+                }
+                for source_text, chapter in zip(source_texts, batch)
+            ],
+            max_attempts=config.queue_max_attempts
+        )
+        for source_text, chapter, job_id in zip(source_texts, batch, job_ids):
+            await parse_progress.publish(source_text.text_id, job_id=job_id)
+            results.append({
+                "text_id": source_text.text_id,
+                "job_id": job_id,
+                "chapter_number": chapter["chapter_number"],
+                "chapter_name": chapter["chapter_name"]
+            })
+        print(f"   (API) 已入库 {len(results)} 个章节")
+    return results
+
+
+def _chapters_response(project_id: str, chapters: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """整本小说入库后的响应，text_id/job_id 指向第一章，兼容单章节上传的前端逻辑"""
+    if not chapters:
+        raise HTTPException(status_code=400, detail="没有识别到任何章节内容")
+    return {
+        "ok": True,
+        "message": f"已识别 {len(chapters)} 个章节，正在后台并行生成...",
+        "project_id": project_id,
+        "text_id": chapters[0]["text_id"],
+        "job_id": chapters[0]["job_id"],
+        "chapter_count": len(chapters),
+        "chapters": chapters
+    }
+
+
+# 任务队列处理函数注册表（API进程内嵌worker和独立worker进程共用）
+JOB_HANDLERS = {
+    PARSE_TEXT_JOB: process_text_background,
+    REPARSE_TEXT_JOB: reparse_text_background,
+    **storyboard_image_gen.JOB_HANDLERS
+}
 
 # ==================== API接口定义 ====================
 
 @router.post("/api/v1/parse", tags=["Storyboard"])
-async def parse_text(req: ParseRequest, background_tasks: BackgroundTasks):
+async def parse_text(req: ParseRequest):
     """
     解析小说文本并生成分镜（后台任务版本）
     
     功能说明：
     - 接收前端发送的小说文本
     - 先保存原文到source_texts表（状态为pending）
-    - 启动后台任务进行AI处理
-    - 立即返回text_id供前端轮询状态
+    - 把解析任务写入持久化任务队列，由worker进程执行
+    - 立即返回text_id和job_id供前端轮询状态
     
     使用场景：
     - 用户上传小说文本，系统后台生成分镜
     - 支持长文本自动分段处理
-    - 异步处理，不阻塞前端
+    - 异步处理，不阻塞前端；服务重启后任务不会丢失
     
     参数：
         req: ParseRequest - 包含文本内容和配置选项
-        background_tasks: BackgroundTasks - FastAPI后台任务
     
     返回：
-        dict: 包含成功状态和text_id的JSON响应
+        dict: 包含成功状态、text_id和job_id的JSON响应
     """
     print(f"📖(API) 收到解析请求 (将后台处理):")
     print(f"   标题: {req.title}")
@@ -170,6 +652,13 @@ async def parse_text(req: ParseRequest, background_tasks: BackgroundTasks):
         raise HTTPException(status_code=400, detail="项目ID不能为空")
     
     try:
+        # 整本小说上传：按章节切分，每章单独入库和解析
+        project = await get_project_by_id(req.project_id)
+        if project and project.upload_method == "full_novel" and req.chapter_number is None:
+            print(f"   (API) 整本小说模式，按章节切分...")
+            chapters = await _ingest_chapters(req.project_id, iter_chapters(io.StringIO(req.text)), req.title)
+            return _chapters_response(req.project_id, chapters)
+
         # 1. 保存原文 (状态默认为 pending)
         print(f"   (API) 保存原文...")
         source_text = await create_source_text(
@@ -184,30 +673,152 @@ async def parse_text(req: ParseRequest, background_tasks: BackgroundTasks):
         text_id = source_text.text_id
         print(f"   (API) 原文保存成功, text_id: {text_id}, 状态: pending")
 
-        # 2. [关键] 将耗时任务添加到后台
+        # 2. [关键] 将耗时任务写入持久化任务队列
         print(f"   (API) 添加到后台任务队列...")
-        background_tasks.add_task(
-            process_text_background,
-            req.project_id,
-            text_id,
-            req.text,
-            req.title
+        # 先发布排队中的进度再入队，避免覆盖worker已经发布的进度
+        await parse_progress.publish(text_id, reset=True, status='pending', stage='queued')
+        job_id = await job_queue.enqueue(
+            PARSE_TEXT_JOB,
+            {
+                "project_id": req.project_id,
+                "text_id": text_id,
+                "text_content": req.text,
+                "title": req.title
+            },
+            max_attempts=config.queue_max_attempts
         )
+        await parse_progress.publish(text_id, job_id=job_id)
 
         # 3. [关键] 立即返回响应给前端
-        print(f"   (API) 立即返回响应...")
+        print(f"   (API) 立即返回响应, job_id: {job_id}")
         return {
             "ok": True,
             "message": "已接收处理请求，正在后台生成...",
             "project_id": req.project_id,
-            "text_id": text_id
+            "text_id": text_id,
+            "job_id": job_id
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌(API) 接收解析请求失败: {e}")
         raise HTTPException(status_code=500, detail=f"请求处理失败: {str(e)}")
 
 
+@router.post("/api/v1/parse_novel", tags=["Storyboard"])
+async def parse_novel_file(
+    project_id: str = Form(...),
+    title: Optional[str] = Form(None),
+    file: UploadFile = File(...)
+):
+    """
+    上传整本小说文件（txt），按章节切分后并行解析
+    
+    功能说明：
+    - 逐行读取上传的文件，识别"第X章"、"Chapter N"等章节标题
+    - 每章保存为一条原文记录（带 chapter_number、order_index），并各自加入解析任务队列
+    - 几MB的小说也不会一次性读入内存或交给AI
+    
+    参数：
+        project_id: 项目ID
+        title: 小说标题（可选，默认使用文件名）
+        file: 小说文本文件（UTF-8 或 GBK/GB18030 编码）
+    
+    返回：
+        dict: 章节数量和每章的 text_id、job_id
+    """
+    print(f"📖(API) 收到整本小说上传: {file.filename}, 项目ID: {project_id}")
+    
+    if not db_client.is_connected:
+        raise HTTPException(status_code=500, detail="数据库未连接")
+    
+    # 根据文件开头判断编码：UTF-8（可带BOM）或国内常见的 GB18030
+    sample = await file.read(64 * 1024)
+    await file.seek(0)
+    encoding = "utf-8-sig"
+    try:
+        sample.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        # 采样可能在多字节字符中间截断，只有截断以外的错误才说明不是UTF-8
+        if e.reason != "unexpected end of data":
+            encoding = "gb18030"
+    
+    novel_title = title or os.path.splitext(file.filename or "")[0] or None
+    try:
+        lines = io.TextIOWrapper(file.file, encoding=encoding, errors="replace", newline="")
+        chapters = await _ingest_chapters(project_id, iter_chapters(lines), novel_title)
+        return _chapters_response(project_id, chapters)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌(API) 整本小说入库失败: {e}")
+        raise HTTPException(status_code=500, detail=f"请求处理失败: {str(e)}")
+
+
+@router.post("/api/v1/source_text/{text_id}/reparse", tags=["Storyboard"])
+async def reparse_text(text_id: str, req: ReparseRequest):
+    """
+    原文修改后重新解析（后台任务）
+    
+    功能说明：
+    - 对比新原文与已保存的原文，只为修改过的区域重新生成分镜
+    - 未修改部分的分镜及其已生成的图片保持不变，panel_index 按新原文顺序重排
+    - 新原文在解析完成后写回 source_texts.raw_content
+    - 进度可通过 /api/v1/source_text_progress/{text_id}/stream 订阅
+    
+    参数：
+        text_id: 原文ID
+        req: ReparseRequest - 修改后的原文和解析选项
+    
+    返回：
+        dict: 包含成功状态、text_id和job_id的JSON响应
+    """
+    print(f"📖(API) 收到重新解析请求: {text_id} (增量: {req.incremental}, 文本长度: {len(req.text)})")
+    
+    if not db_client.is_connected:
+        raise HTTPException(status_code=500, detail="数据库未连接")
+    
+    source_text = await get_source_text_by_id(text_id)
+    if not source_text:
+        raise HTTPException(status_code=404, detail="未找到该文本")
+    if source_text.processing_status in ('pending', 'processing'):
+        raise HTTPException(status_code=409, detail="该文本正在解析中，请稍后再试")
+    
+    # 先标记为 pending 再入队：worker 可能立即领取任务并把状态改为 processing，
+    # 入队后再写 pending 会覆盖它（完成得足够快时甚至会覆盖 completed），导致状态一直停在 pending
+    await update_source_text_status(text_id, 'pending')
+    await parse_progress.publish(text_id, reset=True, status='pending', stage='queued')
+    
+    try:
+        job_id = await job_queue.enqueue(
+            REPARSE_TEXT_JOB,
+            {
+                "project_id": source_text.project_id,
+                "text_id": text_id,
+                "text_content": req.text,
+                "title": req.title,
+                "incremental": req.incremental
+            },
+            max_attempts=config.queue_max_attempts
+        )
+        await parse_progress.publish(text_id, job_id=job_id)
+        
+        return {
+            "ok": True,
+            "message": "已接收重新解析请求，正在后台处理...",
+            "project_id": source_text.project_id,
+            "text_id": text_id,
+            "job_id": job_id
+        }
+    except Exception as e:
+        print(f"❌(API) 接收重新解析请求失败: {e}")
+        # 任务没有入队，恢复原来的状态，否则该文本会一直被视为"正在解析中"
+        await update_source_text_status(text_id, source_text.processing_status)
+        await parse_progress.publish(text_id, status=source_text.processing_status, stage=None)
+        raise HTTPException(status_code=500, detail=f"请求处理失败: {str(e)}")
+
+
 # ==================== 新增API接口 ====================
 
 @router.get("/api/v1/storyboards", tags=["Storyboard"])
@@ -390,6 +1001,73 @@ async def get_source_text_status(text_id: str):
         raise HTTPException(status_code=500, detail=f"查询状态失败: {str(e)}")
 
 
+@router.get("/api/v1/source_text_progress/{text_id}/stream", tags=["Storyboard"])
+async def stream_source_text_progress(text_id: str):
+    """
+    以SSE（text/event-stream）推送文本解析进度
+    
+    功能说明：
+    - 每次进度变化推送一次完整快照（状态、阶段、已完成段数/总段数、已写入分镜数）
+    - 状态为 completed 或 failed（重试次数用尽）时关闭连接；等待重试期间状态为 retrying
+    - 长时间无变化时发送心跳注释，防止代理断开连接
+    
+    进度来自worker发布到本地任务队列文件的快照，订阅期间不会轮询数据库；
+    只有找不到进度快照时（如升级前创建的文本）才查询一次数据库状态。
+    """
+    snapshot = await parse_progress.get(text_id)
+    if snapshot is None:
+        if not db_client.is_connected:
+            raise HTTPException(status_code=500, detail="数据库未连接")
+        source_text = await get_source_text_by_id(text_id)
+        if not source_text:
+            raise HTTPException(status_code=404, detail="未找到该文本")
+        snapshot = {
+            "text_id": text_id,
+            "seq": 0,
+            "status": source_text.processing_status,
+            "error": source_text.error_message if source_text.processing_status == 'failed' else None
+        }
+
+    async def event_stream():
+        current = snapshot
+        while True:
+            yield f"data: {json.dumps(current, ensure_ascii=False)}\n\n"
+            if current.get("status") in TERMINAL_STATUSES:
+                break
+            seq = current["seq"]
+            while True:
+                latest = await parse_progress.wait_for_update(text_id, seq, timeout=15.0)
+                if latest and latest["seq"] > seq:
+                    current = latest
+                    break
+                yield ": heartbeat\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/api/v1/parse_jobs/{job_id}", tags=["Storyboard"])
+async def get_parse_job_status(job_id: str):
+    """获取解析任务在任务队列中的状态（排队、执行、重试次数、最后一次错误）"""
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="未找到该任务")
+    
+    return {
+        "ok": True,
+        "job_id": job_id,
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "text_id": job["payload"].get("text_id"),
+        "error": job["last_error"] if job["status"] == "failed" else None
+    }
+
+
 @router.delete("/api/v1/storyboard/{storyboard_id}", tags=["Storyboard"])
 async def delete_storyboard(storyboard_id: str):
     """删除单个分镜面板"""
@@ -399,6 +1077,7 @@ async def delete_storyboard(storyboard_id: str):
     try:
         success = await delete_storyboard_panel(storyboard_id)
         if success:
+            await image_store.release([storyboard_id])
             return {"ok": True, "message": "删除成功"}
         else:
             # 可能未找到或删除失败
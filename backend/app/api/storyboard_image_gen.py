@@ -14,21 +14,27 @@
 # - 支持批量处理
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Union
+import asyncio
+import json
 import os
 import sys
-import base64
-import binascii
-from datetime import datetime
+import uuid
 
 # 添加 backend 目录到 Python 路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 # 导入服务层
+from config import config
 from app.services import text_to_image
-from app.services.comic_composer import add_dialogues_to_image
-from app.db import db_client
+from app.services.comic_composer import compose_dialogues_async
+from app.services.image_handle import ImageHandle
+from app.services.image_jobs import image_jobs, DONE_PANEL_STATUSES, TERMINAL_STATUSES
+from app.services.image_store import image_store
+from app.services.job_queue import job_queue
+from app.db import db_client, update_storyboard_panel, character_resolver
 
 # 创建路由器
 router = APIRouter(prefix="/api/v1/storyboard-gen", tags=["Storyboard Image Generation"])
@@ -44,6 +50,8 @@ class StoryboardImageRequest(BaseModel):
     storyboard_ids: Optional[List[str]] = None  # 分镜ID列表（可选，不提供则生成所有）
     size: str = "1024x1024"                   # 图片尺寸
     style: str = "vivid"                      # 图片风格
+    concurrency: Optional[int] = None         # 最大并发数（可选，不提供则使用服务端配置）
+    skip_existing: bool = False               # 是否跳过已有配图的分镜（用于中断后继续生成）
 
 
 class SingleStoryboardImageRequest(BaseModel):
@@ -60,95 +68,31 @@ class SingleStoryboardImageRequest(BaseModel):
 
 # ==================== 辅助函数 ====================
 
-async def save_image_to_local(image_base64: str, storyboard_id: str) -> str:
+async def save_image(image: Union[ImageHandle, str], storyboard_id: str) -> str:
     """
-    将base64格式的图片保存到本地layout文件夹并返回访问URL
+    将图片保存到存储后端（本地layout文件夹或S3兼容存储，按内容寻址，见 image_store）并返回访问URL
     
     参数:
-        image_base64: base64格式的图片数据（包含data:image/png;base64,前缀）
+        image: 图片句柄（二进制数据）；兼容传入base64字符串（包含data:image/png;base64,前缀），此时在这里解码
         storyboard_id: 分镜ID
     
     返回:
         str: 图片的HTTP访问URL
     """
     try:
-        # 解析base64数据
-        if ',' in image_base64:
-            header, data = image_base64.split(',', 1)
-            # 从header中提取图片格式
-            if 'png' in header.lower():
-                file_ext = '.png'
-            elif 'jpg' in header.lower() or 'jpeg' in header.lower():
-                file_ext = '.jpg'
-            else:
-                file_ext = '.png'
-        else:
-            data = image_base64
-            file_ext = '.png'
-        
-        # 解码base64数据
-        print(f"🔍 开始解码base64数据，数据长度: {len(data)}")
-        print(f"🔍 base64前100字符: {data[:100]}")
-        
-        # -------------------
-        # 💡 [解决方案] 修复Base64解码问题
-        # -------------------
-        # AI或PIL生成的Base64字符串可能缺少 = padding，导致b64decode失败
-        # 我们需要手动添加padding，确保字符串长度是4的倍数
-        try:
-            # 尝试直接解码
-            image_data = base64.b64decode(data)
-        except (binascii.Error, ValueError, Exception) as e:
-            # 如果解码失败，尝试修复padding
-            print(f"⚠️ Base64解码失败，尝试修复padding: {e}")
-            
-            # 计算需要添加的padding数量（确保长度是4的倍数）
-            padding_needed = (-len(data) % 4)
-            if padding_needed:
-                padding = '=' * padding_needed
-                print(f"🔧 修复Base64 padding：添加 {padding_needed} 个 '=' 填充符")
-                data_fixed = data + padding
-                
-                try:
-                    # 再次尝试解码
-                    image_data = base64.b64decode(data_fixed)
-                    print(f"✅ 修复padding后解码成功")
-                except Exception as e2:
-                    print(f"❌ Base64解码失败 (已尝试修复padding): {e2}")
-                    print(f"   失败的Base64数据长度: {len(data)}")
-                    print(f"   失败的Base64数据 (前100字符): {data[:100]}...")
-                    raise ValueError(f"Base64解码失败: {e2}") from e2
-            else:
-                # 不需要padding但仍然失败，说明数据本身有问题
-                print(f"❌ Base64解码失败 (无需padding但仍然失败): {e}")
-                print(f"   失败的Base64数据长度: {len(data)}")
-                print(f"   失败的Base64数据 (前100字符): {data[:100]}...")
-                raise ValueError(f"Base64解码失败: {e}") from e
-        
-        print(f"✅ base64解码成功，解码后数据长度: {len(image_data)} 字节")
-        
-        # 获取backend根目录的layout文件夹路径
-        # __file__ 是 backend/app/api/storyboard_image_gen.py
-        # dirname(dirname(dirname(__file__))) = backend目录
-        backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        layout_dir = os.path.join(backend_root, "layout")
-        
-        # 确保layout目录存在
-        if not os.path.exists(layout_dir):
-            os.makedirs(layout_dir)
-        
-        # 生成文件名（使用storyboard_id和当前时间戳）
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{storyboard_id}_{timestamp}{file_ext}"
-        filepath = os.path.join(layout_dir, filename)
-        
-        # 保存图片
-        with open(filepath, 'wb') as f:
-            f.write(image_data)
-        
-        # 返回HTTP访问URL
-        image_url = f"http://127.0.0.1:8000/layout/{filename}"
-        print(f"💾 图片已保存到: {filepath}")
+        if isinstance(image, str):
+            image = ImageHandle.from_base64(image)
+        file_ext = image.extension
+        image_data = image.data
+        print(f"💾 准备保存图片，数据长度: {len(image_data)} 字节")
+        
+        # 按内容寻址保存到存储后端（相同图片只存一份），并登记为该分镜当前的图片，
+        # 该分镜之前的图片不再被引用时会被删除
+        blob_path = await image_store.save(image_data, file_ext, owner_id=storyboard_id)
+        
+        # 返回HTTP访问URL（由配置的存储后端生成，任何节点都能访问）
+        image_url = image_store.url_for(blob_path)
+        print(f"💾 图片已保存到: {blob_path}")
         print(f"🌐 图片访问URL: {image_url}")
         
         return image_url
@@ -288,21 +232,22 @@ def build_prompt_from_storyboard(data: dict) -> str:
     return prompt
 
 
-async def parse_panel_elements_dialogues(db_client, panel_elements_data, character_appearance=""):
+async def parse_panel_elements_dialogues(panel_elements_data, character_appearance="", project_id=None):
     """
     解析 panel_elements 字段中的对话数据，并关联 characters 表
     
     修改说明：
     - 从 panel_elements (jsonb) 字段读取对话数据
     - 提取每个对话的 dialogue 和 characterid
-    - 通过 characterid 查询 characters 表获取角色名称
+    - 通过 character_resolver 一次性解析所有 characterid 对应的角色名称
+      （项目角色名单有缓存，批量生成时所有分镜共用，不再每条对话查询一次）
     - 根据 character_appearance 描述智能推断对话框位置
     - 返回包含角色名称、对话内容和位置的结构化数据
     
     参数：
-        conn: 数据库连接
         panel_elements_data: panel_elements 字段的 jsonb 数据
         character_appearance: 角色外观描述（用于推断位置）
+        project_id: 分镜所属项目ID（用于使用项目角色名单缓存）
     
     返回：
         list: 对话列表，每个元素包含 {speaker, text, bubble_type, position}
@@ -326,30 +271,38 @@ async def parse_panel_elements_dialogues(db_client, panel_elements_data, charact
         print(f"📝 解析 panel_elements，共 {len(panel_elements)} 个元素")
         print(f"📍 角色位置描述: {character_appearance[:50]}..." if character_appearance else "📍 无角色位置描述")
         
+        # 修改说明：支持两种格式 character_id（有下划线）和 characterid（无下划线）
+        def element_character_id(element):
+            return element.get("character_id") or element.get("characterid")
+        
+        # 一次性解析所有有对话的元素引用的角色名称
+        character_names = {}
+        character_ids = [
+            element_character_id(element) for element in panel_elements
+            if element.get("dialogue", "").strip() and element_character_id(element)
+        ]
+        if character_ids:
+            try:
+                character_names = await character_resolver.resolve(character_ids, project_id)
+            except Exception as e:
+                print(f"   ❌ 查询角色失败: {e}")
+        
         for idx, element in enumerate(panel_elements):
             dialogue_text = element.get("dialogue", "").strip()
-            # 修改说明：支持两种格式 character_id（有下划线）和 characterid（无下划线）
-            character_id = element.get("character_id") or element.get("characterid")
+            character_id = element_character_id(element)
             
             if not dialogue_text:
                 continue
             
-            # 查询角色名称
+            # 角色名称
             speaker_name = "旁白"  # 默认说话人
             if character_id:
-                try:
-                    char_result = (db_client.client.table('characters')
-                                  .select('name')
-                                  .eq('character_id', character_id)
-                                  .execute())
-                    if char_result.data and len(char_result.data) > 0:
-                        speaker_name = char_result.data[0]['name']
-                        print(f"   ✅ 找到角色: {speaker_name} (ID: {character_id})")
-                    else:
-                        print(f"   ⚠️ 未找到角色ID: {character_id}，使用默认")
-                        print(f"   💡 请检查 characters 表中是否存在这个ID")
-                except Exception as e:
-                    print(f"   ❌ 查询角色失败: {e}")
+                if character_id in character_names:
+                    speaker_name = character_names[character_id]
+                    print(f"   ✅ 找到角色: {speaker_name} (ID: {character_id})")
+                else:
+                    print(f"   ⚠️ 未找到角色ID: {character_id}，使用默认")
+                    print(f"   💡 请检查 characters 表中是否存在这个ID")
             
             # 智能推断对话框位置
             # 修改说明：根据角色在场景中的位置描述，智能分配对话框位置
@@ -415,11 +368,11 @@ async def list_storyboards(limit: int = 10, offset: int = 0):
             raise HTTPException(status_code=500, detail="数据库未连接")
         
         # 查询总数
-        count_result = db_client.client.table('storyboards').select('*', count='exact').execute()
+        count_result = await db_client.client.table('storyboards').select('*', count='exact').execute()
         total_count = count_result.count
         
         # 查询分页数据
-        result = (db_client.client.table('storyboards')
+        result = await (db_client.client.table('storyboards')
                  .select('*')
                  .order('created_at', desc=True)
                  .limit(limit)
@@ -465,7 +418,7 @@ async def get_storyboard(storyboard_id: str):
     
     try:
         # 使用 Supabase 客户端查询
-        result = (db_client.client.table('storyboards')
+        result = await (db_client.client.table('storyboards')
                  .select('*')
                  .eq('storyboard_id', storyboard_id)
                  .execute())
@@ -488,6 +441,112 @@ async def get_storyboard(storyboard_id: str):
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
 
+async def render_storyboard_image(storyboard_id: str, storyboard_data: dict, size: str = "1024x1024", style: str = "vivid") -> Optional[dict]:
+    """
+    根据一条分镜数据生成配图（含对话框），并保存到本地
+    
+    参数：
+        storyboard_id: 分镜ID
+        storyboard_data: storyboards 表中的一行数据
+        size: 图片尺寸
+        style: 图片风格
+    
+    返回：
+        dict: 生成结果（与 /generate-from-db 接口的返回格式一致），图片生成失败时返回None
+    """
+    # 1. 构建提示词
+    prompt = build_prompt_from_storyboard({
+        "character_appearance": storyboard_data.get("character_appearance", ""),
+        "scene_and_lighting": storyboard_data.get("scene_and_lighting", ""),
+        "camera_and_composition": storyboard_data.get("camera_and_composition", ""),
+        "expression_and_action": storyboard_data.get("expression_and_action", ""),
+        "style_requirements": storyboard_data.get("style_requirements", "")
+    })
+    
+    print(f"📝 完整提示词: {prompt}")
+    
+    # 2. 调用文生图服务（生成纯画面，不含文字），返回二进制图片句柄
+    result = await text_to_image.generate_image_handle(
+        prompt=prompt,
+        size=size,
+        quality="standard",
+        style=style
+    )
+    
+    if not result:
+        return None
+    
+    image = result["image"]
+    revised_prompt = result.get("revised_prompt", prompt)
+    print(f"✅(API) 分镜图片生成成功，图片大小: {len(image)} 字节")
+    
+    # 3. 自动添加对话框（从 panel_elements 字段读取）
+    # 修改说明：
+    # - 从 panel_elements (jsonb) 字段读取对话数据
+    # - 通过 characterid 关联 characters 表获取角色名称
+    # - 根据 character_appearance 智能推断对话框位置
+    # - 将角色名称和对话内容组合后渲染到图片上
+    panel_elements_data = storyboard_data.get("panel_elements")
+    character_appearance = storyboard_data.get("character_appearance", "")
+    camera_angle = storyboard_data.get("camera_and_composition", "")
+    
+    dialogues = []
+    
+    if panel_elements_data:
+        print(f"🎨 开始解析 panel_elements 对话数据...")
+        
+        # 解析对话数据（传入角色位置描述），角色名称通过项目角色名单缓存解析
+        dialogues = await parse_panel_elements_dialogues(
+            panel_elements_data, character_appearance, storyboard_data.get("project_id")
+        )
+        
+        if dialogues:
+            print(f"🎨 开始添加 {len(dialogues)} 个对话框...")
+            
+            # 调用漫画合成器添加对话框（在渲染进程池中执行）
+            try:
+                image = await compose_dialogues_async(image, dialogues, camera_angle)
+                print(f"✅ 对话框添加成功")
+            except Exception as e:
+                print(f"⚠️ 对话框添加失败，返回原图: {e}")
+                import traceback
+                traceback.print_exc()
+                # 如果添加对话框失败，仍然返回原图
+        else:
+            print(f"ℹ️ panel_elements 中无有效对话内容")
+    else:
+        print(f"ℹ️ 无 panel_elements 数据，返回纯画面")
+    
+    # 将图片（无论是否有对话框）保存到本地，前端通过静态文件URL访问
+    # 只有保存失败时才编码为 data URL 直接返回给前端
+    try:
+        image_url = await save_image(image, storyboard_id)
+    except Exception as e:
+        print(f"⚠️ 保存图片失败，返回base64图片: {e}")
+        image_url = image.to_data_url()
+    final_image = {"url": image_url, "revised_prompt": revised_prompt}
+    
+    return {
+        "ok": True,
+        "storyboard_id": storyboard_id,
+        "storyboard_data": {
+            "original_text_snippet": storyboard_data.get("original_text_snippet", ""),
+            "character_appearance": storyboard_data.get("character_appearance", ""),
+            "scene_and_lighting": storyboard_data.get("scene_and_lighting", ""),
+            "camera_and_composition": storyboard_data.get("camera_and_composition", ""),
+            "expression_and_action": storyboard_data.get("expression_and_action", ""),
+            "style_requirements": storyboard_data.get("style_requirements", ""),
+            "panel_elements": panel_elements_data
+        },
+        "dialogues": dialogues,  # 新增：包含解析后的对话列表（含角色名称）
+        "dialogue_count": len(dialogues),
+        "prompt_used": prompt,
+        "image": final_image,
+        "has_dialogue": len(dialogues) > 0,
+        "message": "分镜图片生成成功" + (f"（已添加 {len(dialogues)} 个对话框）" if dialogues else "")
+    }
+
+
 @router.post("/generate-from-db/{storyboard_id}")
 async def generate_from_database_id(storyboard_id: str, size: str = "1024x1024"):
     """
@@ -514,7 +573,7 @@ async def generate_from_database_id(storyboard_id: str, size: str = "1024x1024")
     
     try:
         # 1. 从数据库读取分镜数据
-        result = (db_client.client.table('storyboards')
+        result = await (db_client.client.table('storyboards')
                  .select('*')
                  .eq('storyboard_id', storyboard_id)
                  .execute())
@@ -525,110 +584,12 @@ async def generate_from_database_id(storyboard_id: str, size: str = "1024x1024")
         storyboard_data = result.data[0]
         print(f"✅ 查询到分镜数据")
         
-        # 2. 构建提示词
-        prompt = build_prompt_from_storyboard({
-            "character_appearance": storyboard_data.get("character_appearance", ""),
-            "scene_and_lighting": storyboard_data.get("scene_and_lighting", ""),
-            "camera_and_composition": storyboard_data.get("camera_and_composition", ""),
-            "expression_and_action": storyboard_data.get("expression_and_action", ""),
-            "style_requirements": storyboard_data.get("style_requirements", "")
-        })
-        
-        print(f"📝 完整提示词: {prompt}")
+        # 2. 生成配图、添加对话框并保存
+        response_data = await render_storyboard_image(storyboard_id, storyboard_data, size)
         
-        # 3. 调用文生图服务（生成纯画面，不含文字）
-        result = await text_to_image.generate_image(
-            prompt=prompt,
-            size=size,
-            quality="standard",
-            style="vivid"
-        )
-        
-        if result:
-            print(f"✅(API) 分镜图片生成成功，图片URL长度: {len(result.get('url', '')) if result.get('url') else 0}")
-            
-            # 4. 自动添加对话框（从 panel_elements 字段读取）
-            # 修改说明：
-            # - 从 panel_elements (jsonb) 字段读取对话数据
-            # - 通过 characterid 关联 characters 表获取角色名称
-            # - 根据 character_appearance 智能推断对话框位置
-            # - 将角色名称和对话内容组合后渲染到图片上
-            panel_elements_data = storyboard_data.get("panel_elements")
-            character_appearance = storyboard_data.get("character_appearance", "")
-            camera_angle = storyboard_data.get("camera_and_composition", "")
-            
-            final_image = result
-            dialogues = []
-            
-            if panel_elements_data:
-                print(f"🎨 开始解析 panel_elements 对话数据...")
-                
-                # 使用数据库连接解析对话数据（传入角色位置描述）
-                # 传递 db_client 以便查询角色信息
-                dialogues = await parse_panel_elements_dialogues(db_client, panel_elements_data, character_appearance)
-                
-                if dialogues:
-                    print(f"🎨 开始添加 {len(dialogues)} 个对话框...")
-                    
-                    # 调用漫画合成器添加对话框
-                    try:
-                        final_image_with_dialogue = add_dialogues_to_image(
-                            image_base64=result["url"],
-                            dialogues=dialogues,
-                            camera_angle=camera_angle
-                        )
-                        
-                        # 更新result中的图片URL（先保持base64格式，后面统一保存）
-                        final_image = {
-                            "url": final_image_with_dialogue,
-                            "revised_prompt": result.get("revised_prompt", prompt)
-                        }
-                        
-                        print(f"✅ 对话框添加成功")
-                    except Exception as e:
-                        print(f"⚠️ 对话框添加失败，返回原图: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        # 如果添加对话框失败，仍然返回原图
-                else:
-                    print(f"ℹ️ panel_elements 中无有效对话内容")
-            else:
-                print(f"ℹ️ 无 panel_elements 数据，返回纯画面")
-            
-            # 将图片（无论是否有对话框）保存到本地
-            # 我们需要这一步，因为Base64太大了，通过代理访问本地文件
-            if final_image.get("url"):
-                try:
-                    image_url = await save_image_to_local(
-                        final_image["url"],
-                        storyboard_id
-                    )
-                    # 更新为本地URL
-                    final_image["url"] = image_url
-                except Exception as e:
-                    print(f"⚠️ 保存图片失败，返回原URL: {e}")
-            
-            response_data = {
-                "ok": True,
-                "storyboard_id": storyboard_id,
-                "storyboard_data": {
-                    "original_text_snippet": storyboard_data.get("original_text_snippet", ""),
-                    "character_appearance": storyboard_data.get("character_appearance", ""),
-                    "scene_and_lighting": storyboard_data.get("scene_and_lighting", ""),
-                    "camera_and_composition": storyboard_data.get("camera_and_composition", ""),
-                    "expression_and_action": storyboard_data.get("expression_and_action", ""),
-                    "style_requirements": storyboard_data.get("style_requirements", ""),
-                    "panel_elements": panel_elements_data
-                },
-                "dialogues": dialogues,  # 新增：包含解析后的对话列表（含角色名称）
-                "dialogue_count": len(dialogues),
-                "prompt_used": prompt,
-                "image": final_image,
-                "has_dialogue": len(dialogues) > 0,
-                "message": "分镜图片生成成功" + (f"（已添加 {len(dialogues)} 个对话框）" if dialogues else "")
-            }
-            
-            print(f"📤 返回数据: has_dialogue={response_data['has_dialogue']}, dialogue_count={len(dialogues)}")
+        if response_data:
+            final_image = response_data["image"]
+            print(f"📤 返回数据: has_dialogue={response_data['has_dialogue']}, dialogue_count={response_data['dialogue_count']}")
             print(f"📤 图片URL类型: {type(final_image.get('url') if final_image else None)}")
             
             return response_data
@@ -646,6 +607,209 @@ async def generate_from_database_id(storyboard_id: str, size: str = "1024x1024")
         raise HTTPException(status_code=500, detail=f"生成失败: {str(e)}")
 
 
+# ==================== 项目批量生成任务 ====================
+
+# 任务队列中的任务类型
+GENERATE_PROJECT_IMAGES_JOB = "generate_project_images"
+
+
+async def generate_project_images_background(
+    job_id: str,
+    attempt: int = 1,
+    max_attempts: int = 1
+):
+    """
+    并发生成批量任务中的所有分镜配图（由持久化任务队列执行）
+    
+    任务和每个分镜的状态保存在 image_jobs 中，每个分镜生成完成后立即把图片URL写回
+    storyboards.generated_image_url。进程重启或任务重试时只生成还没有完成的分镜。
+    
+    参数：
+        job_id: 批量任务ID
+        attempt: 第几次执行（由任务队列传入）
+        max_attempts: 最大执行次数
+    """
+    job = await image_jobs.get(job_id)
+    if not job:
+        print(f"⚠️ 批量任务 {job_id} 不存在，跳过")
+        return
+    
+    pending_ids = [r["storyboard_id"] for r in job["results"] if r["status"] not in DONE_PANEL_STATUSES]
+    print(f"🔄 批量任务 {job_id} 开始执行（第 {attempt} 次），待生成 {len(pending_ids)}/{job['total']} 个分镜")
+    
+    try:
+        await image_jobs.set_status(job_id, "running")
+        
+        storyboards = {}
+        if pending_ids:
+            result = await (db_client.client.table('storyboards')
+                     .select('*')
+                     .in_('storyboard_id', pending_ids)
+                     .execute())
+            storyboards = {sb["storyboard_id"]: sb for sb in result.data or []}
+        
+        semaphore = asyncio.Semaphore(job["concurrency"])
+        
+        async def generate_one(storyboard_id: str):
+            storyboard_data = storyboards.get(storyboard_id)
+            if not storyboard_data:
+                await image_jobs.update_panel(job_id, storyboard_id, status="failed", error="分镜不存在或已被删除")
+                return
+            async with semaphore:
+                await image_jobs.update_panel(job_id, storyboard_id, status="running", error=None)
+                try:
+                    response_data = await render_storyboard_image(storyboard_id, storyboard_data, job["size"], job["style"])
+                    if not response_data:
+                        await image_jobs.update_panel(job_id, storyboard_id, status="failed", error="图片生成失败")
+                        return
+                    
+                    image_url = response_data["image"].get("url")
+                    # 只持久化已保存到本地的图片URL，避免把base64写入数据库
+                    if image_url and not image_url.startswith("data:"):
+                        await update_storyboard_panel(storyboard_id, {"generated_image_url": image_url})
+                    await image_jobs.update_panel(job_id, storyboard_id, status="completed", image_url=image_url)
+                except Exception as e:
+                    print(f"❌ 批量任务中分镜 {storyboard_id} 生成失败: {e}")
+                    await image_jobs.update_panel(job_id, storyboard_id, status="failed", error=str(e))
+        
+        await asyncio.gather(*[generate_one(sid) for sid in pending_ids])
+        await image_jobs.set_status(job_id, "completed")
+    except Exception as e:
+        print(f"❌ 批量任务 {job_id} 异常: {e}")
+        # 还有重试机会时保持 pending，避免前端提前结束订阅
+        await image_jobs.set_status(job_id, "failed" if attempt >= max_attempts else "pending", str(e))
+        raise
+    
+    job = await image_jobs.get(job_id)
+    print(f"✅ 批量任务 {job_id} 结束: {job['completed']}/{job['total']} 成功")
+
+
+# 任务队列处理函数注册表（合并到 storyboard.JOB_HANDLERS 中）
+JOB_HANDLERS = {
+    GENERATE_PROJECT_IMAGES_JOB: generate_project_images_background
+}
+
+
+@router.post("/generate-project")
+async def generate_project_images(req: StoryboardImageRequest):
+    """
+    为整个项目（或指定的部分分镜）批量生成配图
+    
+    功能说明：
+    - 服务端一次性读取项目下的分镜，由持久化任务队列并发生成配图，前端无需逐个调用 /generate-from-db
+    - 立即返回 job_id，通过 /jobs/{job_id} 轮询或 /jobs/{job_id}/stream 订阅进度
+    - 任务状态保存在本地SQLite中，服务重启或由独立worker执行时也能查询进度，并从中断处继续
+    - 每个分镜生成完成后把图片URL写回 storyboards.generated_image_url
+    
+    参数：
+        req: StoryboardImageRequest - 项目ID、可选的分镜ID列表和生成参数
+    
+    返回：
+        dict: 包含 job_id 和初始任务状态
+    """
+    print(f"📦(API) 收到项目批量配图请求: project_id={req.project_id}")
+    
+    if not db_client.is_connected:
+        raise HTTPException(status_code=500, detail="数据库未连接")
+    
+    try:
+        query = (db_client.client.table('storyboards')
+                 .select('storyboard_id,generated_image_url')
+                 .eq('project_id', req.project_id))
+        if req.storyboard_ids:
+            query = query.in_('storyboard_id', req.storyboard_ids)
+        result = await query.order('source_text_id').order('panel_index').execute()
+        storyboards = result.data or []
+    except Exception as e:
+        print(f"❌(API) 查询项目分镜失败: {e}")
+        raise HTTPException(status_code=500, detail=f"查询项目分镜失败: {str(e)}")
+    
+    if not storyboards:
+        raise HTTPException(status_code=404, detail="项目下没有可生成的分镜")
+    
+    panels = []
+    for sb in storyboards:
+        if req.skip_existing and sb.get("generated_image_url"):
+            panels.append({"storyboard_id": sb["storyboard_id"], "status": "skipped", "image_url": sb["generated_image_url"]})
+        else:
+            panels.append({"storyboard_id": sb["storyboard_id"], "status": "pending"})
+    
+    concurrency = max(1, min(req.concurrency or config.image_concurrency, 10))
+    job_id = str(uuid.uuid4())
+    try:
+        await image_jobs.create(job_id, req.project_id, panels, req.size, req.style, concurrency)
+        await job_queue.enqueue(
+            GENERATE_PROJECT_IMAGES_JOB,
+            {"job_id": job_id},
+            max_attempts=config.queue_max_attempts
+        )
+    except Exception as e:
+        print(f"❌(API) 创建批量任务失败: {e}")
+        raise HTTPException(status_code=500, detail=f"创建批量任务失败: {str(e)}")
+    
+    pending_count = sum(1 for panel in panels if panel["status"] == "pending")
+    print(f"✅(API) 批量任务已创建: {job_id}，共 {len(panels)} 个分镜，待生成 {pending_count} 个")
+    return {"ok": True, "job": await image_jobs.get(job_id)}
+
+
+async def _get_job_or_404(job_id: str) -> Dict[str, Any]:
+    job = await image_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_image_job(job_id: str):
+    """
+    查询批量配图任务进度（轮询方式）
+    
+    参数：
+        job_id: 任务ID
+    
+    返回：
+        dict: 任务状态、计数和每个分镜的结果
+    """
+    job = await _get_job_or_404(job_id)
+    return {"ok": True, "job": job}
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_image_job(job_id: str):
+    """
+    订阅批量配图任务进度（Server-Sent Events）
+    
+    每当有分镜状态变化时推送一次完整的任务状态，任务结束后关闭连接。
+    任务可能由其他进程（独立worker）执行，进度从共享的SQLite中读取。
+    
+    参数：
+        job_id: 任务ID
+    """
+    job = await _get_job_or_404(job_id)
+    
+    async def event_stream():
+        current = job
+        while True:
+            yield f"data: {json.dumps(current, ensure_ascii=False)}\n\n"
+            if current["status"] in TERMINAL_STATUSES:
+                break
+            seq = current["seq"]
+            while True:
+                latest = await image_jobs.wait_for_update(job_id, seq, timeout=15.0)
+                if latest is None:
+                    return
+                if latest["seq"] > seq:
+                    current = latest
+                    break
+                yield ": heartbeat\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/generate-from-fields")
 async def generate_from_fields(req: SingleStoryboardImageRequest):
     """
@@ -743,6 +907,24 @@ async def test_prompt_build(req: SingleStoryboardImageRequest):
     }
 
 
+@router.get("/image-store/stats")
+async def image_store_stats():
+    """
+    图片存储统计：图片文件数、总字节数、被分镜引用的数量
+    """
+    return {"ok": True, "stats": await image_store.stats()}
+
+
+@router.post("/image-store/gc")
+async def image_store_gc():
+    """
+    立即回收没有被任何分镜引用的图片（刚写入的图片在宽限期内保留）
+    """
+    result = await image_store.gc()
+    print(f"🧹 图片存储回收完成: 删除 {result['removed']} 个文件，释放 {result['freed_bytes']} 字节")
+    return {"ok": True, **result}
+
+
 @router.get("/health")
 async def health_check():
     """
@@ -77,6 +77,8 @@ class StoryboardImagesRequest(BaseModel):
     scenes: List[dict] = Field(..., description="场景列表，每项包含index和description")
     size: str = Field(default="1024x1024", description="图片尺寸")
     style: str = Field(default="vivid", description="图片风格")
+    concurrency: Optional[int] = Field(default=None, ge=1, le=10, description="最大并发生成数，不填使用服务端配置")
+    scene_timeout: Optional[float] = Field(default=None, gt=0, le=600, description="单个场景超时时间（秒），不填使用服务端配置")
     
     model_config = {
         "json_schema_extra": {
@@ -228,9 +230,10 @@ async def generate_storyboard_images(req: StoryboardImagesRequest):
     分镜配图生成接口
     
     功能说明：
-    - 为多个分镜场景批量生成配图
+    - 为多个分镜场景并发生成配图
     - 适用于小说转漫画的场景
-    - 每个场景生成一张图片
+    - 每个场景生成一张图片，结果按场景顺序返回
+    - 部分场景失败时仍返回成功的图片，并在 failed 中列出失败场景及原因
     
     使用场景：
     - 漫画分镜配图
@@ -257,10 +260,13 @@ async def generate_storyboard_images(req: StoryboardImagesRequest):
         results = await text_to_image.generate_storyboard_images(
             scenes=req.scenes,
             size=req.size,
-            style=req.style
+            style=req.style,
+            concurrency=req.concurrency,
+            scene_timeout=req.scene_timeout
         )
         
         success_count = sum(1 for r in results if r.get("url"))
+        failed = [{"index": r["index"], "error": r.get("error")} for r in results if not r.get("url")]
         print(f"✅(API) 分镜配图完成，成功: {success_count}/{len(req.scenes)}")
         
         return {
@@ -268,6 +274,8 @@ async def generate_storyboard_images(req: StoryboardImagesRequest):
             "storyboard": results,
             "total": len(results),
             "success_count": success_count,
+            "failed_count": len(failed),
+            "failed": failed,
             "message": f"分镜配图完成，成功生成 {success_count}/{len(req.scenes)} 张"
         }
     
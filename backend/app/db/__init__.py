@@ -4,6 +4,7 @@
 """
 
 from .client import db_client, init_database, close_database
+from .character_names import character_resolver
 from .models import (
     User, Project, SourceText, Character, Storyboard, StoryboardPage, StoryboardPanel,
     ProjectVisibility, TableNames, UserFields, ProjectFields, SourceTextFields, CharacterFields, StoryboardFields
@@ -12,28 +13,32 @@ from .crud import (
     # 用户操作
     create_user, get_user_by_id, get_user_by_username, get_user_by_email, update_user_credit,
     # 项目操作
-    create_project, get_project_by_id, get_projects_by_user, update_project, delete_project,
+    create_project, get_project_by_id, get_projects_by_user, get_project_summaries_by_user, update_project, delete_project,
     # 原文操作
-    create_source_text, get_source_texts_by_project, update_source_text_status, update_source_text, get_source_text_by_id,
+    create_source_text, create_source_texts_batch, get_next_source_text_order, get_source_texts_by_project, get_source_text_summaries_by_project, get_project_chapter_summaries, update_source_text_status, update_source_text, get_source_text_by_id,
     # 分镜操作
-    create_storyboard_panel, get_storyboards_by_text_id, update_storyboard_panel, get_storyboard_by_id, delete_storyboard_panel,
+    create_storyboard_panel, create_storyboard_panels_batch, get_storyboards_by_text_id, get_storyboard_summaries_by_text_id, update_storyboard_panel, get_storyboard_by_id, delete_storyboard_panel, delete_storyboards_by_text_id,
+    delete_storyboard_panels, update_storyboard_panel_indexes,
     # 角色操作
-    create_character, get_characters_by_project, update_character, delete_character,
+    create_character, create_characters_batch, get_characters_by_project, update_character, delete_character,
     # 公共查询
-    get_public_projects, search_projects, get_user_stats
+    get_public_projects, get_public_projects_page, search_projects, get_user_stats
 )
 
 __all__ = [
     # 客户端
     'db_client', 'init_database', 'close_database',
+    # 角色名称解析（按项目缓存）
+    'character_resolver',
     # 模型
     'User', 'Project', 'SourceText', 'Character', 'Storyboard', 'StoryboardPage', 'StoryboardPanel',
     'ProjectVisibility', 'TableNames', 'UserFields', 'ProjectFields', 'SourceTextFields', 'CharacterFields', 'StoryboardFields',
     # CRUD操作
     'create_user', 'get_user_by_id', 'get_user_by_username', 'get_user_by_email', 'update_user_credit',
-    'create_project', 'get_project_by_id', 'get_projects_by_user', 'update_project', 'delete_project',
-    'create_source_text', 'get_source_texts_by_project', 'update_source_text_status', 'update_source_text', 'get_source_text_by_id',
-    'create_storyboard_panel', 'get_storyboards_by_text_id', 'update_storyboard_panel', 'get_storyboard_by_id', 'delete_storyboard_panel',
-    'create_character', 'get_characters_by_project', 'update_character', 'delete_character',
-    'get_public_projects', 'search_projects', 'get_user_stats'
+    'create_project', 'get_project_by_id', 'get_projects_by_user', 'get_project_summaries_by_user', 'update_project', 'delete_project',
+    'create_source_text', 'create_source_texts_batch', 'get_next_source_text_order', 'get_source_texts_by_project', 'get_source_text_summaries_by_project', 'get_project_chapter_summaries', 'update_source_text_status', 'update_source_text', 'get_source_text_by_id',
+    'create_storyboard_panel', 'create_storyboard_panels_batch', 'get_storyboards_by_text_id', 'get_storyboard_summaries_by_text_id', 'update_storyboard_panel', 'get_storyboard_by_id', 'delete_storyboard_panel', 'delete_storyboards_by_text_id',
+    'delete_storyboard_panels', 'update_storyboard_panel_indexes',
+    'create_character', 'create_characters_batch', 'get_characters_by_project', 'update_character', 'delete_character',
+    'get_public_projects', 'get_public_projects_page', 'search_projects', 'get_user_stats'
 ]
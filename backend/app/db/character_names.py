@@ -0,0 +1,156 @@
+"""
+角色名称解析器
+按项目缓存角色名单（character_id -> name），渲染对话框时一次性解析一组角色ID
+
+- 同一项目的名单只查询一次，批量生成配图时所有分镜共用
+- 名单中没有的ID（如刚创建的角色、其他项目的角色）合并成一次 IN 查询，
+  查询结果（包括不存在的ID）同样缓存，AI写错的ID不会让每个分镜都重新查询
+- 角色被修改、删除、创建或项目被删除时，crud 会调用 invalidate_* 使缓存失效；
+  其他进程（如独立worker）中的修改无法通知到这里，缓存最多保留 ROSTER_TTL_SECONDS 秒
+"""
+import asyncio
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from .client import db_client
+from .models import TableNames, CharacterFields
+
+# 名单缓存的最长保留时间（秒）
+ROSTER_TTL_SECONDS = 300
+
+
+class CharacterResolver:
+    """按项目缓存的角色名称解析器"""
+
+    def __init__(self, ttl_seconds: float = ROSTER_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        # project_id -> (加载时间, {character_id: name})
+        self._rosters: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        # character_id -> project_id，用于按角色ID使缓存失效
+        self._owners: Dict[str, str] = {}
+        # 名单之外查询过的ID：character_id -> (查询时间, name)，name 为 None 表示不存在
+        self._outside: Dict[str, Tuple[float, Optional[str]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._outside_lock = asyncio.Lock()
+        self.hits = 0
+        self.queries = 0
+
+    def _cached_roster(self, project_id: str) -> Optional[Dict[str, str]]:
+        entry = self._rosters.get(project_id)
+        if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+            return entry[1]
+        return None
+
+    async def get_roster(self, project_id: str) -> Dict[str, str]:
+        """
+        获取项目的角色名单 {character_id: name}
+
+        并发请求同一项目时只查询一次数据库。
+        """
+        roster = self._cached_roster(project_id)
+        if roster is not None:
+            self.hits += 1
+            return roster
+        lock = self._locks.setdefault(project_id, asyncio.Lock())
+        async with lock:
+            roster = self._cached_roster(project_id)
+            if roster is not None:
+                self.hits += 1
+                return roster
+            self.queries += 1
+            rows = await db_client.select(
+                TableNames.CHARACTERS,
+                columns=f"{CharacterFields.CHARACTER_ID},{CharacterFields.NAME}",
+                filters={CharacterFields.PROJECT_ID: project_id}
+            )
+            roster = {row[CharacterFields.CHARACTER_ID]: row[CharacterFields.NAME] for row in rows}
+            self._rosters[project_id] = (time.monotonic(), roster)
+            for character_id in roster:
+                self._owners[character_id] = project_id
+            return roster
+
+    async def resolve(self, character_ids: Iterable[str], project_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        把一组角色ID解析为角色名称
+
+        Args:
+            character_ids: 角色ID列表（可重复）
+            project_id: 所属项目ID；提供时优先使用项目名单缓存
+
+        Returns:
+            Dict[str, str]: {character_id: name}，数据库中不存在的ID不包含在结果中
+        """
+        wanted = {character_id for character_id in character_ids if character_id}
+        if not wanted:
+            return {}
+
+        names: Dict[str, str] = {}
+        if project_id:
+            roster = await self.get_roster(project_id)
+            names = {character_id: roster[character_id] for character_id in wanted if character_id in roster}
+
+        if wanted - names.keys():
+            # 串行查询名单之外的ID，并发渲染的分镜引用同一个错误ID时只查询一次
+            async with self._outside_lock:
+                names.update(await self._resolve_outside(wanted - names.keys()))
+        return names
+
+    async def _resolve_outside(self, character_ids: Set[str]) -> Dict[str, str]:
+        """解析项目名单之外的ID：先查缓存，剩下的合并成一次 IN 查询"""
+        now = time.monotonic()
+        names: Dict[str, str] = {}
+        missing = set()
+        for character_id in character_ids:
+            entry = self._outside.get(character_id)
+            if entry and now - entry[0] < self.ttl_seconds:
+                if entry[1] is not None:
+                    names[character_id] = entry[1]
+            else:
+                missing.add(character_id)
+        if not missing:
+            return names
+
+        self.queries += 1
+        rows = await db_client.select(
+            TableNames.CHARACTERS,
+            columns=f"{CharacterFields.CHARACTER_ID},{CharacterFields.PROJECT_ID},{CharacterFields.NAME}",
+            filters={CharacterFields.CHARACTER_ID: sorted(missing)}
+        )
+        found = {}
+        for row in rows:
+            character_id = row[CharacterFields.CHARACTER_ID]
+            found[character_id] = row[CharacterFields.NAME]
+            # 名单加载后新创建的角色，补充到已缓存的名单中
+            cached = self._cached_roster(row[CharacterFields.PROJECT_ID])
+            if cached is not None:
+                cached[character_id] = row[CharacterFields.NAME]
+            self._owners[character_id] = row[CharacterFields.PROJECT_ID]
+        for character_id in missing:
+            self._outside[character_id] = (now, found.get(character_id))
+        names.update(found)
+        return names
+
+    def invalidate_project(self, project_id: str):
+        """使项目的角色名单缓存失效（新创建的角色可能正是之前查询过的不存在的ID）"""
+        self._rosters.pop(project_id, None)
+        self._outside = {
+            character_id: entry for character_id, entry in self._outside.items()
+            if entry[1] is not None and self._owners.get(character_id) != project_id
+        }
+        for character_id in [cid for cid, pid in self._owners.items() if pid == project_id]:
+            del self._owners[character_id]
+
+    def invalidate_character(self, character_id: str):
+        """使角色所在项目的名单缓存失效（角色被修改或删除时调用）"""
+        self._outside.pop(character_id, None)
+        project_id = self._owners.get(character_id)
+        if project_id:
+            self.invalidate_project(project_id)
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计：已缓存的项目数、缓存命中次数、数据库查询次数"""
+        return {"projects": len(self._rosters), "hits": self.hits, "queries": self.queries}
+
+
+# 全局角色名称解析器
+character_resolver = CharacterResolver()
@@ -1,9 +1,9 @@
 """
 Supabase数据库客户端管理
-使用Supabase SDK进行HTTP API连接
+使用Supabase异步SDK进行HTTP API连接，所有查询都不会阻塞事件循环
 """
 import asyncio
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Sequence, Tuple, Union
 import sys
 import os
 
@@ -12,7 +12,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 from config import config
 
 try:
-    from supabase import create_client, Client
+    from supabase import acreate_client, AsyncClient
 except ImportError:
     print("❌ 请安装Supabase SDK: pip install supabase")
     sys.exit(1)
@@ -22,7 +22,7 @@ class SupabaseClient:
     """Supabase数据库客户端"""
     
     def __init__(self):
-        self.client: Optional[Client] = None
+        self.client: Optional[AsyncClient] = None
         self._connected = False
     
     async def connect(self) -> bool:
@@ -37,8 +37,9 @@ class SupabaseClient:
             return False
         
         try:
-            # 创建Supabase客户端
-            self.client = create_client(
+            # 创建Supabase异步客户端
+            # 注意：同步客户端的 execute() 会阻塞整个事件循环，这里必须使用异步客户端
+            self.client = await acreate_client(
                 config.supabase_url,
                 config.supabase_service_role_key  # 使用service_role_key进行服务端操作
             )
@@ -55,7 +56,11 @@ class SupabaseClient:
     async def close(self):
         """关闭Supabase连接"""
         if self.client:
-            # Supabase客户端不需要显式关闭
+            # 关闭PostgREST底层的HTTP连接池
+            try:
+                await self.client.postgrest.aclose()
+            except Exception as e:
+                print(f"⚠️ 关闭PostgREST连接失败: {e}")
             self._connected = False
             print("✅ Supabase客户端已关闭")
     
@@ -71,7 +76,7 @@ class SupabaseClient:
                 return False
             
             # 尝试查询用户表来测试连接
-            result = self.client.table('users').select('*').limit(1).execute()
+            result = await self.client.table('users').select('*').limit(1).execute()
             return True
             
         except Exception as e:
@@ -83,15 +88,32 @@ class SupabaseClient:
         """检查是否已连接"""
         return self._connected and self.client is not None
     
+    @staticmethod
+    def _apply_filters(query, filters: Optional[Dict[str, Any]]):
+        """添加过滤条件：列表/元组/集合值使用 IN 匹配，其余值使用等值匹配"""
+        for key, value in (filters or {}).items():
+            if isinstance(value, (list, tuple, set)):
+                query = query.in_(key, list(value))
+            else:
+                query = query.eq(key, value)
+        return query
+    
+    @staticmethod
+    def _columns(columns: Union[str, Sequence[str]]) -> str:
+        """查询列：字符串原样使用（如 "*"、"id,name,child(count)"），列名列表用逗号连接"""
+        if isinstance(columns, str):
+            return columns
+        return ",".join(columns)
+    
     # 便捷方法，封装Supabase操作
-    async def select(self, table: str, columns: str = "*", filters: Optional[Dict] = None) -> List[Dict]:
+    async def select(self, table: str, columns: Union[str, Sequence[str]] = "*", filters: Optional[Dict] = None) -> List[Dict]:
         """
         查询数据
         
         Args:
             table: 表名
-            columns: 查询列
-            filters: 过滤条件
+            columns: 查询列（字符串或列名列表），只查询需要的列可以显著减少返回的数据量
+            filters: 过滤条件（列表值表示 IN 匹配）
             
         Returns:
             List[Dict]: 查询结果
@@ -100,19 +122,55 @@ class SupabaseClient:
             raise Exception("Supabase未连接")
         
         try:
-            query = self.client.table(table).select(columns)
-            
-            if filters:
-                for key, value in filters.items():
-                    query = query.eq(key, value)
-            
-            result = query.execute()
+            query = self._apply_filters(self.client.table(table).select(self._columns(columns)), filters)
+            result = await query.execute()
             return result.data
             
         except Exception as e:
             print(f"❌ 查询失败: {e}")
             raise
     
+    async def select_page(
+        self,
+        table: str,
+        columns: Union[str, Sequence[str]] = "*",
+        filters: Optional[Dict] = None,
+        condition: Optional[str] = None,
+        order: Optional[List[Tuple]] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[Dict]:
+        """
+        分页查询（过滤、排序、分页都在数据库中完成）
+    
+        Args:
+            table: 表名
+            columns: 查询列（字符串或列名列表）
+            filters: 过滤条件（列表值表示 IN 匹配）
+            condition: 额外的PostgREST逻辑条件（or/and 表达式，不含外层括号），如 "title.ilike.*a*,description.ilike.*a*"
+            order: 排序列表 [(列名, 是否降序)] 或 [(列名, 是否降序, 空值是否排在最前)]，不指定空值顺序时使用数据库默认
+            limit: 返回行数
+            offset: 跳过行数
+    
+        Returns:
+            List[Dict]: 查询结果
+        """
+        if not self._connected or not self.client:
+            raise Exception("Supabase未连接")
+    
+        try:
+            query = self._apply_filters(self.client.table(table).select(self._columns(columns)), filters)
+            if condition:
+                query = query.or_(condition)
+            for column, descending, *nulls_first in order or []:
+                query = query.order(column, desc=descending, nullsfirst=nulls_first[0] if nulls_first else None)
+            result = await query.range(offset, offset + limit - 1).execute()
+            return result.data
+    
+        except Exception as e:
+            print(f"❌ 分页查询失败: {e}")
+            raise
+    
     async def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """
         插入数据
@@ -128,13 +186,38 @@ class SupabaseClient:
             raise Exception("Supabase未连接")
         
         try:
-            result = self.client.table(table).insert(data).execute()
+            result = await self.client.table(table).insert(data).execute()
             return result.data[0] if result.data else {}
             
         except Exception as e:
             print(f"❌ 插入失败: {e}")
             raise
     
+    async def insert_many(self, table: str, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量插入数据（单次请求的多行插入，要么全部成功要么全部失败）
+        
+        Args:
+            table: 表名
+            data: 插入数据列表
+            
+        Returns:
+            List[Dict[str, Any]]: 插入结果
+        """
+        if not self._connected or not self.client:
+            raise Exception("Supabase未连接")
+        
+        if not data:
+            return []
+        
+        try:
+            result = await self.client.table(table).insert(data).execute()
+            return result.data or []
+            
+        except Exception as e:
+            print(f"❌ 批量插入失败: {e}")
+            raise
+    
     async def update(self, table: str, data: Dict[str, Any], filters: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         更新数据
@@ -142,7 +225,7 @@ class SupabaseClient:
         Args:
             table: 表名
             data: 更新数据
-            filters: 过滤条件
+            filters: 过滤条件（列表值表示 IN 匹配）
             
         Returns:
             List[Dict[str, Any]]: 更新结果
@@ -151,12 +234,8 @@ class SupabaseClient:
             raise Exception("Supabase未连接")
         
         try:
-            query = self.client.table(table).update(data)
-            
-            for key, value in filters.items():
-                query = query.eq(key, value)
-            
-            result = query.execute()
+            query = self._apply_filters(self.client.table(table).update(data), filters)
+            result = await query.execute()
             return result.data
             
         except Exception as e:
@@ -169,7 +248,7 @@ class SupabaseClient:
         
         Args:
             table: 表名
-            filters: 过滤条件
+            filters: 过滤条件（列表值表示 IN 匹配）
             
         Returns:
             List[Dict[str, Any]]: 删除结果
@@ -178,12 +257,8 @@ class SupabaseClient:
             raise Exception("Supabase未连接")
         
         try:
-            query = self.client.table(table).delete()
-            
-            for key, value in filters.items():
-                query = query.eq(key, value)
-            
-            result = query.execute()
+            query = self._apply_filters(self.client.table(table).delete(), filters)
+            result = await query.execute()
             return result.data
             
         except Exception as e:
@@ -206,12 +281,12 @@ class SupabaseClient:
             raise Exception("Supabase未连接")
         
         try:
-            query = self.client.table(table).upsert(data)
-            
             if on_conflict:
-                query = query.on_conflict(on_conflict)
+                query = self.client.table(table).upsert(data, on_conflict=on_conflict)
+            else:
+                query = self.client.table(table).upsert(data)
             
-            result = query.execute()
+            result = await query.execute()
             return result.data
             
         except Exception as e:
@@ -234,7 +309,7 @@ async def close_database():
 
 
 # 便捷函数
-async def select_data(table: str, columns: str = "*", filters: Optional[Dict] = None) -> List[Dict]:
+async def select_data(table: str, columns: Union[str, Sequence[str]] = "*", filters: Optional[Dict] = None) -> List[Dict]:
     """查询数据"""
     return await db_client.select(table, columns, filters)
 
@@ -244,6 +319,11 @@ async def insert_data(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
     return await db_client.insert(table, data)
 
 
+async def insert_many_data(table: str, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """批量插入数据"""
+    return await db_client.insert_many(table, data)
+
+
 async def update_data(table: str, data: Dict[str, Any], filters: Dict[str, Any]) -> List[Dict[str, Any]]:
     """更新数据"""
     return await db_client.update(table, data, filters)
@@ -2,12 +2,16 @@
 数据库增删改查操作
 使用Supabase REST API进行数据操作
 """
+import asyncio
+import base64
 import json
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 import uuid
 
 from .client import db_client
+from .character_names import character_resolver
+from app.services.image_store import image_store
 from .models import (
     User, Project, SourceText, Character, Storyboard, StoryboardPanel,
     TableNames, UserFields, ProjectFields, SourceTextFields, CharacterFields, StoryboardFields,
@@ -15,6 +19,43 @@ from .models import (
 )
 
 
+# ==================== 批量写入辅助 ====================
+
+async def _bulk_insert(table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    批量插入多行数据
+    
+    先用一次多行插入完成全部写入（单条语句，原子提交）；
+    如果整批失败，再逐行重试，只跳过真正失败的行。
+    
+    Args:
+        table: 表名
+        rows: 行数据列表
+        
+    Returns:
+        List[Dict[str, Any]]: 成功插入的行（保持输入顺序）
+    """
+    if not rows:
+        return []
+    
+    try:
+        return await db_client.insert_many(table, rows)
+    except Exception as e:
+        print(f"⚠️ 批量插入 {table} 失败，逐行重试: {e}")
+    
+    inserted = []
+    for row in rows:
+        try:
+            result = await db_client.insert(table, row)
+            if result:
+                inserted.append(result)
+        except Exception as e:
+            print(f"❌ 插入 {table} 单行失败: {e}")
+    
+    print(f"   逐行重试完成: {len(inserted)}/{len(rows)} 行成功")
+    return inserted
+
+
 # ==================== 用户相关操作 ====================
 
 async def create_user(username: str, email: str, hashed_password: str) -> Optional[User]:
@@ -186,6 +227,27 @@ async def get_projects_by_user(user_id: str) -> List[Project]:
         return []
 
 
+# 项目列表视图需要的列（不含风格提示词）
+PROJECT_SUMMARY_COLUMNS = [
+    ProjectFields.PROJECT_ID, ProjectFields.USER_ID, ProjectFields.TITLE, ProjectFields.DESCRIPTION,
+    ProjectFields.VISIBILITY, ProjectFields.UPLOAD_METHOD, ProjectFields.CREATED_AT, ProjectFields.UPDATED_AT
+]
+
+
+async def get_project_summaries_by_user(user_id: str) -> List[Project]:
+    """获取用户的所有项目（只查询列表视图需要的列，default_style_prompt 为None）"""
+    try:
+        results = await db_client.select(
+            TableNames.PROJECTS,
+            columns=PROJECT_SUMMARY_COLUMNS,
+            filters={ProjectFields.USER_ID: user_id}
+        )
+        return [Project.from_dict(row) for row in results]
+    except Exception as e:
+        print(f"❌ 获取用户项目失败: {e}")
+        return []
+
+
 async def update_project(
     project_id: str, 
     title: Optional[str] = None,
@@ -221,16 +283,29 @@ async def update_project(
 
 
 async def delete_project(project_id: str) -> bool:
-    """删除项目（级联删除相关数据）"""
+    """删除项目（级联删除相关数据），并释放项目下分镜对配图的引用"""
     try:
+        # 分镜由数据库级联删除，删除前先记下分镜ID，用于释放图片引用
+        storyboards = await db_client.select(
+            TableNames.STORYBOARDS,
+            StoryboardFields.STORYBOARD_ID,
+            {StoryboardFields.PROJECT_ID: project_id}
+        )
         await db_client.delete(
             TableNames.PROJECTS,
             {ProjectFields.PROJECT_ID: project_id}
         )
-        return True
+        character_resolver.invalidate_project(project_id)
     except Exception as e:
         print(f"❌ 删除项目失败: {e}")
         return False
+    
+    try:
+        await image_store.release([row[StoryboardFields.STORYBOARD_ID] for row in storyboards])
+    except Exception as e:
+        # 项目已删除，释放失败只会留下无用的图片文件，不影响删除结果
+        print(f"⚠️ 释放项目 {project_id} 的图片引用失败: {e}")
+    return True
 
 
 # ==================== 原文相关操作 ====================
@@ -278,6 +353,51 @@ async def create_source_text(
         return None
 
 
+async def create_source_texts_batch(project_id: str, texts_data: List[Dict[str, Any]]) -> List[SourceText]:
+    """
+    批量创建原文记录（整本小说按章节入库时使用，一次请求写入一批章节）
+    
+    Args:
+        project_id: 项目ID
+        texts_data: 原文数据列表，每项包含 title、raw_content，可选 order_index、chapter_number、chapter_name
+        
+    Returns:
+        List[SourceText]: 创建的原文列表，顺序与输入一致
+    """
+    rows = [
+        {
+            SourceTextFields.TEXT_ID: str(uuid.uuid4()),
+            SourceTextFields.PROJECT_ID: project_id,
+            SourceTextFields.TITLE: text_data["title"],
+            SourceTextFields.RAW_CONTENT: text_data["raw_content"],
+            SourceTextFields.ORDER_INDEX: text_data.get("order_index", 0),
+            SourceTextFields.CHAPTER_NUMBER: text_data.get("chapter_number"),
+            SourceTextFields.CHAPTER_NAME: text_data.get("chapter_name")
+        }
+        for text_data in texts_data
+    ]
+    try:
+        results = await _bulk_insert(TableNames.SOURCE_TEXTS, rows)
+        return [SourceText.from_dict(row) for row in results]
+    except Exception as e:
+        print(f"❌ 批量创建原文失败: {e}")
+        return []
+
+
+async def get_next_source_text_order(project_id: str) -> int:
+    """获取项目中下一个章节的 order_index（现有最大值加一，只查询 order_index 列）"""
+    try:
+        results = await db_client.select(
+            TableNames.SOURCE_TEXTS,
+            columns=SourceTextFields.ORDER_INDEX,
+            filters={SourceTextFields.PROJECT_ID: project_id}
+        )
+        return max((row.get(SourceTextFields.ORDER_INDEX) or 0 for row in results), default=-1) + 1
+    except Exception as e:
+        print(f"❌ 获取章节排序失败: {e}")
+        return 0
+
+
 async def get_source_texts_by_project(project_id: str) -> List[SourceText]:
     """获取项目的所有原文"""
     try:
@@ -291,8 +411,108 @@ async def get_source_texts_by_project(project_id: str) -> List[SourceText]:
         return []
 
 
+# 原文列表视图需要的列（不含原文内容 raw_content，整本小说的原文可能有数MB）
+SOURCE_TEXT_SUMMARY_COLUMNS = [
+    SourceTextFields.TEXT_ID, SourceTextFields.PROJECT_ID, SourceTextFields.TITLE,
+    SourceTextFields.ORDER_INDEX, SourceTextFields.CHAPTER_NUMBER, SourceTextFields.CHAPTER_NAME,
+    SourceTextFields.CREATED_AT, SourceTextFields.PROCESSING_STATUS, SourceTextFields.ERROR_MESSAGE
+]
+
+
+async def get_source_text_summaries_by_project(project_id: str) -> List[SourceText]:
+    """获取项目的所有原文（不读取原文内容，raw_content 为空字符串）"""
+    try:
+        results = await db_client.select(
+            TableNames.SOURCE_TEXTS,
+            columns=SOURCE_TEXT_SUMMARY_COLUMNS,
+            filters={SourceTextFields.PROJECT_ID: project_id}
+        )
+        return [SourceText.from_dict(row) for row in results]
+    except Exception as e:
+        print(f"❌ 获取项目原文失败: {e}")
+        return []
+
+
+async def get_project_chapter_summaries(project_id: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    获取项目的章节列表及每章的分镜数量（一次查询）
+    
+    只读取章节列表需要的列，分镜数量通过外键嵌入的 count 聚合在数据库中统计，
+    不读取原文内容和分镜数据。
+    
+    Args:
+        project_id: 项目ID
+        
+    Returns:
+        Optional[List[Dict[str, Any]]]: 按 order_index、chapter_number 排序的章节行
+            （分镜数量在 storyboard_count 字段），查询失败时返回None
+    """
+    columns = [
+        SourceTextFields.TEXT_ID, SourceTextFields.TITLE, SourceTextFields.ORDER_INDEX,
+        SourceTextFields.CHAPTER_NUMBER, SourceTextFields.CHAPTER_NAME,
+        SourceTextFields.PROCESSING_STATUS, SourceTextFields.CREATED_AT,
+        f"{TableNames.STORYBOARDS}(count)"
+    ]
+    try:
+        results = await db_client.select(
+            TableNames.SOURCE_TEXTS,
+            columns=columns,
+            filters={SourceTextFields.PROJECT_ID: project_id}
+        )
+    except Exception as e:
+        print(f"❌ 获取项目章节失败: {e}")
+        return None
+    
+    for row in results:
+        # 嵌入聚合的返回格式为 [{"count": n}]
+        counts = row.pop(TableNames.STORYBOARDS, None) or []
+        row["storyboard_count"] = counts[0].get("count", 0) if counts else 0
+    results.sort(key=lambda row: (
+        row.get(SourceTextFields.ORDER_INDEX) or 0,
+        row.get(SourceTextFields.CHAPTER_NUMBER) or 0
+    ))
+    return results
+
+
 # ==================== 分镜相关操作 ====================
 
+def _build_storyboard_row(
+    project_id: str,
+    source_text_id: str,
+    panel_index: int,
+    panel_data: dict,
+    name_to_id_map: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """构建一行分镜面板数据（将 panel_elements 中的角色名称转换为角色ID）"""
+    panel_elements = panel_data.get("panel_elements", [])
+    processed_elements = []
+    
+    if panel_elements and name_to_id_map:
+        for element in panel_elements:
+            character_name = element.get("character_name")
+            dialogue = element.get("dialogue")
+            character_id = name_to_id_map.get(character_name) if character_name else None
+            
+            processed_elements.append({
+                "character_id": character_id,
+                "dialogue": dialogue
+            })
+    
+    return {
+        StoryboardFields.STORYBOARD_ID: str(uuid.uuid4()),
+        StoryboardFields.PROJECT_ID: project_id,
+        StoryboardFields.SOURCE_TEXT_ID: source_text_id,
+        StoryboardFields.PANEL_INDEX: panel_index,
+        StoryboardFields.ORIGINAL_TEXT_SNIPPET: panel_data.get("original_text_snippet"),
+        StoryboardFields.CHARACTER_APPEARANCE: panel_data.get("character_appearance"),
+        StoryboardFields.SCENE_AND_LIGHTING: panel_data.get("scene_and_lighting"),
+        StoryboardFields.CAMERA_AND_COMPOSITION: panel_data.get("camera_and_composition"),
+        StoryboardFields.EXPRESSION_AND_ACTION: panel_data.get("expression_and_action"),
+        StoryboardFields.STYLE_REQUIREMENTS: panel_data.get("style_requirements"),
+        StoryboardFields.PANEL_ELEMENTS: processed_elements
+    }
+
+
 async def create_storyboard_panel(
     project_id: str, 
     source_text_id: str, 
@@ -314,34 +534,9 @@ async def create_storyboard_panel(
         Optional[StoryboardPanel]: 创建的分镜面板对象或None
     """
     try:
-        # 处理 panel_elements，将角色名称转换为角色ID
-        panel_elements = panel_data.get("panel_elements", [])
-        processed_elements = []
-        
-        if panel_elements and name_to_id_map:
-            for element in panel_elements:
-                character_name = element.get("character_name")
-                dialogue = element.get("dialogue")
-                character_id = name_to_id_map.get(character_name) if character_name else None
-                
-                processed_elements.append({
-                    "character_id": character_id,
-                    "dialogue": dialogue
-                })
-        
-        storyboard_data = {
-            StoryboardFields.STORYBOARD_ID: str(uuid.uuid4()),
-            StoryboardFields.PROJECT_ID: project_id,
-            StoryboardFields.SOURCE_TEXT_ID: source_text_id,
-            StoryboardFields.PANEL_INDEX: panel_index,
-            StoryboardFields.ORIGINAL_TEXT_SNIPPET: panel_data.get("original_text_snippet"),
-            StoryboardFields.CHARACTER_APPEARANCE: panel_data.get("character_appearance"),
-            StoryboardFields.SCENE_AND_LIGHTING: panel_data.get("scene_and_lighting"),
-            StoryboardFields.CAMERA_AND_COMPOSITION: panel_data.get("camera_and_composition"),
-            StoryboardFields.EXPRESSION_AND_ACTION: panel_data.get("expression_and_action"),
-            StoryboardFields.STYLE_REQUIREMENTS: panel_data.get("style_requirements"),
-            StoryboardFields.PANEL_ELEMENTS: processed_elements
-        }
+        storyboard_data = _build_storyboard_row(
+            project_id, source_text_id, panel_index, panel_data, name_to_id_map
+        )
         result = await db_client.insert(TableNames.STORYBOARDS, storyboard_data)
         if result:
             return StoryboardPanel.from_dict(result)
@@ -351,6 +546,38 @@ async def create_storyboard_panel(
         return None
 
 
+async def create_storyboard_panels_batch(
+    project_id: str,
+    source_text_id: str,
+    panels_data: List[dict],
+    name_to_id_map: Optional[Dict[str, str]] = None,
+    start_index: int = 0
+) -> List[StoryboardPanel]:
+    """
+    批量创建分镜面板（一次请求写入所有面板）
+    
+    Args:
+        project_id: 项目ID
+        source_text_id: 原文ID
+        panels_data: 面板数据字典列表，列表顺序即 panel_index 顺序
+        name_to_id_map: 角色名称到ID的映射字典
+        start_index: 第一个面板的 panel_index
+        
+    Returns:
+        List[StoryboardPanel]: 成功创建的分镜面板列表
+    """
+    rows = [
+        _build_storyboard_row(project_id, source_text_id, start_index + i, panel_data, name_to_id_map)
+        for i, panel_data in enumerate(panels_data)
+    ]
+    try:
+        results = await _bulk_insert(TableNames.STORYBOARDS, rows)
+        return [StoryboardPanel.from_dict(row) for row in results]
+    except Exception as e:
+        print(f"❌ 批量创建分镜面板失败: {e}")
+        return []
+
+
 async def get_storyboards_by_text_id(text_id: str) -> List[StoryboardPanel]:
     """
     根据 source_text_id 获取所有分镜面板，按索引排序
@@ -374,6 +601,37 @@ async def get_storyboards_by_text_id(text_id: str) -> List[StoryboardPanel]:
         return []
 
 
+# 分镜列表视图需要的列（不含各项画面描述、对话和 panel_elements）
+STORYBOARD_SUMMARY_COLUMNS = [
+    StoryboardFields.STORYBOARD_ID, StoryboardFields.PROJECT_ID, StoryboardFields.SOURCE_TEXT_ID,
+    StoryboardFields.PANEL_INDEX, StoryboardFields.ORIGINAL_TEXT_SNIPPET, StoryboardFields.GENERATED_IMAGE_URL,
+    StoryboardFields.CHARACTER_ID, StoryboardFields.CREATED_AT, StoryboardFields.UPDATED_AT
+]
+
+
+async def get_storyboard_summaries_by_text_id(text_id: str) -> List[StoryboardPanel]:
+    """
+    根据 source_text_id 获取所有分镜面板，按索引排序（只查询列表视图需要的列）
+    
+    Args:
+        text_id: 原文ID
+        
+    Returns:
+        List[StoryboardPanel]: 分镜面板列表，未查询的描述字段为None
+    """
+    try:
+        results = await db_client.select(
+            TableNames.STORYBOARDS,
+            columns=STORYBOARD_SUMMARY_COLUMNS,
+            filters={StoryboardFields.SOURCE_TEXT_ID: text_id}
+        )
+        results.sort(key=lambda x: x.get(StoryboardFields.PANEL_INDEX, 0))
+        return [StoryboardPanel.from_dict(row) for row in results]
+    except Exception as e:
+        print(f"❌ 获取分镜列表失败: {e}")
+        return []
+
+
 async def update_storyboard_panel(storyboard_id: str, updates: dict) -> bool:
     """
     更新单个分镜面板
@@ -445,6 +703,90 @@ async def delete_storyboard_panel(storyboard_id: str) -> bool:
         return False
 
 
+async def delete_storyboards_by_text_id(text_id: str) -> bool:
+    """
+    删除某个原文下的所有分镜面板（用于重新解析前清理上一次的结果）
+    
+    Args:
+        text_id: 原文ID
+        
+    Returns:
+        bool: 删除是否成功
+    """
+    try:
+        await db_client.delete(
+            TableNames.STORYBOARDS,
+            {StoryboardFields.SOURCE_TEXT_ID: text_id}
+        )
+        return True
+    except Exception as e:
+        print(f"❌ 删除原文分镜失败: {e}")
+        return False
+
+
+async def delete_storyboard_panels(storyboard_ids: List[str]) -> bool:
+    """
+    批量删除分镜面板（一次请求）
+    
+    Args:
+        storyboard_ids: 分镜面板ID列表
+        
+    Returns:
+        bool: 删除是否成功
+    """
+    if not storyboard_ids:
+        return True
+    try:
+        await db_client.delete(
+            TableNames.STORYBOARDS,
+            {StoryboardFields.STORYBOARD_ID: list(storyboard_ids)}
+        )
+        return True
+    except Exception as e:
+        print(f"❌ 批量删除分镜面板失败: {e}")
+        return False
+
+
+async def update_storyboard_panel_indexes(
+    project_id: str,
+    source_text_id: str,
+    index_by_id: Dict[str, int]
+) -> bool:
+    """
+    批量更新分镜面板的 panel_index（其他字段保持不变）
+    
+    按新索引逐条 update（并发发送），只修改仍然存在的行：
+    期间被其他请求删除的分镜不会被重新插入。
+    
+    Args:
+        project_id: 项目ID
+        source_text_id: 原文ID
+        index_by_id: 分镜面板ID到新 panel_index 的映射
+        
+    Returns:
+        bool: 更新是否成功
+    """
+    if not index_by_id:
+        return True
+    try:
+        await asyncio.gather(*[
+            db_client.update(
+                TableNames.STORYBOARDS,
+                {StoryboardFields.PANEL_INDEX: panel_index},
+                {
+                    StoryboardFields.STORYBOARD_ID: storyboard_id,
+                    StoryboardFields.PROJECT_ID: project_id,
+                    StoryboardFields.SOURCE_TEXT_ID: source_text_id
+                }
+            )
+            for storyboard_id, panel_index in index_by_id.items()
+        ])
+        return True
+    except Exception as e:
+        print(f"❌ 批量更新分镜顺序失败: {e}")
+        return False
+
+
 # ==================== 角色相关操作 ====================
 
 async def create_character(
@@ -481,6 +823,7 @@ async def create_character(
         }
         
         result = await db_client.insert(TableNames.CHARACTERS, character_data)
+        character_resolver.invalidate_project(project_id)
         if result:
             return Character.from_dict(result)
         return None
@@ -490,6 +833,38 @@ async def create_character(
         return None
 
 
+async def create_characters_batch(project_id: str, characters_data: List[Dict[str, Any]]) -> List[Character]:
+    """
+    批量创建角色（一次请求写入所有角色）
+    
+    Args:
+        project_id: 项目ID
+        characters_data: 角色数据列表，每项包含 name 和可选的 description
+        
+    Returns:
+        List[Character]: 成功创建的角色列表
+    """
+    rows = [
+        {
+            CharacterFields.CHARACTER_ID: str(uuid.uuid4()),
+            CharacterFields.PROJECT_ID: project_id,
+            CharacterFields.NAME: char_data.get("name"),
+            CharacterFields.DESCRIPTION: char_data.get("description"),
+            CharacterFields.REFERENCE_IMAGE_URLS: char_data.get("reference_image_urls") or [],
+            CharacterFields.LORA_MODEL_PATH: char_data.get("lora_model_path"),
+            CharacterFields.TRIGGER_WORD: char_data.get("trigger_word")
+        }
+        for char_data in characters_data
+    ]
+    try:
+        results = await _bulk_insert(TableNames.CHARACTERS, rows)
+        character_resolver.invalidate_project(project_id)
+        return [Character.from_dict(row) for row in results]
+    except Exception as e:
+        print(f"❌ 批量创建角色失败: {e}")
+        return []
+
+
 async def get_characters_by_project(project_id: str) -> List[Character]:
     """获取项目的所有角色"""
     try:
@@ -534,6 +909,7 @@ async def update_character(
             updates,
             {CharacterFields.CHARACTER_ID: character_id}
         )
+        character_resolver.invalidate_character(character_id)
         return True
     except Exception as e:
         print(f"❌ 更新角色失败: {e}")
@@ -547,6 +923,7 @@ async def delete_character(character_id: str) -> bool:
             TableNames.CHARACTERS,
             {CharacterFields.CHARACTER_ID: character_id}
         )
+        character_resolver.invalidate_character(character_id)
         return True
     except Exception as e:
         print(f"❌ 删除角色失败: {e}")
@@ -555,65 +932,176 @@ async def delete_character(character_id: str) -> bool:
 
 # ==================== 公共查询操作 ====================
 
-async def get_public_projects(limit: int = 20, offset: int = 0) -> List[Project]:
-    """获取公开项目列表"""
+# 公开项目列表/搜索每页最多返回的数量
+PROJECT_PAGE_MAX_LIMIT = 100
+
+# 排序方式 -> (排序列, 是否降序)；project_id 作为第二排序键，保证游标分页的顺序稳定
+# 排序列为空（如从未更新过的 updated_at）的项目总是排在最后（NULLS LAST）
+PROJECT_SORTS = {
+    "newest": (ProjectFields.CREATED_AT, True),
+    "oldest": (ProjectFields.CREATED_AT, False),
+    "updated": (ProjectFields.UPDATED_AT, True),
+    "title": (ProjectFields.TITLE, False),
+}
+
+
+def _postgrest_quote(value: Any) -> str:
+    """转义为PostgREST逻辑条件中的双引号字符串（值中可能含有逗号、括号、点等保留字符）"""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _keyword_condition(keyword: str) -> str:
+    """标题或描述包含关键词（ILIKE，数据库中由 pg_trgm 索引加速）"""
+    # 转义 LIKE 通配符；* 是PostgREST的通配符且无法转义，直接去掉
+    escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_').replace('*', '')
+    pattern = _postgrest_quote(f"*{escaped}*")
+    return f"{ProjectFields.TITLE}.ilike.{pattern},{ProjectFields.DESCRIPTION}.ilike.{pattern}"
+
+
+def _keyset_condition(column: str, descending: bool, value: Any, last_id: str) -> str:
+    """
+    游标条件：排在上一页最后一行 (value, last_id) 之后的行（排序列按 NULLS LAST 排序）
+
+    - value 不为空：排序列在 value 之后、排序列等于 value 且 project_id 在之后、或排序列为空
+    - value 为空：已经进入末尾的空值部分，只剩排序列为空且 project_id 在之后的行
+    """
+    op = "lt" if descending else "gt"
+    after_id = f"{ProjectFields.PROJECT_ID}.{op}.{_postgrest_quote(last_id)}"
+    if value is None:
+        return f"and({column}.is.null,{after_id})"
+    return (
+        f"{column}.{op}.{_postgrest_quote(value)},"
+        f"and({column}.eq.{_postgrest_quote(value)},{after_id}),"
+        f"{column}.is.null"
+    )
+
+
+def _all_of(conditions: List[str]) -> Optional[str]:
+    """把多个 or 条件组合为同时满足（PostgREST 的 or 参数只能出现一次）"""
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return "and(" + ",".join(f"or({condition})" for condition in conditions) + ")"
+
+
+def _encode_project_cursor(sort: str, value: Any, project_id: str) -> str:
+    """游标为 [排序方式, 排序列的值（可能为空）, project_id] 的JSON"""
+    raw = json.dumps([sort, value, project_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_project_cursor(cursor: str, sort: str):
     try:
-        # Supabase的limit和offset需要特殊处理
-        results = await db_client.select(
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, project_id = json.loads(raw)
+    except Exception:
+        raise ValueError("无效的分页游标")
+    if cursor_sort != sort or not project_id or isinstance(value, (list, dict)):
+        raise ValueError("分页游标与排序方式不匹配")
+    return value, project_id
+
+
+async def get_public_projects_page(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    keyword: Optional[str] = None,
+    sort: str = "newest",
+    user_id: Optional[str] = None
+) -> Tuple[List[Project], Optional[str]]:
+    """
+    分页获取公开项目（过滤、排序、分页都在数据库中完成，每次只读取一页）
+    
+    Args:
+        limit: 每页数量（最多 PROJECT_PAGE_MAX_LIMIT）
+        cursor: 上一页返回的游标；提供时忽略 offset（深翻页不需要跳过前面的行）
+        offset: 偏移量（兼容旧的分页方式）
+        keyword: 搜索关键词（匹配标题或描述）
+        sort: 排序方式，见 PROJECT_SORTS
+        user_id: 只返回该用户的公开项目
+        
+    Returns:
+        Tuple[List[Project], Optional[str]]: (项目列表, 下一页游标)，没有下一页时游标为None
+        
+    Raises:
+        ValueError: 排序方式或游标无效
+    """
+    if sort not in PROJECT_SORTS:
+        raise ValueError(f"不支持的排序方式: {sort}（可选 {', '.join(PROJECT_SORTS)}）")
+    column, descending = PROJECT_SORTS[sort]
+    limit = max(1, min(limit, PROJECT_PAGE_MAX_LIMIT))
+    
+    conditions = []
+    if keyword and keyword.strip():
+        conditions.append(_keyword_condition(keyword.strip()))
+    if cursor:
+        value, last_id = _decode_project_cursor(cursor, sort)
+        conditions.append(_keyset_condition(column, descending, value, last_id))
+        offset = 0
+    
+    filters = {ProjectFields.VISIBILITY: ProjectVisibility.PUBLIC.value}
+    if user_id:
+        filters[ProjectFields.USER_ID] = user_id
+    
+    try:
+        # 多取一行判断是否还有下一页
+        results = await db_client.select_page(
             TableNames.PROJECTS,
-            filters={ProjectFields.VISIBILITY: ProjectVisibility.PUBLIC.value}
+            filters=filters,
+            condition=_all_of(conditions),
+            order=[(column, descending, False), (ProjectFields.PROJECT_ID, descending)],
+            limit=limit + 1,
+            offset=max(0, offset)
         )
-        
-        # 手动实现limit和offset
-        return [Project.from_dict(row) for row in results[offset:offset+limit]]
     except Exception as e:
         print(f"❌ 获取公开项目失败: {e}")
-        return []
+        return [], None
+    
+    has_more = len(results) > limit
+    results = results[:limit]
+    next_cursor = None
+    if has_more:
+        last = results[-1]
+        next_cursor = _encode_project_cursor(sort, last.get(column), last.get(ProjectFields.PROJECT_ID))
+    return [Project.from_dict(row) for row in results], next_cursor
+
+
+async def get_public_projects(limit: int = 20, offset: int = 0) -> List[Project]:
+    """获取公开项目列表（按创建时间倒序，数据库分页）"""
+    projects, _ = await get_public_projects_page(limit=limit, offset=offset)
+    return projects
 
 
 async def search_projects(keyword: str, limit: int = 20) -> List[Project]:
-    """搜索项目"""
-    try:
-        # Supabase的文本搜索需要特殊处理
-        results = await db_client.select(TableNames.PROJECTS)
-        
-        # 手动过滤包含关键词的项目
-        filtered_results = []
-        for row in results:
-            if (keyword.lower() in row.get(ProjectFields.TITLE, "").lower() or 
-                keyword.lower() in row.get(ProjectFields.DESCRIPTION, "").lower()):
-                if row.get(ProjectFields.VISIBILITY) == ProjectVisibility.PUBLIC.value:
-                    filtered_results.append(row)
-        
-        return [Project.from_dict(row) for row in filtered_results[:limit]]
-    except Exception as e:
-        print(f"❌ 搜索项目失败: {e}")
-        return []
+    """搜索公开项目（标题或描述包含关键词，在数据库中过滤）"""
+    projects, _ = await get_public_projects_page(limit=limit, keyword=keyword)
+    return projects
 
 
 async def get_user_stats(user_id: str) -> Dict[str, Any]:
-    """获取用户统计信息"""
+    """
+    获取用户统计信息（一次查询）
+    
+    通过外键嵌入的 count 聚合（PostgREST），在数据库中统计每个项目的原文数和角色数，
+    只返回计数而不读取原文内容，查询次数与项目数量无关。
+    """
     try:
-        # 项目数量
-        projects = await get_projects_by_user(user_id)
-        project_count = len(projects)
-        
-        # 原文数量
-        text_count = 0
-        for project in projects:
-            texts = await get_source_texts_by_project(project.project_id)
-            text_count += len(texts)
+        results = await db_client.select(
+            TableNames.PROJECTS,
+            columns=f"{ProjectFields.PROJECT_ID},{TableNames.SOURCE_TEXTS}(count),{TableNames.CHARACTERS}(count)",
+            filters={ProjectFields.USER_ID: user_id}
+        )
         
-        # 角色数量
-        character_count = 0
-        for project in projects:
-            characters = await get_characters_by_project(project.project_id)
-            character_count += len(characters)
+        def embedded_count(row: Dict[str, Any], table: str) -> int:
+            # 嵌入聚合的返回格式为 [{"count": n}]
+            counts = row.get(table) or []
+            return counts[0].get("count", 0) if counts else 0
         
         return {
-            "project_count": project_count,
-            "text_count": text_count,
-            "character_count": character_count
+            "project_count": len(results),
+            "text_count": sum(embedded_count(row, TableNames.SOURCE_TEXTS) for row in results),
+            "character_count": sum(embedded_count(row, TableNames.CHARACTERS) for row in results)
         }
         
     except Exception as e:
@@ -644,12 +1132,15 @@ async def update_source_text(
     title: Optional[str] = None,
     chapter_number: Optional[int] = None,
     chapter_name: Optional[str] = None,
-    order_index: Optional[int] = None
+    order_index: Optional[int] = None,
+    raw_content: Optional[str] = None
 ) -> bool:
     """更新原文信息"""
     try:
         updates = {}
         
+        if raw_content is not None:
+            updates[SourceTextFields.RAW_CONTENT] = raw_content
         if title is not None:
             updates[SourceTextFields.TITLE] = title
         if chapter_number is not None:
@@ -27,6 +27,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # 导入配置和数据库模块
 from config import config
 from app.db import init_database, close_database, db_client
+from app.services.http_client import http_client_manager
+from app.services.job_queue import job_queue, JobWorker
+from app.services.image_store import image_store
+from app.services.render_pool import render_pool
 
 # 导入API路由模块
 from app.api import storyboard, project, auth, text_to_image, storyboard_image_gen
@@ -79,11 +83,15 @@ if not os.path.exists(static_dir):
 app.mount("/layout", StaticFiles(directory=static_dir), name="layout")
 print(f"📁 静态文件目录: {static_dir}")
 print(f"✅ 静态文件路由已挂载: /layout -> {static_dir}")
+print(f"🗄️ 配图存储后端: {config.storage_backend}")
 print(f"✅ CORS 中间件已配置，静态文件将自动应用 CORS 头")
 
 
 # ==================== 应用生命周期管理 ====================
 
+# API进程内嵌的任务执行器（config.queue_workers 为0时不启动，改为单独运行 worker.py）
+embedded_worker = None
+
 @app.on_event("startup")
 async def startup_event():
     """
@@ -91,12 +99,18 @@ async def startup_event():
     
     功能说明：
     - 检查数据库配置是否完整
+    - 创建七牛云API共享HTTP连接池
     - 初始化Supabase客户端连接
     - 测试数据库连接是否正常
+    - 回收没有引用的已生成图片
+    - 启动内嵌的任务队列执行器
     - 为后续API调用做准备
     """
     print("🚀 应用启动中...")
     
+    # 创建七牛云API共享连接池
+    await http_client_manager.startup()
+    
     if config.is_database_configured():
         print("📊 开始初始化数据库连接...")
         success = await init_database()
@@ -112,6 +126,19 @@ async def startup_event():
             print("❌ 数据库初始化失败")
     else:
         print("⚠️ 数据库未配置，跳过数据库初始化")
+    
+    # 回收没有被任何分镜引用的图片（如上次运行中断时留下的文件）
+    try:
+        gc_result = await image_store.gc()
+        print(f"🧹 图片存储回收完成: 删除 {gc_result['removed']} 个文件，释放 {gc_result['freed_bytes']} 字节")
+    except Exception as e:
+        print(f"⚠️ 图片存储回收失败: {e}")
+    
+    # 启动内嵌的任务执行器，消费持久化任务队列中的解析、批量配图任务
+    global embedded_worker
+    if config.queue_workers > 0:
+        embedded_worker = JobWorker(job_queue, storyboard.JOB_HANDLERS, concurrency=config.queue_workers)
+        embedded_worker.start()
 
 
 @app.on_event("shutdown")
@@ -120,12 +147,19 @@ async def shutdown_event():
     应用关闭时清理资源
     
     功能说明：
+    - 停止任务执行器（执行中的任务租约过期后会被重新执行）
     - 关闭数据库连接
+    - 关闭七牛云API共享连接池
+    - 关闭图片渲染进程池
     - 清理相关资源
     - 确保优雅关闭
     """
     print("🛑 应用关闭中...")
+    if embedded_worker:
+        await embedded_worker.stop()
     await close_database()
+    await http_client_manager.close()
+    render_pool.shutdown()
     print("✅ 应用已安全关闭")
 
 
@@ -4,7 +4,7 @@
 # 
 # 这个文件专门负责：
 # 1. 调用七牛云AI API进行文本处理
-# 2. 智能分段：将长篇小说按情节节点分段
+# 2. 智能分段：将长篇小说按情节节点分段（本地分段引擎，可选AI辅助判断）
 # 3. 分镜生成：将文本转换为漫画分镜结构
 # 4. 错误处理和降级策略
 #
@@ -19,15 +19,26 @@ import json
 import re
 import os
 import sys
-from typing import List, Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 # 添加 backend 目录到 Python 路径，确保能导入config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config import config
+from app.services.http_client import get_http_client
+from app.services.llm_cache import llm_cache, make_cache_key
+from app.services.token_budget import estimate_tokens, token_budget
+from app.services.character_context import CharacterIndex
+from app.services import text_segmenter
 
 # 七牛云OpenAI兼容API入口
 QINIU_API_BASE = "https://openai.qiniu.com/v1"
 
+# 分镜输出被截断且没有完整分镜时，对半拆分重试的最大层数和最小字数
+MAX_TRUNCATION_DEPTH = 3
+MIN_SPLIT_SEGMENT_SIZE = 200
+# 截断时用最后一个完整分镜的原文片段定位续写位置，片段无法完整匹配时用开头若干字
+SNIPPET_PREFIX_LENGTH = 12
+
 
 async def call_qiniu_api(messages: list) -> dict:
     """
@@ -44,6 +55,20 @@ async def call_qiniu_api(messages: list) -> dict:
     返回：
         dict: 解析后的JSON数据，失败时返回None
     """
+    response = await _chat_completion(messages)
+    if response is None:
+        return None
+    return _parse_json_content(response[0])
+
+
+async def _chat_completion(messages: list) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    发送一次（非流式）对话请求
+    
+    返回：
+        (模型输出的文本, finish_reason)；请求失败时返回None。
+        finish_reason 为 "length" 表示输出达到 max_tokens 被截断
+    """
     # 构建API请求参数
     payload = {
         "model": config.model,           # AI模型名称
@@ -67,46 +92,53 @@ async def call_qiniu_api(messages: list) -> dict:
     print(f"🔑 API Key: {config.api_key[:10]}...{config.api_key[-10:] if len(config.api_key) > 20 else config.api_key}")
 
     # 发送HTTP请求
-    async with httpx.AsyncClient(timeout=config.timeout) as client:
-        try:
-            print(f"📤 发送请求...")
-            r = await client.post(url, headers=headers, json=payload)
-            print(f"📥 收到响应: {r.status_code}")
-            
-            # 检查HTTP状态码
-            if r.status_code != 200:
-                print(f"❌ API响应错误: {r.status_code}")
-                print(f"📄 响应内容: {r.text}")
-                try:
-                    error_data = r.json()
-                    print(f"🔍 错误详情: {error_data}")
-                except:
-                    print(f"🔍 无法解析错误响应为JSON")
-                return None
-            
-            print(f"✅ API调用成功!")
-            data = r.json()
-            
-        except httpx.RequestError as e:
-            print(f"❌(AI服务) 网络请求失败: {e}")
-            print(f"🔍 错误类型: {type(e).__name__}")
-            return None
-        except Exception as e:
-            print(f"❌(AI服务) API调用失败: {e}")
-            print(f"🔍 错误类型: {type(e).__name__}")
+    client = await get_http_client(QINIU_API_BASE)
+    try:
+        print(f"📤 发送请求...")
+        r = await client.post(url, headers=headers, json=payload, timeout=config.timeout)
+        print(f"📥 收到响应: {r.status_code}")
+        
+        # 检查HTTP状态码
+        if r.status_code != 200:
+            print(f"❌ API响应错误: {r.status_code}")
+            print(f"📄 响应内容: {r.text}")
+            try:
+                error_data = r.json()
+                print(f"🔍 错误详情: {error_data}")
+            except:
+                print(f"🔍 无法解析错误响应为JSON")
             return None
+        
+        print(f"✅ API调用成功!")
+        data = r.json()
+        
+    except httpx.RequestError as e:
+        print(f"❌(AI服务) 网络请求失败: {e}")
+        print(f"🔍 错误类型: {type(e).__name__}")
+        return None
+    except Exception as e:
+        print(f"❌(AI服务) API调用失败: {e}")
+        print(f"🔍 错误类型: {type(e).__name__}")
+        return None
 
     # 智能解析AI返回的内容
+    finish_reason = None
     try:
         # 尝试从标准OpenAI响应格式中提取内容
-        content = data.get("choices", [{}])[0].get("message", {}).get("content")
+        choice = data.get("choices", [{}])[0]
+        finish_reason = choice.get("finish_reason")
+        content = choice.get("message", {}).get("content")
         if not content:
             # 兼容其他可能的响应格式
-            content = data.get("choices", [{}])[0].get("text") or data.get("payload") or json.dumps(data)
+            content = choice.get("text") or data.get("payload") or json.dumps(data)
     except Exception:
         content = json.dumps(data)
 
-    # 尝试解析content为JSON
+    return content, finish_reason
+
+
+def _parse_json_content(content: str) -> Optional[dict]:
+    """把AI返回的文本解析为JSON，文本中夹杂说明文字时提取第一个 {...}"""
     parsed = None
     try:
         parsed = json.loads(content)
@@ -122,57 +154,190 @@ async def call_qiniu_api(messages: list) -> dict:
     return parsed
 
 
-async def generate_storyboard_for_segment(
-    segment_text: str, 
-    title: str, 
-    segment_index: int,
-    existing_characters: List[Dict[str, Any]] = None
-) -> dict:
+async def stream_qiniu_api(messages: list) -> AsyncIterator[str]:
     """
-    为单个文本段生成分镜和角色信息（感知项目上下文）
+    以流式模式（stream: true）调用七牛云AI API
     
     功能说明：
-    - 将小说文本转换为漫画分镜结构
-    - 感知项目中已存在的角色，避免重复生成
-    - 只生成新角色的基础描述，已存在角色只生成情景外貌
-    - 考虑镜头构图、人物表情、场景描述等要素
-    - 生成标准化的JSON格式，包含characters和storyboards列表
+    - 逐条读取服务端推送的SSE数据块，按到达顺序返回模型输出的文本增量
+    - 与 call_qiniu_api 使用相同的模型参数和共享连接池
     
     参数：
-        segment_text: 要处理的文本段落
-        title: 小说标题（用于上下文）
-        segment_index: 段落序号
-        existing_characters: 该项目已存在的角色列表
+        messages: OpenAI格式的消息列表
     
     返回：
-        dict: 包含characters和storyboards的字典
+        AsyncIterator[str]: 文本增量；请求失败时抛出异常
     """
-    print(f"🎬(AI服务) 开始生成分镜和角色信息 (段落 {segment_index})...")
-    print(f"   文本长度: {len(segment_text)} 字符")
+    payload = {
+        "model": config.model,
+        "messages": messages,
+        "max_tokens": config.max_tokens,
+        "temperature": config.temperature,
+        "stream": True
+    }
+    headers = {
+        "Authorization": f"Bearer {config.api_key}",
+        "Content-Type": "application/json"
+    }
+    url = f"{QINIU_API_BASE}/chat/completions"
     
-    # 序列化已存在的角色列表
-    existing_chars_json = "[]"
+    print(f"🚀(AI服务) 开始流式调用七牛云API，模型: {config.model}")
+    client = await get_http_client(QINIU_API_BASE)
+    async with client.stream("POST", url, headers=headers, json=payload, timeout=config.timeout) as r:
+        if r.status_code != 200:
+            body = await r.aread()
+            raise RuntimeError(f"API响应错误: {r.status_code} {body.decode('utf-8', 'replace')[:500]}")
+        
+        async for line in r.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except Exception:
+                continue
+            choices = chunk.get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+
+class StoryboardStreamParser:
+    """
+    分镜JSON的增量解析器
+    
+    逐块喂入模型输出的文本，逐字符跟踪JSON结构（对象/数组嵌套、字符串与转义）：
+    - 顶层 storyboards 数组中的每个元素闭合时，立即解析并返回该分镜
+    - 顶层 characters 数组闭合时，返回完整的新角色列表
+    根对象之前的说明文字（如 ```json）会被忽略。
+    """
+    
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._stack = []            # 每项: [容器类型 '{' 或 '[', 所属的键, 起始位置]
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None    # 最近一个闭合的字符串（可能是键）
+        self._current_key = None    # 当前对象中正在取值的键
+        self._done = False
+    
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        喂入一段文本，返回本次新闭合的事件列表
+        
+        返回：
+            List[Tuple[str, Any]]: ("storyboard", dict) 或 ("characters", list)
+        """
+        self.buffer += chunk
+        events = []
+        text = self.buffer
+        while self._pos < len(text) and not self._done:
+            ch = text[self._pos]
+            pos = self._pos
+            self._pos += 1
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    try:
+                        self._last_string = json.loads(text[self._string_start:pos + 1])
+                    except Exception:
+                        self._last_string = None
+                continue
+            
+            if not self._stack:
+                if ch == "{":
+                    self._stack.append(["{", None, pos])
+                continue
+            
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif ch == ":":
+                self._current_key = self._last_string
+            elif ch == ",":
+                if self._stack[-1][0] == "{":
+                    self._current_key = None
+            elif ch in "{[":
+                key = self._current_key if self._stack[-1][0] == "{" else None
+                self._stack.append([ch, key, pos])
+                self._current_key = None
+            elif ch in "}]":
+                kind, key, start = self._stack.pop()
+                event = self._closed(kind, key, text[start:pos + 1])
+                if event:
+                    events.append(event)
+                if not self._stack:
+                    self._done = True
+        return events
+    
+    @property
+    def truncated(self) -> bool:
+        """根对象已经开始但没有闭合（输出在JSON中间中断）"""
+        return bool(self._stack) and not self._done
+    
+    def _closed(self, kind: str, key: Optional[str], raw: str) -> Optional[Tuple[str, Any]]:
+        """容器闭合时判断是否需要返回事件"""
+        depth = len(self._stack)
+        try:
+            # 顶层 storyboards 数组中的元素：栈为 [根对象, storyboards数组]
+            if kind == "{" and depth == 2 and self._stack[1][0] == "[" and self._stack[1][1] == "storyboards":
+                return ("storyboard", json.loads(raw))
+            # 顶层 characters 数组：栈为 [根对象]
+            if kind == "[" and depth == 1 and key == "characters":
+                return ("characters", json.loads(raw))
+        except Exception as e:
+            print(f"⚠️(AI服务) 增量解析元素失败: {e}")
+        return None
+
+
+def _build_storyboard_request(
+    segment_text: str,
+    title: str,
+    segment_index: int,
+    existing_characters: List[Dict[str, Any]] = None
+) -> Tuple[list, Optional[str]]:
+    """构建分镜生成的消息列表和缓存键（缓存未启用时缓存键为None）"""
+    # 只附带段落中出现的角色的完整描述，其余角色只列名称（都按名称排序，角色集合相同时提示词和缓存键保持一致）
+    mentioned_chars_json = "[]"
+    other_names = "无"
     if existing_characters:
         try:
-            existing_chars_json = json.dumps(existing_characters, ensure_ascii=False)
-            print(f"   感知到 {len(existing_characters)} 个已存在的角色。")
+            mentioned, others = CharacterIndex(existing_characters).select(segment_text)
+            mentioned_chars_json = json.dumps(
+                [{"name": c.get("name"), "description": c.get("description")} for c in mentioned],
+                ensure_ascii=False
+            )
+            if others:
+                other_names = "、".join(others)
+            print(f"   感知到 {len(existing_characters)} 个已存在的角色，本段出现 {len(mentioned)} 个。")
         except Exception:
             pass  # 即使失败，也使用空列表
     
     # 构建AI提示词
     system_prompt = f"""你是一个专业的分镜脚本生成器。
 
-本项目已经定义了以下角色：
-{existing_chars_json}
+本项目已经定义了以下角色（本段文本中出现的角色及其描述）：
+{mentioned_chars_json}
+
+本项目的其他已有角色（仅名称）：{other_names}
 
 你的任务是：
 1. **分析用户文本**：阅读用户提供的文本片段。
 2. **生成分镜 (storyboards)**：
    * 为文本生成详细的分镜面板。
    * `character_appearance` 必须生成，描述该分镜中角色的*特定*外貌、穿着或表情（例如"衣服破损"、"泪流满面"）。
-   * `panel_elements` 数组包含该分镜中的所有对话，每个元素包含角色名称和对话内容。
+   * `panel_elements` 数组包含该分镜中的所有对话，每个元素包含角色名称和对话内容；已有角色使用上面列表中的完整名称（即使原文用的是简称或别名）。
 3. **识别新角色 (characters)**：
-   * **仅当**文本中出现了*不在*上面"本项目已经定义的角色"列表中的**新角色**时，才在`characters`数组中添加该角色的基础描述（`description`）。
+   * **仅当**文本中出现了*不在*上面两个已有角色列表中的**新角色**时，才在`characters`数组中添加该角色的基础描述（`description`）。
    * 如果文本中的角色都*已存在*于列表中，请返回一个**空**的`characters`数组 ( `[]` )。
 
 请严格按照以下JSON格式返回数据：
@@ -210,105 +375,357 @@ async def generate_storyboard_for_segment(
         }
     ]
     
-    # 调用AI API生成分镜
-    result = await call_qiniu_api(messages)
-    if result and "storyboards" in result:
-        # 确保 characters 键存在，即使AI返回了null或漏掉了
-        if "characters" not in result:
-            result["characters"] = []
-            
+    # 缓存键不包含段落序号：段落在原文中的位置变化不影响生成结果
+    cache_key = None
+    if config.llm_cache_enabled:
+        cache_key = make_cache_key(
+            model=config.model,
+            temperature=config.temperature,
+            max_tokens=config.max_tokens,
+            system_prompt=system_prompt,
+            title=title or "",
+            segment_text=segment_text
+        )
+    return messages, cache_key
+
+
+async def generate_storyboard_for_segment(
+    segment_text: str, 
+    title: str, 
+    segment_index: int,
+    existing_characters: List[Dict[str, Any]] = None
+) -> dict:
+    """
+    为单个文本段生成分镜和角色信息（感知项目上下文）
+    
+    功能说明：
+    - 将小说文本转换为漫画分镜结构
+    - 感知项目中已存在的角色，避免重复生成
+    - 只生成新角色的基础描述，已存在角色只生成情景外貌
+    - 考虑镜头构图、人物表情、场景描述等要素
+    - 生成标准化的JSON格式，包含characters和storyboards列表
+    - 相同的请求内容（模型、提示词、段落文本、角色集合）命中缓存时不再调用AI
+    - 输出达到 max_tokens 被截断时，保留完整的分镜，剩余文本续写或对半拆分后重试
+    
+    参数：
+        segment_text: 要处理的文本段落
+        title: 小说标题（用于上下文）
+        segment_index: 段落序号
+        existing_characters: 该项目已存在的角色列表
+    
+    返回：
+        dict: 包含characters和storyboards的字典
+    """
+    print(f"🎬(AI服务) 开始生成分镜和角色信息 (段落 {segment_index})...")
+    print(f"   文本长度: {len(segment_text)} 字符")
+    
+    messages, cache_key = _build_storyboard_request(segment_text, title, segment_index, existing_characters)
+    if cache_key:
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            print(f"⚡(AI服务) 命中缓存，跳过AI调用 (段落 {segment_index})")
+            return cached
+
+    # 调用AI API生成分镜（输出被截断时自动续写或拆分重试）
+    result = await _generate_storyboard_uncached(segment_text, title, segment_index, existing_characters)
+    if result:
         print(f"✅(AI服务) 分镜和角色生成成功")
         print(f"   识别到新角色数量: {len(result['characters'])}")
         print(f"   生成分镜数量: {len(result['storyboards'])}")
+        if cache_key:
+            await llm_cache.set(cache_key, result)
         return result
     else:
         print(f"❌(AI服务) 分镜和角色生成失败")
         return {"characters": [], "storyboards": []}
 
 
-def simple_text_segment(text: str) -> list:
+async def _generate_storyboard_uncached(
+    segment_text: str,
+    title: str,
+    segment_index: int,
+    existing_characters: List[Dict[str, Any]] = None,
+    depth: int = 0
+) -> Optional[dict]:
     """
-    简单的文本分段规则（AI分段失败时的降级方案）
+    调用AI生成分镜（不读写缓存），输出达到 max_tokens 被截断时保留已完整的分镜，
+    剩余文本交给 _generate_truncated_rest 继续生成
     
-    功能说明：
-    - 当AI智能分段失败时使用的备用方案
-    - 按段落和字数进行简单分割
-    - 确保每段控制在合理长度内
+    返回：
+        dict: 包含characters和storyboards的字典，失败时返回None
+    """
+    messages, _ = _build_storyboard_request(segment_text, title, segment_index, existing_characters)
+    response = await _chat_completion(messages)
+    if response is None:
+        return None
+    content, finish_reason = response
     
-    参数：
-        text: 要分段的完整文本
+    parser = StoryboardStreamParser()
+    events = parser.feed(content)
+    if finish_reason != "length" and not parser.truncated:
+        token_budget.observe(len(segment_text), estimate_tokens(content))
+        result = _parse_json_content(content)
+        if not result or "storyboards" not in result:
+            return None
+        # 确保 characters 键存在，即使AI返回了null或漏掉了
+        if "characters" not in result:
+            result["characters"] = []
+        return result
     
-    返回：
-        list: 分段列表，每段包含segment_index、content、summary
+    characters = next((value for kind, value in events if kind == "characters"), None) or []
+    storyboards = [value for kind, value in events if kind == "storyboard"]
+    rest = await _generate_truncated_rest(
+        segment_text, content, storyboards, title, segment_index,
+        (existing_characters or []) + characters, depth
+    )
+    return {"characters": characters + rest["characters"], "storyboards": storyboards + rest["storyboards"]}
+
+
+def _remaining_text(segment_text: str, storyboards: List[dict]) -> Optional[str]:
     """
-    segments = []
-    # 按双换行符分割段落
-    paragraphs = text.split('\n\n')
-    current_segment = ""
-    segment_index = 1
-    
-    for para in paragraphs:
-        # 如果当前段落加上新段落超过1000字，就结束当前段
-        if len(current_segment + para) > 1000 and current_segment:
-            segments.append({
-                "segment_index": segment_index,
-                "content": current_segment.strip(),
-                "summary": current_segment[:100] + "..."
-            })
-            current_segment = para
-            segment_index += 1
+    输出被截断时，返回最后一个完整分镜之后还没有生成分镜的原文；无法定位时返回None
+
+    按分镜顺序从前一个分镜的匹配位置向后查找原文片段，原文中重复出现的句子
+    （如反复出现的对白）不会匹配到更靠后的位置而漏掉中间的原文。
+    中间的分镜定位不到时跳过，最后一个分镜定位不到时返回None。
+    """
+    if not storyboards:
+        return segment_text
+    cursor = 0
+    for i, storyboard in enumerate(storyboards):
+        snippet = (storyboard.get("original_text_snippet") or "").strip()
+        for needle in (snippet, snippet[:SNIPPET_PREFIX_LENGTH]):
+            if needle:
+                pos = segment_text.find(needle, cursor)
+                if pos >= 0:
+                    cursor = pos + len(needle)
+                    break
         else:
-            # 否则继续累积段落
-            current_segment += "\n\n" + para if current_segment else para
+            if i == len(storyboards) - 1:
+                return None
+    return segment_text[cursor:]
+
+
+def _split_in_half(text: str) -> List[str]:
+    """在中间附近的句子/段落边界把文本拆成两段"""
+    half = len(text) // 2
+    return [seg["content"] for seg in text_segmenter.segment_text_local(text, half, half * 2 // 3, half * 4 // 3)]
+
+
+async def _generate_truncated_rest(
+    segment_text: str,
+    truncated_output: str,
+    storyboards: List[dict],
+    title: str,
+    segment_index: int,
+    known_characters: List[Dict[str, Any]],
+    depth: int
+) -> dict:
+    """
+    为被截断的输出补全剩余文本的分镜
     
-    # 处理最后一段
-    if current_segment:
-        segments.append({
-            "segment_index": segment_index,
-            "content": current_segment.strip(),
-            "summary": current_segment[:100] + "..."
-        })
+    - 已有完整分镜时，从最后一个分镜对应的原文之后继续生成（已生成的分镜不浪费）
+    - 一个完整分镜都没有时，把文本对半拆分，分别生成
+    - 前一部分识别出的新角色会作为已有角色传给后一部分，避免重复创建
+    """
+    rest = {"characters": [], "storyboards": []}
+    remaining = _remaining_text(segment_text, storyboards)
+    print(f"⚠️(AI服务) 分镜输出被截断 (段落 {segment_index})，已得到 {len(storyboards)} 个完整分镜")
+    if remaining is None:
+        print(f"⚠️(AI服务) 无法定位截断位置，保留已生成的分镜 (段落 {segment_index})")
+        return rest
     
-    return segments
+    covered = len(segment_text) - len(remaining)
+    token_budget.observe(covered, estimate_tokens(truncated_output))
+    if not remaining.strip():
+        return rest
+    
+    parts = [remaining] if storyboards else []
+    if not storyboards and len(remaining) >= MIN_SPLIT_SEGMENT_SIZE:
+        parts = _split_in_half(remaining)
+        if len(parts) < 2:
+            parts = []
+    # 续写时剩余文本严格变短，一定会结束；只有对半拆分需要限制层数
+    if not parts or (not storyboards and depth >= MAX_TRUNCATION_DEPTH):
+        print(f"❌(AI服务) 截断后无法继续拆分，剩余 {len(remaining)} 字没有生成分镜 (段落 {segment_index})")
+        return rest
+    
+    print(f"🔁(AI服务) 为剩余 {len(remaining)} 字重新生成分镜，拆分为 {len(parts)} 部分 (段落 {segment_index})")
+    known = list(known_characters)
+    for part in parts:
+        result = await _generate_storyboard_uncached(
+            part, title, segment_index, known, depth if storyboards else depth + 1
+        )
+        if result:
+            rest["characters"].extend(result["characters"])
+            rest["storyboards"].extend(result["storyboards"])
+            known.extend(result["characters"])
+    return rest
 
 
-async def segment_text(text: str, existing_characters: List[Dict[str, Any]] = None) -> list:
+async def stream_storyboard_for_segment(
+    segment_text: str,
+    title: str,
+    segment_index: int,
+    existing_characters: List[Dict[str, Any]] = None
+) -> AsyncIterator[Tuple[str, Any]]:
     """
-    将长文本进行智能分段
+    流式生成单个文本段的分镜（与 generate_storyboard_for_segment 使用相同的提示词和缓存）
     
     功能说明：
-    - 优先使用AI进行智能分段，按情节发展、场景转换等自然节点分段
-    - AI失败时自动降级到规则分段
-    - 确保每段控制在800-1200字左右，保持情节完整性
+    - 模型输出过程中，每个分镜一闭合就返回，调用方可以立即保存和展示
+    - 命中缓存时直接依次返回缓存中的角色和分镜
+    - 流式输出结束后对完整文本再解析一次，补回增量解析遗漏的分镜
+    - 调用失败时保留已返回的分镜，不写入缓存
+    - 输出被截断时继续为剩余文本生成分镜，新角色可能分多次返回
     
     参数：
-        text: 要分段的完整小说文本
+        segment_text: 要处理的文本段落
+        title: 小说标题（用于上下文）
+        segment_index: 段落序号
+        existing_characters: 该项目已存在的角色列表
     
     返回：
-        list: 分段列表，每段包含segment_index、content、summary
+        AsyncIterator[Tuple[str, Any]]: 依次返回
+            ("characters", 新角色列表)、("storyboard", 分镜字典)……，
+            最后返回 ("done", 包含characters和storyboards的完整结果)
+    """
+    print(f"🎬(AI服务) 开始流式生成分镜和角色信息 (段落 {segment_index})...")
+    
+    messages, cache_key = _build_storyboard_request(segment_text, title, segment_index, existing_characters)
+    if cache_key:
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            print(f"⚡(AI服务) 命中缓存，跳过AI调用 (段落 {segment_index})")
+            yield ("characters", cached.get("characters", []))
+            for storyboard in cached.get("storyboards", []):
+                yield ("storyboard", storyboard)
+            yield ("done", cached)
+            return
+    
+    parser = StoryboardStreamParser()
+    characters = None
+    storyboards = []
+    completed = False
+    try:
+        async for delta in stream_qiniu_api(messages):
+            for kind, value in parser.feed(delta):
+                if kind == "characters":
+                    characters = value
+                elif kind == "storyboard":
+                    storyboards.append(value)
+                yield (kind, value)
+        completed = True
+    except Exception as e:
+        print(f"❌(AI服务) 流式调用失败 (段落 {segment_index}): {e}")
+    
+    # 输出达到 max_tokens 被截断：保留已返回的分镜，剩余文本续写或拆分后重新生成
+    if completed and parser.truncated:
+        rest = await _generate_truncated_rest(
+            segment_text, parser.buffer, storyboards, title, segment_index,
+            (existing_characters or []) + (characters or []), 0
+        )
+        if rest["characters"]:
+            characters = (characters or []) + rest["characters"]
+            yield ("characters", rest["characters"])
+        for storyboard in rest["storyboards"]:
+            storyboards.append(storyboard)
+            yield ("storyboard", storyboard)
+    elif completed:
+        token_budget.observe(len(segment_text), estimate_tokens(parser.buffer))
+    
+    # 增量解析没有得到完整结构时（如模型输出了不规范的JSON），用完整文本兜底
+    full = _parse_json_content(parser.buffer) if completed and not parser.truncated else None
+    if full and isinstance(full.get("storyboards"), list):
+        if characters is None:
+            characters = full.get("characters") or []
+            yield ("characters", characters)
+        for storyboard in full["storyboards"][len(storyboards):]:
+            storyboards.append(storyboard)
+            yield ("storyboard", storyboard)
+    if characters is None:
+        characters = []
+        yield ("characters", characters)
+    
+    result = {"characters": characters, "storyboards": storyboards}
+    if completed and storyboards:
+        print(f"✅(AI服务) 流式生成完成 (段落 {segment_index})，新角色 {len(characters)} 个，分镜 {len(storyboards)} 个")
+        if cache_key:
+            await llm_cache.set(cache_key, result)
+    yield ("done", result)
+
+
+async def _choose_cut_with_llm(sentences: List[str], candidates: List[int]) -> Optional[int]:
     """
-    print(f"📝(AI服务) 开始AI智能分段...")
+    让AI在歧义位置中选择最自然的切分点（只发送切分窗口内的句子，而不是整章原文）
     
-    # 构建AI分段提示词
+    参数：
+        sentences: 从当前段开头起的句子列表
+        candidates: 候选切分位置（在第几句之前切分）
+    
+    返回：
+        Optional[int]: 选中的切分位置，无法判断时返回None
+    """
+    numbered = "\n".join(f"[{k}] {sentence.strip()}" for k, sentence in enumerate(sentences, start=1))
+    options = ", ".join(str(c) for c in candidates)
     messages = [
         {
-            "role": "system", 
-            "content": """你是一个文本分段专家。将长篇小说文本按照情节发展、场景转换、人物对话等自然节点进行分段。每段控制在800-1200字左右，保持情节完整性。返回JSON格式：{"segments": [{"segment_index": int, "content": str, "summary": str}]}"""
+            "role": "system",
+            "content": """你是一个文本分段专家。用户会给出一段编号的句子和若干候选切分位置，请选出最符合情节发展、场景转换或对话结束的位置，在该编号的句子之后切分。只返回JSON格式：{"cut_after": int}"""
         },
         {
-            "role": "user", 
-            "content": f"请将以下文本分段：\n\n{text}"
+            "role": "user",
+            "content": f"{numbered}\n\n候选切分位置（在该编号的句子之后切分）: {options}"
         }
     ]
-    
-    # 尝试AI智能分段
     result = await call_qiniu_api(messages)
-    if result and "segments" in result:
-        print(f"✅(AI服务) AI分段成功，生成 {len(result['segments'])} 段")
-        return result["segments"]
+    if result and isinstance(result.get("cut_after"), int):
+        return result["cut_after"]
+    return None
+
+
+def segment_limits(
+    text: str,
+    title: str = None,
+    existing_characters: List[Dict[str, Any]] = None
+) -> Tuple[int, int, int]:
+    """
+    按token预算计算分段的 (目标, 最小, 最大) 字数
+    
+    提示词（系统提示词 + 段落中出现的角色描述 + 其他角色名单）越长、分镜输出越多，每段能放的原文越少；
+    预算充足时保持 1000/800/1200 字。
+    """
+    # 按整段文本选择角色上下文（各分段出现的角色都是它的子集），得到提示词长度的上限
+    messages, _ = _build_storyboard_request(text, title, 0, existing_characters)
+    prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages) - estimate_tokens(text)
+    return token_budget.segment_limits(prompt_tokens, text)
+
+
+async def segment_text(text: str, existing_characters: List[Dict[str, Any]] = None, title: str = None) -> list:
+    """
+    将长文本进行智能分段
+    
+    功能说明：
+    - 使用本地分段引擎（text_segmenter）按场景分隔、段落、对话边界切分，毫秒级完成
+    - 每段字数由token预算决定（默认800-1200字左右），保证提示词和分镜输出不超出模型限制
+    - 开启 segment_llm_refine 时，只把字数范围内没有段落边界的切分点交给AI判断
+    
+    参数：
+        text: 要分段的完整小说文本
+        existing_characters: 该项目已存在的角色列表（计入提示词长度）
+        title: 小说标题
+    
+    返回：
+        list: 分段列表，每段包含segment_index、content、summary
+    """
+    target_size, min_size, max_size = segment_limits(text, title, existing_characters)
+    if config.segment_llm_refine:
+        print(f"📝(AI服务) 开始本地分段（歧义切分点由AI判断），每段 {min_size}-{max_size} 字...")
+        segments = await text_segmenter.segment_text_refined(
+            text, _choose_cut_with_llm, target_size, min_size, max_size
+        )
     else:
-        # AI分段失败，使用规则分段作为降级方案
-        print(f"⚠️(AI服务) AI分段失败，使用规则分段...")
-        segments = simple_text_segment(text)
-        print(f"✅(AI服务) 规则分段完成，生成 {len(segments)} 段")
-        return segments
+        print(f"📝(AI服务) 开始本地分段，每段 {min_size}-{max_size} 字...")
+        segments = text_segmenter.segment_text_local(text, target_size, min_size, max_size)
+    print(f"✅(AI服务) 分段完成，生成 {len(segments)} 段")
+    return segments
@@ -0,0 +1,119 @@
+# backend/app/services/chapter_splitter.py
+#
+# 整本小说的章节切分
+#
+# 这个文件专门负责：
+# 1. 逐行识别章节标题（"第X章"、"第X回"、"Chapter N"），数字支持阿拉伯数字、中文数字和罗马数字
+# 2. 以生成器方式逐章返回，几MB的小说也不需要把整本书交给AI或一次性做正则匹配
+# 3. "序章"、"楔子"等标题作为第 0 章；第一个标题之前没有标题的内容作为无章节名的一章返回
+#
+# 设计原则：
+# - 纯计算，不访问数据库，调用方可以边切分边入库
+# - 没有识别到任何章节标题时，整本书作为一个没有章节名的章节返回
+
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# 章节标题最大长度，超过的行视为正文
+MAX_HEADING_LENGTH = 40
+
+_CN_NUMBER = "0-9０-９零〇一二两三四五六七八九十百千万"
+_CN_HEADING = re.compile(rf"^第\s*([{_CN_NUMBER}]+)\s*[章回](?:$|[\s:：、.．·\-—]|(?<=章).)")
+_EN_HEADING = re.compile(r"^chapter\s+(\d+|[ivxlcdm]+)\b", re.IGNORECASE)
+_PROLOGUE_HEADING = re.compile(r"^(序章|序言|楔子|引子|序)(?:$|[\s:：、.．·\-—])")
+
+_CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CN_UNITS = {"十": 10, "百": 100, "千": 1000, "万": 10000}
+_ROMAN = {"i": 1, "v": 5, "x": 10, "l": 50, "c": 100, "d": 500, "m": 1000}
+
+
+def parse_chinese_number(text: str) -> Optional[int]:
+    """把章节编号转换为整数，支持 "12"、"１２"、"十二"、"一百零三"，无法识别时返回None"""
+    text = text.translate(str.maketrans("０１２３４５６７８９", "0123456789"))
+    if text.isdigit():
+        return int(text)
+    total, section, digit = 0, 0, None
+    for ch in text:
+        if ch in _CN_DIGITS:
+            digit = _CN_DIGITS[ch]
+        elif ch in _CN_UNITS:
+            unit = _CN_UNITS[ch]
+            if unit == 10000:
+                total += (section + (digit or 0)) * unit
+                section = 0
+            else:
+                section += (1 if digit is None else digit) * unit
+            digit = None
+        else:
+            return None
+    return total + section + (digit or 0)
+
+
+def _parse_roman(text: str) -> Optional[int]:
+    values = [_ROMAN[ch] for ch in text.lower()]
+    total = 0
+    for i, value in enumerate(values):
+        total += -value if i + 1 < len(values) and value < values[i + 1] else value
+    return total or None
+
+
+def parse_heading(line: str) -> Optional[Tuple[Optional[int], str]]:
+    """
+    判断一行是否为章节标题
+
+    返回：
+        (章节编号, 章节名称)；不是章节标题时返回None，序章编号为0，无法识别编号时为None
+    """
+    name = line.strip().lstrip("﻿")
+    if not name or len(name) > MAX_HEADING_LENGTH:
+        return None
+    m = _CN_HEADING.match(name)
+    if m:
+        return parse_chinese_number(m.group(1)), name
+    m = _EN_HEADING.match(name)
+    if m:
+        number = m.group(1)
+        return (int(number) if number.isdigit() else _parse_roman(number)), name
+    if _PROLOGUE_HEADING.match(name):
+        return 0, name
+    return None
+
+
+def iter_chapters(lines: Iterable[str]) -> Iterator[dict]:
+    """
+    逐行读取小说文本，按章节标题切分，逐章返回
+
+    参数：
+        lines: 文本行（可以是文件对象、io.StringIO 等，行尾换行符会保留在正文中）
+
+    返回：
+        Iterator[dict]: 每章包含 chapter_number、chapter_name、content；
+                        编号无法识别时沿用上一章编号加一
+    """
+    number: Optional[int] = None
+    name: Optional[str] = None
+    body: List[str] = []
+    last_number = 0
+
+    def build() -> Optional[dict]:
+        content = "".join(body).strip("\n")
+        if not content.strip():
+            return None
+        return {"chapter_number": number, "chapter_name": name, "content": content}
+
+    for line in lines:
+        heading = parse_heading(line)
+        if heading is None:
+            body.append(line)
+            continue
+        chapter = build()
+        if chapter:
+            yield chapter
+        parsed_number, name = heading
+        number = parsed_number if parsed_number is not None else last_number + 1
+        last_number = number
+        body = []
+
+    chapter = build()
+    if chapter:
+        yield chapter
@@ -0,0 +1,98 @@
+# backend/app/services/character_context.py
+#
+# 分镜提示词的角色上下文 - 只把当前段落中出现的角色的完整描述发给AI
+#
+# 这个文件专门负责：
+# 1. 从角色名称推导别名（"哈利·波特" -> "哈利"、"波特"；"张三丰" -> "三丰"；"林黛玉（颦儿）" -> "颦儿"），建立别名索引
+# 2. 用一个正则一次扫描段落文本，找出段落中提到的角色
+# 3. 出现的角色附带完整描述，其余角色只列出名称（紧凑名单），避免AI把它们当成新角色
+#
+# 设计原则：
+# - 宁可多选不可漏选：别名至少两个字，匹配到任意别名就包含该角色
+# - 输出按名称排序，角色集合相同时提示词和缓存键保持一致
+
+import re
+from typing import Any, Dict, List, Tuple
+
+# 别名最短长度，单字别名（如"张"）误匹配太多
+MIN_ALIAS_LENGTH = 2
+
+# 名称中的别名分隔符，如 "林黛玉（颦儿）"、"孙悟空/齐天大圣"、"哈利·波特"
+_ALIAS_SEPARATORS = re.compile(r"[（）()\[\]【】/／、,，|·•・\s]+")
+
+# 常见复姓，推导名字时整体去掉
+_COMPOUND_SURNAMES = (
+    "欧阳", "上官", "司马", "诸葛", "东方", "皇甫", "慕容", "令狐", "独孤", "南宫",
+    "西门", "长孙", "宇文", "尉迟", "公孙", "夏侯", "轩辕", "端木", "百里", "东郭"
+)
+
+
+def _is_chinese_name(name: str) -> bool:
+    return all("\u4e00" <= ch <= "\u9fff" for ch in name)
+
+
+def character_aliases(name: str) -> List[str]:
+    """
+    根据角色名称推导可用于匹配的别名（包含名称本身）
+
+    - 名称中用括号、斜杠、间隔号分开的每个部分都作为别名
+    - 三到四个字的中文姓名去掉姓（含常见复姓）后的名字作为别名
+    """
+    name = (name or "").strip()
+    if not name:
+        return []
+    aliases = {name}
+    for part in _ALIAS_SEPARATORS.split(name):
+        if len(part) >= MIN_ALIAS_LENGTH:
+            aliases.add(part)
+    for part in list(aliases):
+        if not _is_chinese_name(part) or not 3 <= len(part) <= 4:
+            continue
+        surname_length = 2 if part.startswith(_COMPOUND_SURNAMES) else 1
+        given_name = part[surname_length:]
+        if len(given_name) >= MIN_ALIAS_LENGTH:
+            aliases.add(given_name)
+    return sorted(aliases, key=len, reverse=True)
+
+
+class CharacterIndex:
+    """
+    项目角色的别名索引
+
+    参数：
+        characters: 角色列表，每项包含 name 和 description
+    """
+
+    def __init__(self, characters: List[Dict[str, Any]]):
+        self.characters = sorted(
+            (c for c in characters or [] if (c.get("name") or "").strip()),
+            key=lambda c: c.get("name") or ""
+        )
+        self._alias_owner: Dict[str, List[int]] = {}
+        for idx, character in enumerate(self.characters):
+            for alias in character_aliases(character["name"]):
+                self._alias_owner.setdefault(alias, []).append(idx)
+        # 长别名优先匹配，避免"三丰"先于"张三丰"被消耗
+        aliases = sorted(self._alias_owner, key=len, reverse=True)
+        self._pattern = re.compile("|".join(map(re.escape, aliases))) if aliases else None
+
+    def mentioned(self, text: str) -> List[Dict[str, Any]]:
+        """返回文本中提到的角色（按名称排序）"""
+        if not self._pattern or not text:
+            return []
+        hits = set()
+        for match in self._pattern.finditer(text):
+            hits.update(self._alias_owner[match.group(0)])
+        return [self.characters[idx] for idx in sorted(hits)]
+
+    def select(self, text: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        为一个段落选择角色上下文
+
+        返回：
+            (段落中出现的角色完整信息列表, 其余角色的名称列表)
+        """
+        mentioned = self.mentioned(text)
+        mentioned_names = {c["name"] for c in mentioned}
+        others = [c["name"] for c in self.characters if c["name"] not in mentioned_names]
+        return mentioned, others
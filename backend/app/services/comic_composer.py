@@ -14,10 +14,14 @@
 # - 专业效果：使用漫画专业字体和样式
 
 from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional
 import io
-import base64
 import os
+import weakref
+
+from app.services.image_handle import ImageHandle
+from app.services.render_pool import render_pool
 
 
 class DialoguePosition:
@@ -43,6 +47,32 @@ class BubbleType:
     SFX = "sfx"               # 音效
 
 
+# 字体缓存容量（不同路径和字号的组合数）
+FONT_CACHE_SIZE = 32
+
+# 每个字体对象的字形宽度缓存，字体从LRU缓存淘汰并被回收后自动释放
+_glyph_advances: "weakref.WeakKeyDictionary[ImageFont.FreeTypeFont, Dict[str, float]]" = weakref.WeakKeyDictionary()
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_font(font_path: Optional[str], size: int) -> ImageFont.FreeTypeFont:
+    """按 (字体路径, 字号) 加载字体，最近使用的字体对象保留在缓存中"""
+    if font_path:
+        return ImageFont.truetype(font_path, size)
+    return ImageFont.load_default()
+
+
+def _glyph_advance(font: ImageFont.FreeTypeFont, char: str) -> float:
+    """单个字符的前进宽度（按字体缓存）"""
+    advances = _glyph_advances.get(font)
+    if advances is None:
+        advances = _glyph_advances[font] = {}
+    width = advances.get(char)
+    if width is None:
+        width = advances[char] = font.getlength(char)
+    return width
+
+
 class ComicComposer:
     """漫画合成器"""
     
@@ -107,16 +137,13 @@ class ComicComposer:
         return font_paths
     
     def _get_font(self, size: int = 24, bold: bool = False) -> ImageFont.FreeTypeFont:
-        """获取字体对象"""
+        """获取字体对象（按字体路径和字号缓存，不会重复读取字体文件）"""
         try:
             font_key = "bold" if bold else "normal"
             font_path = self.font_paths.get(font_key) or self.font_paths.get("normal")
             
-            if font_path:
-                return ImageFont.truetype(font_path, size)
-            else:
-                # 使用默认字体
-                return ImageFont.load_default()
+            # 没有中文字体时 font_path 为None，使用默认字体
+            return _load_font(font_path, size)
         except Exception as e:
             print(f"⚠️ 字体加载失败: {e}")
             return ImageFont.load_default()
@@ -274,18 +301,21 @@ class ComicComposer:
         """
         lines = []
         current_line = ""
+        current_width = 0.0
         
+        # 累加每个字符的前进宽度（字形宽度有缓存），整体为线性复杂度，
+        # 不再对逐渐变长的整行反复计算边界框
         for char in text:
-            test_line = current_line + char
-            bbox = font.getbbox(test_line)
-            width = bbox[2] - bbox[0]
+            char_width = _glyph_advance(font, char)
             
-            if width <= max_width:
-                current_line = test_line
+            if current_width + char_width <= max_width:
+                current_line += char
+                current_width += char_width
             else:
                 if current_line:
                     lines.append(current_line)
                 current_line = char
+                current_width = char_width
         
         if current_line:
             lines.append(current_line)
@@ -299,10 +329,37 @@ class ComicComposer:
         camera_angle: Optional[str] = None
     ) -> str:
         """
-        在图片上添加对话框
+        在图片上添加对话框（base64接口，供直接接收base64图片的API使用）
         
         参数:
             image_base64: 原始图片的base64编码（data URL格式）
+            dialogues: 对话列表，格式见 render_dialogue_bubbles
+            camera_angle: 镜头角度（用于智能定位）
+        
+        返回:
+            添加对话框后的图片base64编码（data URL格式），失败时返回原图
+        """
+        try:
+            image = ImageHandle.from_base64(image_base64)
+            return ImageHandle(self.render_dialogue_bubbles(image.data, dialogues, camera_angle), "image/png").to_data_url()
+        except Exception as e:
+            print(f"❌ 对话框合成失败: {e}")
+            import traceback
+            traceback.print_exc()
+            # 失败时返回原图
+            return image_base64
+    
+    def render_dialogue_bubbles(
+        self,
+        image_bytes: bytes,
+        dialogues: List[Dict],
+        camera_angle: Optional[str] = None
+    ) -> bytes:
+        """
+        在图片上添加对话框（二进制接口，服务内部使用）
+        
+        参数:
+            image_bytes: 原始图片文件的字节
             dialogues: 对话列表
                 [
                     {
@@ -315,143 +372,134 @@ class ComicComposer:
             camera_angle: 镜头角度（用于智能定位）
         
         返回:
-            添加对话框后的图片base64编码（data URL格式）
+            添加对话框后的PNG图片字节，失败时抛出异常
         """
         print(f"🎨 开始合成对话框，共 {len(dialogues)} 条对话")
         
-        try:
-            # 1. 解码base64图片
-            if image_base64.startswith('data:image'):
-                image_data = image_base64.split(',')[1]
-            else:
-                image_data = image_base64
+        # 1. 打开图片
+        image = Image.open(io.BytesIO(image_bytes))
+        
+        # 转换为RGBA模式（支持透明度）
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        
+        # 创建一个透明图层用于绘制对话框
+        overlay = Image.new('RGBA', image.size, (255, 255, 255, 0))
+        draw = ImageDraw.Draw(overlay)
+        
+        # 2. 自动分配位置（如果没有指定）
+        auto_positions = self._auto_position_dialogues(
+            image.size, 
+            len(dialogues),
+            camera_angle
+        )
+        
+        # 3. 逐个绘制对话框
+        for i, dialogue in enumerate(dialogues):
+            text = dialogue.get("text", "")
+            if not text:
+                continue
+            
+            position = dialogue.get("position") or auto_positions[i]
+            bubble_type = dialogue.get("bubble_type", BubbleType.SPEECH)
+            speaker = dialogue.get("speaker", "")
+            
+            # 获取样式配置
+            config = self.bubble_config.get(bubble_type, self.bubble_config[BubbleType.SPEECH])
+            
+            # 字体大小
+            font_size = 28
+            font = self._get_font(font_size)
+            
+            # 计算文本尺寸（支持自动换行）
+            max_text_width = image.size[0] // 3  # 最大宽度为图片的1/3
+            lines = self._wrap_text(text, font, max_text_width)
             
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
+            # 如果有说话人，添加到第一行
+            # 修改说明：显示角色名称，格式为"角色名：对话内容"
+            # 优化：使用更大、更醒目的字体显示角色名，便于识别说话人
+            if speaker and speaker.strip():
+                # 使用比对话内容更大的字体显示角色名
+                speaker_font_size = int(font_size * 1.2)  # 从0.8改为1.2，增大20%
+                speaker_font = self._get_font(speaker_font_size)
+                speaker_line = f"【{speaker}】"  # 使用【】包裹，更醒目
+                lines = [speaker_line] + lines
             
-            # 转换为RGBA模式（支持透明度）
-            if image.mode != 'RGBA':
-                image = image.convert('RGBA')
+            # 计算对话框尺寸
+            line_height = font_size + 10
+            text_height = len(lines) * line_height
+            # 每行只计算一次边界框；角色名行用角色名字体测量（它比正文字体大）
+            line_widths = []
+            for idx, line in enumerate(lines):
+                line_font = speaker_font if idx == 0 and speaker and speaker.strip() else font
+                bbox = line_font.getbbox(line)
+                line_widths.append(bbox[2] - bbox[0])
+            text_width = max(line_widths)
             
-            # 创建一个透明图层用于绘制对话框
-            overlay = Image.new('RGBA', image.size, (255, 255, 255, 0))
-            draw = ImageDraw.Draw(overlay)
+            bubble_width = text_width + config["padding"] * 2
+            bubble_height = text_height + config["padding"] * 2
             
-            # 2. 自动分配位置（如果没有指定）
-            auto_positions = self._auto_position_dialogues(
-                image.size, 
-                len(dialogues),
-                camera_angle
+            # 计算对话框位置
+            bubble_x, bubble_y = self._calculate_bubble_position(
+                image.size,
+                position,
+                (bubble_width, bubble_height)
             )
             
-            # 3. 逐个绘制对话框
-            for i, dialogue in enumerate(dialogues):
-                text = dialogue.get("text", "")
-                if not text:
-                    continue
-                
-                position = dialogue.get("position") or auto_positions[i]
-                bubble_type = dialogue.get("bubble_type", BubbleType.SPEECH)
-                speaker = dialogue.get("speaker", "")
-                
-                # 获取样式配置
-                config = self.bubble_config.get(bubble_type, self.bubble_config[BubbleType.SPEECH])
-                
-                # 字体大小
-                font_size = 28
-                font = self._get_font(font_size)
-                
-                # 计算文本尺寸（支持自动换行）
-                max_text_width = image.size[0] // 3  # 最大宽度为图片的1/3
-                lines = self._wrap_text(text, font, max_text_width)
-                
-                # 如果有说话人，添加到第一行
-                # 修改说明：显示角色名称，格式为"角色名：对话内容"
-                # 优化：使用更大、更醒目的字体显示角色名，便于识别说话人
-                if speaker and speaker.strip():
-                    # 使用比对话内容更大的字体显示角色名
-                    speaker_font_size = int(font_size * 1.2)  # 从0.8改为1.2，增大20%
-                    speaker_font = self._get_font(speaker_font_size)
-                    speaker_line = f"【{speaker}】"  # 使用【】包裹，更醒目
-                    lines = [speaker_line] + lines
-                
-                # 计算对话框尺寸
-                line_height = font_size + 10
-                text_height = len(lines) * line_height
-                text_width = max([font.getbbox(line)[2] - font.getbbox(line)[0] for line in lines])
-                
-                bubble_width = text_width + config["padding"] * 2
-                bubble_height = text_height + config["padding"] * 2
-                
-                # 计算对话框位置
-                bubble_x, bubble_y = self._calculate_bubble_position(
-                    image.size,
-                    position,
-                    (bubble_width, bubble_height)
-                )
-                
-                # 绘制对话框背景
-                self._draw_rounded_rectangle(
-                    draw,
-                    (bubble_x, bubble_y, bubble_x + bubble_width, bubble_y + bubble_height),
-                    config["corner_radius"],
-                    config["bg_color"],
-                    config["border_color"],
-                    config["border_width"]
-                )
-                
-                # 绘制文字
-                text_x = bubble_x + config["padding"]
-                text_y = bubble_y + config["padding"]
-                
-                # 文字颜色（根据对话框类型）
-                # 修改说明：角色名使用深蓝色，专业且醒目
-                if bubble_type == BubbleType.CAPTION:
-                    text_color = (255, 255, 255, 255)  # 旁白用白色
-                    speaker_color = (255, 255, 255, 255)  # 旁白角色名也用白色
-                else:
-                    text_color = (0, 0, 0, 255)  # 对话内容用黑色
-                    speaker_color = (30, 70, 200, 255)  # 角色名用深蓝色，专业醒目
-                
-                # 修改说明：第一行如果是角色名，使用特殊样式和颜色
-                # 优化：角色名使用更大字体、醒目颜色和加粗效果
-                for idx, line in enumerate(lines):
-                    # 判断是否为角色名行（第一行且包含【】）
-                    is_speaker_line = (idx == 0 and speaker and speaker.strip() and '【' in line and '】' in line)
-                    
-                    if is_speaker_line:
-                        # 角色名使用更大的字体和醒目颜色
-                        current_font = self._get_font(speaker_font_size)
-                        current_color = speaker_color
-                        # 加粗效果：绘制3次，让文字更粗更醒目
-                        draw.text((text_x, text_y), line, font=current_font, fill=current_color)
-                        draw.text((text_x+1, text_y), line, font=current_font, fill=current_color)
-                        draw.text((text_x, text_y+1), line, font=current_font, fill=current_color)
-                    else:
-                        # 普通对话文字
-                        draw.text((text_x, text_y), line, font=font, fill=text_color)
-                    
-                    text_y += line_height
-                
-                print(f"  ✅ 添加对话框 #{i+1}: '{text[:10]}...' at {position}")
+            # 绘制对话框背景
+            self._draw_rounded_rectangle(
+                draw,
+                (bubble_x, bubble_y, bubble_x + bubble_width, bubble_y + bubble_height),
+                config["corner_radius"],
+                config["bg_color"],
+                config["border_color"],
+                config["border_width"]
+            )
             
-            # 4. 合并图层
-            final_image = Image.alpha_composite(image, overlay)
+            # 绘制文字
+            text_x = bubble_x + config["padding"]
+            text_y = bubble_y + config["padding"]
             
-            # 5. 转换回base64
-            output_buffer = io.BytesIO()
-            final_image.convert('RGB').save(output_buffer, format='PNG', quality=95)
-            output_base64 = base64.b64encode(output_buffer.getvalue()).decode('utf-8')
+            # 文字颜色（根据对话框类型）
+            # 修改说明：角色名使用深蓝色，专业且醒目
+            if bubble_type == BubbleType.CAPTION:
+                text_color = (255, 255, 255, 255)  # 旁白用白色
+                speaker_color = (255, 255, 255, 255)  # 旁白角色名也用白色
+            else:
+                text_color = (0, 0, 0, 255)  # 对话内容用黑色
+                speaker_color = (30, 70, 200, 255)  # 角色名用深蓝色，专业醒目
             
-            print(f"✅ 对话框合成完成")
-            return f"data:image/png;base64,{output_base64}"
+            # 修改说明：第一行如果是角色名，使用特殊样式和颜色
+            # 优化：角色名使用更大字体、醒目颜色和加粗效果
+            for idx, line in enumerate(lines):
+                # 判断是否为角色名行（第一行且包含【】）
+                is_speaker_line = (idx == 0 and speaker and speaker.strip() and '【' in line and '】' in line)
+                
+                if is_speaker_line:
+                    # 角色名使用更大的字体和醒目颜色
+                    current_font = speaker_font
+                    current_color = speaker_color
+                    # 加粗效果：绘制3次，让文字更粗更醒目
+                    draw.text((text_x, text_y), line, font=current_font, fill=current_color)
+                    draw.text((text_x+1, text_y), line, font=current_font, fill=current_color)
+                    draw.text((text_x, text_y+1), line, font=current_font, fill=current_color)
+                else:
+                    # 普通对话文字
+                    draw.text((text_x, text_y), line, font=font, fill=text_color)
+                
+                text_y += line_height
             
-        except Exception as e:
-            print(f"❌ 对话框合成失败: {e}")
-            import traceback
-            traceback.print_exc()
-            # 失败时返回原图
-            return image_base64
+            print(f"  ✅ 添加对话框 #{i+1}: '{text[:10]}...' at {position}")
+        
+        # 4. 合并图层
+        final_image = Image.alpha_composite(image, overlay)
+        
+        # 5. 编码为PNG
+        output_buffer = io.BytesIO()
+        final_image.convert('RGB').save(output_buffer, format='PNG', quality=95)
+        
+        print(f"✅ 对话框合成完成")
+        return output_buffer.getvalue()
 
 
 # 全局实例
@@ -488,3 +536,40 @@ def add_dialogues_to_image(
     """
     return comic_composer.add_dialogue_bubbles(image_base64, dialogues, camera_angle)
 
+
+def render_dialogues_on_image(
+    image_bytes: bytes,
+    dialogues: List[Dict],
+    camera_angle: Optional[str] = None
+) -> bytes:
+    """在图片字节上添加对话框，返回PNG字节（模块级函数，可以提交到渲染进程池）"""
+    return comic_composer.render_dialogue_bubbles(image_bytes, dialogues, camera_angle)
+
+
+async def add_dialogues_to_image_async(
+    image_base64: str,
+    dialogues: List[Dict],
+    camera_angle: Optional[str] = None
+) -> str:
+    """
+    在图片上添加对话框（异步版本，供API接口使用）
+    
+    解码、绘制、合成和PNG编码在渲染进程池中执行，不阻塞事件循环；
+    参数和返回值与 add_dialogues_to_image 相同。
+    渲染队列已满时抛出 render_pool.RenderQueueFull。
+    """
+    return await render_pool.run(add_dialogues_to_image, image_base64, dialogues, camera_angle)
+
+
+async def compose_dialogues_async(
+    image: ImageHandle,
+    dialogues: List[Dict],
+    camera_angle: Optional[str] = None
+) -> ImageHandle:
+    """
+    在图片上添加对话框（二进制异步版本，服务内部使用）
+    
+    图片以字节形式传给渲染进程池，全程不经过base64；合成失败时抛出异常，由调用方决定是否使用原图。
+    """
+    data = await render_pool.run(render_dialogues_on_image, image.data, dialogues, camera_angle)
+    return ImageHandle(data, "image/png")
@@ -0,0 +1,94 @@
+# backend/app/services/http_client.py
+#
+# 共享HTTP客户端管理 - 所有七牛云API调用复用的连接池
+#
+# 这个文件专门负责：
+# 1. 为每个API接入点维护一个长期存活的 httpx.AsyncClient
+# 2. 开启 keep-alive 连接复用，避免每次请求重新握手（TCP + TLS）
+# 3. 在安装了 h2 时自动启用 HTTP/2
+# 4. 按接入点限制最大连接数
+#
+# 设计原则：
+# - 应用启动时打开（main.py startup），关闭时统一释放
+# - 未启动时（如独立脚本）按需懒加载，调用方无需关心生命周期
+# - 超时由调用方按请求传入，不同API可以使用不同的超时
+
+import asyncio
+from typing import Dict
+
+import httpx
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 七牛云API接入点（与各服务模块中的常量保持一致）
+QINIU_API_BASE = "https://openai.qiniu.com/v1"
+QINIU_API_BASE_BACKUP = "https://api.qnaigc.com/v1"
+
+# 各接入点的连接池限制，未列出的接入点使用默认值
+ENDPOINT_LIMITS: Dict[str, httpx.Limits] = {
+    QINIU_API_BASE: httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60),
+    QINIU_API_BASE_BACKUP: httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+}
+DEFAULT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+
+# 默认超时，调用方通常会按请求覆盖
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=30.0)
+
+
+class HttpClientManager:
+    """按接入点管理共享的 httpx.AsyncClient"""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._lock = asyncio.Lock()
+
+    async def startup(self):
+        """应用启动时预先创建七牛云接入点的客户端"""
+        for base_url in ENDPOINT_LIMITS:
+            await self.get_client(base_url)
+        print(f"✅ 共享HTTP连接池已创建 (HTTP/2: {'开启' if HTTP2_AVAILABLE else '未安装h2，使用HTTP/1.1'})")
+
+    async def get_client(self, base_url: str) -> httpx.AsyncClient:
+        """
+        获取指定接入点的共享客户端，不存在时创建
+
+        参数：
+            base_url: API接入点，如 "https://openai.qiniu.com/v1"
+
+        返回：
+            httpx.AsyncClient: 该接入点的共享客户端
+        """
+        client = self._clients.get(base_url)
+        if client is not None and not client.is_closed:
+            return client
+
+        async with self._lock:
+            client = self._clients.get(base_url)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    limits=ENDPOINT_LIMITS.get(base_url, DEFAULT_LIMITS),
+                    timeout=DEFAULT_TIMEOUT,
+                    http2=HTTP2_AVAILABLE
+                )
+                self._clients[base_url] = client
+            return client
+
+    async def close(self):
+        """关闭所有客户端，释放连接"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        print("✅ 共享HTTP连接池已关闭")
+
+
+# 全局共享实例
+http_client_manager = HttpClientManager()
+
+
+async def get_http_client(base_url: str) -> httpx.AsyncClient:
+    """获取指定接入点的共享客户端（便捷函数）"""
+    return await http_client_manager.get_client(base_url)
@@ -0,0 +1,94 @@
+# backend/app/services/image_handle.py
+#
+# 图片句柄 - 服务之间传递的二进制图片数据
+#
+# 这个文件专门负责：
+# 1. 用原始字节（bytes）表示一张图片，在文生图、对话框合成、图片存储之间传递
+# 2. 文生图接口返回的base64只在进入系统时解码一次（自动补齐缺失的 = 填充）
+# 3. 只有客户端明确需要 data URL 时才重新编码为base64
+#
+# 设计原则：
+# - 内部流程不再来回传递数MB的 "data:image/png;base64,..." 字符串
+# - bytes 可以直接传给渲染进程池（pickle），不需要额外转换
+
+import base64
+import binascii
+from typing import Optional
+
+# 文件头与图片类型的对应关系
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+)
+
+_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+
+
+def _sniff_mime_type(data: bytes) -> Optional[str]:
+    """根据文件头判断图片类型"""
+    for signature, mime_type in _SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class ImageHandle:
+    """
+    内存中的一张图片
+
+    属性：
+        data: 图片文件的原始字节
+        mime_type: 图片类型（如 image/png）
+    """
+
+    __slots__ = ("data", "mime_type")
+
+    def __init__(self, data: bytes, mime_type: Optional[str] = None):
+        self.data = data
+        self.mime_type = mime_type or _sniff_mime_type(data) or "image/png"
+
+    @classmethod
+    def from_base64(cls, value: str) -> "ImageHandle":
+        """
+        从base64字符串或 data URL 解码（整个流程中唯一一次解码）
+
+        AI或PIL生成的base64可能缺少 = 填充，解码失败时自动补齐后重试；
+        仍然失败时抛出 ValueError。
+        """
+        mime_type = None
+        if value.startswith("data:") and "," in value:
+            header, value = value.split(",", 1)
+            mime_type = header[5:].split(";", 1)[0] or None
+        try:
+            data = base64.b64decode(value)
+        except (binascii.Error, ValueError) as e:
+            padding_needed = -len(value) % 4
+            if not padding_needed:
+                raise ValueError(f"Base64解码失败: {e}") from e
+            print(f"🔧 修复Base64 padding：添加 {padding_needed} 个 '=' 填充符")
+            try:
+                data = base64.b64decode(value + "=" * padding_needed)
+            except (binascii.Error, ValueError) as e2:
+                raise ValueError(f"Base64解码失败: {e2}") from e2
+        # 以文件头为准，data URL 中声明的类型可能不准确
+        return cls(data, _sniff_mime_type(data) or mime_type)
+
+    @property
+    def extension(self) -> str:
+        """保存为文件时使用的扩展名"""
+        return _EXTENSIONS.get(self.mime_type, ".png")
+
+    def to_data_url(self) -> str:
+        """编码为 data URL（仅在客户端需要直接显示base64图片时使用）"""
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+    def __len__(self) -> int:
+        return len(self.data)
@@ -0,0 +1,214 @@
+# backend/app/services/image_jobs.py
+#
+# 项目批量配图任务的状态存储
+#
+# 这个文件专门负责：
+# 1. 把批量配图任务和每个分镜的生成状态保存到本地任务队列的SQLite文件中
+# 2. 任务由持久化任务队列执行，API进程、独立worker进程都能读写同一份状态，服务重启后可以继续
+# 3. 为SSE接口提供"等待下一次进度变化"的能力，同进程内更新时立即唤醒
+#
+# 设计原则：
+# - 每次状态变化都递增任务的 seq，订阅者用 seq 判断是否有新进度
+# - 任务重新执行时只生成还没有完成的分镜（断点续跑）
+
+import asyncio
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.services.job_queue import job_queue
+from app.services.sqlite_store import SQLiteStore
+
+# 任务的终止状态，到达后SSE连接关闭
+TERMINAL_STATUSES = ("completed", "failed")
+
+# 分镜已经有配图、重新执行任务时不再生成的状态
+DONE_PANEL_STATUSES = ("completed", "skipped")
+
+# 跨进程时读取SQLite的间隔（秒）
+POLL_INTERVAL = 0.5
+
+# 已结束任务的保留时间（秒）
+RETENTION_SECONDS = 7 * 24 * 3600
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+class ImageJobStore(SQLiteStore):
+    """批量配图任务状态的持久化存储"""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self._events: Dict[str, asyncio.Event] = {}
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_jobs (
+                job_id TEXT PRIMARY KEY,
+                project_id TEXT NOT NULL,
+                size TEXT NOT NULL,
+                style TEXT NOT NULL,
+                concurrency INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                seq INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                finished_at REAL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_job_panels (
+                job_id TEXT NOT NULL,
+                storyboard_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                image_url TEXT,
+                error TEXT,
+                PRIMARY KEY (job_id, storyboard_id)
+            )
+        """)
+        expired = time.time() - RETENTION_SECONDS
+        conn.execute("BEGIN")
+        conn.execute(
+            "DELETE FROM image_job_panels WHERE job_id IN (SELECT job_id FROM image_jobs WHERE updated_at < ?)",
+            (expired,)
+        )
+        conn.execute("DELETE FROM image_jobs WHERE updated_at < ?", (expired,))
+        conn.execute("COMMIT")
+
+    # ---------- 同步实现（在线程中执行，避免阻塞事件循环） ----------
+
+    def _create(self, job_id: str, project_id: str, panels: List[Dict[str, Any]],
+                size: str, style: str, concurrency: int):
+        self._ensure_schema()
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT INTO image_jobs (job_id, project_id, size, style, concurrency, status, seq, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'pending', 1, ?, ?)",
+                (job_id, project_id, size, style, concurrency, now, now)
+            )
+            conn.executemany(
+                "INSERT INTO image_job_panels (job_id, storyboard_id, position, status, image_url) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (job_id, panel["storyboard_id"], position, panel.get("status", "pending"), panel.get("image_url"))
+                    for position, panel in enumerate(panels)
+                ]
+            )
+            conn.execute("COMMIT")
+
+    def _set_status(self, job_id: str, status: str, error: Optional[str]):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE image_jobs SET status = ?, error = ?, finished_at = ?, seq = seq + 1, updated_at = ? WHERE job_id = ?",
+                (status, error, now if status in TERMINAL_STATUSES else None, now, job_id)
+            )
+
+    def _update_panel(self, job_id: str, storyboard_id: str, fields: Dict[str, Any]):
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"UPDATE image_job_panels SET {assignments} WHERE job_id = ? AND storyboard_id = ?",
+                (*fields.values(), job_id, storyboard_id)
+            )
+            conn.execute("UPDATE image_jobs SET seq = seq + 1, updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+            conn.execute("COMMIT")
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_schema()
+        with self._connection() as conn:
+            # 同一个读事务中读取任务和分镜，保证 seq 与分镜状态一致
+            conn.execute("BEGIN")
+            job = conn.execute("SELECT * FROM image_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            panels = conn.execute(
+                "SELECT storyboard_id, status, image_url, error FROM image_job_panels WHERE job_id = ? ORDER BY position",
+                (job_id,)
+            ).fetchall() if job else []
+            conn.execute("COMMIT")
+        if job is None:
+            return None
+        results = [dict(panel) for panel in panels]
+        return {
+            "job_id": job["job_id"],
+            "project_id": job["project_id"],
+            "size": job["size"],
+            "style": job["style"],
+            "concurrency": job["concurrency"],
+            "status": job["status"],
+            "error": job["error"],
+            "seq": job["seq"],
+            "total": len(results),
+            "completed": sum(1 for r in results if r["status"] in DONE_PANEL_STATUSES),
+            "failed": sum(1 for r in results if r["status"] == "failed"),
+            "running": sum(1 for r in results if r["status"] == "running"),
+            "created_at": _isoformat(job["created_at"]),
+            "finished_at": _isoformat(job["finished_at"]),
+            "results": results
+        }
+
+    # ---------- 异步接口 ----------
+
+    def _notify(self, job_id: str):
+        event = self._events.pop(job_id, None)
+        if event:
+            event.set()
+
+    async def create(self, job_id: str, project_id: str, panels: List[Dict[str, Any]],
+                     size: str, style: str, concurrency: int):
+        """
+        登记任务
+
+        参数：
+            job_id: 任务ID（任务队列中的任务通过 payload 中的 job_id 找到这里的状态）
+            project_id: 项目ID
+            panels: 按生成顺序排列的分镜 [{"storyboard_id", "status", "image_url"}]，
+                    已有配图而跳过的分镜 status 为 "skipped"
+            size / style / concurrency: 生成参数
+        """
+        await self._run(self._create, job_id, project_id, panels, size, style, concurrency)
+
+    async def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        """更新任务状态（pending / running / completed / failed）"""
+        await self._run(self._set_status, job_id, status, error)
+        self._notify(job_id)
+
+    async def update_panel(self, job_id: str, storyboard_id: str, **fields):
+        """更新单个分镜的进度（status / image_url / error）"""
+        await self._run(self._update_panel, job_id, storyboard_id, fields)
+        self._notify(job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态和每个分镜的结果，不存在时返回None"""
+        return await self._run(self._get, job_id)
+
+    async def wait_for_update(self, job_id: str, seq: int, timeout: float = 15.0) -> Optional[Dict[str, Any]]:
+        """
+        等待任务的 seq 超过给定值
+
+        同进程更新时立即唤醒；其他进程（如独立worker）的更新每 POLL_INTERVAL 秒从SQLite读取一次。
+        超时后返回当前状态（可能没有变化），调用方可借此发送心跳。
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.get(job_id)
+            if job is None or job["seq"] > seq:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            event = self._events.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(POLL_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+
+# 全局任务状态存储，与任务队列共用同一个SQLite文件
+image_jobs = ImageJobStore(job_queue.db_path)
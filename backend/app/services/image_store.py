@@ -0,0 +1,202 @@
+# backend/app/services/image_store.py
+#
+# 按内容寻址的本地图片存储
+#
+# 这个文件专门负责：
+# 1. 以图片内容的 sha256 作为对象键（按哈希前两位分子目录）写入存储后端，相同图片只存一份
+# 2. 引用表（SQLite）记录每个分镜当前使用的图片；分镜换图后旧图片不再被引用时立即删除
+# 3. 垃圾回收：清理没有任何引用的图片文件
+#
+# 设计原则：
+# - 文件内容不可变：同一个文件名永远对应同一份内容，可以放心长期缓存
+# - 实际读写由 object_storage 的存储后端完成（本地磁盘或S3兼容存储）
+# - 刚写入、还没来得及登记引用的图片在宽限期内不会被回收，避免与并发保存冲突
+# - 多节点共用的存储（s3）只登记引用、不删除任何对象（单个节点的引用表看不到其他节点的引用），
+#   回收和换图删除只对本地存储生效，s3 存储桶只增不减
+# - 旧版按 "{storyboard_id}_{时间}.png" 命名的文件不归本存储管理，不会被回收
+
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+# 添加 backend 目录到 Python 路径，确保能导入config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import config
+from app.services.object_storage import StorageBackend, storage
+from app.services.sqlite_store import SQLiteStore, resolve_backend_path
+
+# 写入后多长时间内不回收（秒），覆盖"写文件"到"登记引用"之间的窗口
+GC_GRACE_SECONDS = 600
+
+
+class ImageStore(SQLiteStore):
+    """
+    按内容寻址的图片存储
+
+    参数：
+        storage: 存储后端
+        db_path: 引用表SQLite文件路径
+    """
+
+    def __init__(self, storage: StorageBackend, db_path: str):
+        super().__init__(db_path)
+        self.storage = storage
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_blobs (
+                blob_path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_put_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_refs (
+                owner_id TEXT PRIMARY KEY,
+                blob_path TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_image_refs_blob ON image_refs (blob_path)")
+
+    @staticmethod
+    def blob_path_for(data: bytes, extension: str) -> str:
+        """图片内容对应的相对路径，如 "ab/abcdef...png"（使用 / 分隔，可以直接拼接URL）"""
+        digest = hashlib.sha256(data).hexdigest()
+        return f"{digest[:2]}/{digest}{extension}"
+
+    def url_for(self, blob_path: str) -> str:
+        """图片的公开访问URL（由存储后端根据配置生成）"""
+        return self.storage.url_for(blob_path)
+
+    def _put_blob(self, blob_path: str, data: bytes):
+        if not self.storage.exists(blob_path):
+            self.storage.write(blob_path, data)
+
+    def _delete_blob(self, conn: sqlite3.Connection, blob_path: str):
+        conn.execute("DELETE FROM image_blobs WHERE blob_path = ?", (blob_path,))
+        self.storage.delete(blob_path)
+
+    # ---------- 同步实现（在线程中执行，避免阻塞事件循环） ----------
+
+    def _save(self, data: bytes, extension: str, owner_id: Optional[str]) -> str:
+        self._ensure_schema()
+        blob_path = self.blob_path_for(data, extension)
+        if self.storage.shared:
+            # 共享存储不会被本地回收删除，上传时不需要持有写锁
+            self._put_blob(blob_path, data)
+        now = time.time()
+        with self._connection() as conn:
+            # 写锁内检查并写入文件，避免同一内容在写入时被并发的回收删除
+            conn.execute("BEGIN IMMEDIATE")
+            if not self.storage.shared:
+                self._put_blob(blob_path, data)
+            conn.execute(
+                "INSERT INTO image_blobs (blob_path, size, created_at, last_put_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(blob_path) DO UPDATE SET last_put_at = excluded.last_put_at",
+                (blob_path, len(data), now, now)
+            )
+            if owner_id:
+                row = conn.execute("SELECT blob_path FROM image_refs WHERE owner_id = ?", (owner_id,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO image_refs (owner_id, blob_path, updated_at) VALUES (?, ?, ?)",
+                    (owner_id, blob_path, now)
+                )
+                # 旧图片不再被任何分镜引用时立即删除
+                previous = row[0] if row else None
+                if previous and previous != blob_path:
+                    self._collect_if_unreferenced(conn, previous, now)
+            conn.execute("COMMIT")
+        return blob_path
+
+    def _collect_if_unreferenced(self, conn: sqlite3.Connection, blob_path: str, now: float):
+        if self.storage.shared:
+            return
+        referenced = conn.execute("SELECT 1 FROM image_refs WHERE blob_path = ? LIMIT 1", (blob_path,)).fetchone()
+        if referenced:
+            return
+        row = conn.execute("SELECT last_put_at FROM image_blobs WHERE blob_path = ?", (blob_path,)).fetchone()
+        if row is None or now - row[0] >= GC_GRACE_SECONDS:
+            self._delete_blob(conn, blob_path)
+
+    def _release(self, owner_ids: List[str]):
+        self._ensure_schema()
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            released = set()
+            for owner_id in owner_ids:
+                row = conn.execute("SELECT blob_path FROM image_refs WHERE owner_id = ?", (owner_id,)).fetchone()
+                if row:
+                    conn.execute("DELETE FROM image_refs WHERE owner_id = ?", (owner_id,))
+                    released.add(row[0])
+            for blob_path in released:
+                self._collect_if_unreferenced(conn, blob_path, now)
+            conn.execute("COMMIT")
+
+    def _gc(self, grace_seconds: float) -> Dict[str, Any]:
+        self._ensure_schema()
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        freed = 0
+        if self.storage.shared:
+            return {"removed": 0, "freed_bytes": 0}
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT blob_path, size FROM image_blobs "
+                "WHERE last_put_at < ? AND blob_path NOT IN (SELECT blob_path FROM image_refs)",
+                (cutoff,)
+            ).fetchall()
+            for blob_path, size in rows:
+                self._delete_blob(conn, blob_path)
+                removed += 1
+                freed += size
+            conn.execute("COMMIT")
+        # 清理写入中断留下的临时文件
+        self.storage.cleanup_temp(cutoff)
+        return {"removed": removed, "freed_bytes": freed}
+
+    def _stats(self) -> Dict[str, Any]:
+        self._ensure_schema()
+        with self._connection() as conn:
+            blobs, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM image_blobs").fetchone()
+            refs = conn.execute("SELECT COUNT(*) FROM image_refs").fetchone()[0]
+        return {"backend": self.storage.name, "blobs": blobs, "total_bytes": total, "refs": refs}
+
+    # ---------- 异步接口 ----------
+
+    async def save(self, data: bytes, extension: str = ".png", owner_id: Optional[str] = None) -> str:
+        """
+        保存图片并（可选）登记为 owner_id（如分镜ID）当前使用的图片
+
+        参数：
+            data: 图片文件的字节
+            extension: 文件扩展名
+            owner_id: 引用者ID；该引用者之前的图片不再被引用时会被删除
+
+        返回：
+            str: 相对于图片根目录的路径（如 "ab/abcdef...png"）
+        """
+        return await self._run(self._save, data, extension, owner_id)
+
+    async def release(self, owner_ids: List[str]):
+        """删除这些引用者的引用（如分镜被删除），图片不再被引用时一并删除"""
+        if owner_ids:
+            await self._run(self._release, list(owner_ids))
+
+    async def gc(self, grace_seconds: float = GC_GRACE_SECONDS) -> Dict[str, Any]:
+        """回收没有引用、且超过宽限期的图片，返回删除的文件数和释放的字节数"""
+        return await self._run(self._gc, grace_seconds)
+
+    async def stats(self) -> Dict[str, Any]:
+        """存储统计：图片文件数、总字节数、引用数"""
+        return await self._run(self._stats)
+
+
+# 全局图片存储实例（相对路径相对于 backend 目录）
+image_store = ImageStore(storage, resolve_backend_path(config.image_store_path))
@@ -23,6 +23,7 @@ from typing import Optional, Dict, Any
 # 添加 backend 目录到 Python 路径，确保能导入config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config import config
+from app.services.http_client import get_http_client
 
 # 七牛云OpenAI兼容API入口
 QINIU_API_BASE = "https://openai.qiniu.com/v1"
@@ -64,34 +65,34 @@ async def call_qiniu_vision_api(messages: list) -> Optional[str]:
     print(f"🤖 模型: {config.model}")
 
     # 发送HTTP请求
-    async with httpx.AsyncClient(timeout=config.timeout) as client:
-        try:
-            print(f"📤 发送图片分析请求...")
-            r = await client.post(url, headers=headers, json=payload)
-            print(f"📥 收到响应: {r.status_code}")
-            
-            # 检查HTTP状态码
-            if r.status_code != 200:
-                print(f"❌ API响应错误: {r.status_code}")
-                print(f"📄 响应内容: {r.text}")
-                try:
-                    error_data = r.json()
-                    print(f"🔍 错误详情: {error_data}")
-                except:
-                    print(f"🔍 无法解析错误响应为JSON")
-                return None
-            
-            print(f"✅ API调用成功!")
-            data = r.json()
-            
-        except httpx.RequestError as e:
-            print(f"❌(图生文服务) 网络请求失败: {e}")
-            print(f"🔍 错误类型: {type(e).__name__}")
-            return None
-        except Exception as e:
-            print(f"❌(图生文服务) API调用失败: {e}")
-            print(f"🔍 错误类型: {type(e).__name__}")
+    client = await get_http_client(QINIU_API_BASE)
+    try:
+        print(f"📤 发送图片分析请求...")
+        r = await client.post(url, headers=headers, json=payload, timeout=config.timeout)
+        print(f"📥 收到响应: {r.status_code}")
+        
+        # 检查HTTP状态码
+        if r.status_code != 200:
+            print(f"❌ API响应错误: {r.status_code}")
+            print(f"📄 响应内容: {r.text}")
+            try:
+                error_data = r.json()
+                print(f"🔍 错误详情: {error_data}")
+            except:
+                print(f"🔍 无法解析错误响应为JSON")
             return None
+        
+        print(f"✅ API调用成功!")
+        data = r.json()
+        
+    except httpx.RequestError as e:
+        print(f"❌(图生文服务) 网络请求失败: {e}")
+        print(f"🔍 错误类型: {type(e).__name__}")
+        return None
+    except Exception as e:
+        print(f"❌(图生文服务) API调用失败: {e}")
+        print(f"🔍 错误类型: {type(e).__name__}")
+        return None
 
     # 提取AI返回的文本内容
     try:
@@ -0,0 +1,159 @@
+# backend/app/services/incremental_parse.py
+#
+# 增量重新解析 - 计算修改后的原文中哪些分镜需要重新生成
+#
+# 这个文件专门负责：
+# 1. 把新旧原文切分为句子级单元（text_segmenter 的无损分句），用 difflib 找出增删改的单元
+# 2. 通过分镜的 original_text_snippet 把每个分镜定位到旧原文中的单元范围
+# 3. 涉及修改的分镜标记为需要重新生成，其余分镜原样保留（包括已生成的图片）
+# 4. 按新原文的顺序输出"保留分镜"和"待重新生成的文本区域"交错排列的计划
+#
+# 设计原则：
+# - 纯计算，不调用AI、不访问数据库，便于独立测试
+# - 无法在旧原文中定位的分镜依附于前一个分镜的位置，宁可多重新生成也不保留过期分镜
+
+import bisect
+import difflib
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.text_segmenter import split_sentences
+
+# 片段无法完整匹配时，用开头若干字尝试定位
+SNIPPET_PREFIX_LENGTH = 12
+
+
+def _locate_snippet(text: str, snippet: Optional[str], cursor: int) -> Optional[Tuple[int, int]]:
+    """在原文中定位分镜片段，优先从上一个分镜之后查找，返回字符区间 [start, end)"""
+    snippet = (snippet or "").strip()
+    if not snippet:
+        return None
+    for needle in (snippet, snippet[:SNIPPET_PREFIX_LENGTH]):
+        start = text.find(needle, cursor)
+        if start < 0:
+            start = text.find(needle)
+        if start >= 0:
+            end = start + len(snippet) if needle == snippet else start + len(needle)
+            return start, min(end, len(text))
+    return None
+
+
+def plan_incremental_parse(old_text: str, new_text: str, panels: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    计算增量重新解析的计划
+
+    参数：
+        old_text: 数据库中保存的旧原文
+        new_text: 修改后的新原文
+        panels: 旧分镜列表（按 panel_index 排序），每项包含 storyboard_id 和 original_text_snippet
+
+    返回：
+        dict:
+            items: 按新原文顺序排列的计划，每项为
+                   {"kind": "keep", "storyboard_id": ...} 或 {"kind": "regenerate", "text": ...}
+            removed_ids: 需要删除的旧分镜ID列表
+    """
+    old_units = split_sentences(old_text)
+    new_units = split_sentences(new_text)
+
+    # 单元在旧原文中的起始字符位置，用于把字符区间换算为单元区间
+    old_starts = []
+    offset = 0
+    for unit in old_units:
+        old_starts.append(offset)
+        offset += len(unit)
+
+    def unit_at(char_pos: int) -> int:
+        return max(0, bisect.bisect_right(old_starts, char_pos) - 1)
+
+    # 1. 定位每个分镜覆盖的旧单元区间 [first, last]
+    panel_spans = []
+    cursor = 0
+    for panel in panels:
+        span = _locate_snippet(old_text, panel.get("original_text_snippet"), cursor) if old_units else None
+        if span:
+            first, last = unit_at(span[0]), unit_at(max(span[0], span[1] - 1))
+            cursor = span[1]
+            located = True
+        else:
+            first = last = unit_at(cursor) if old_units else 0
+            located = False
+        panel_spans.append((first, last, located))
+
+    # 2. 对比新旧单元（忽略首尾空白差异），标记被修改的旧单元
+    matcher = difflib.SequenceMatcher(
+        None, [u.strip() for u in old_units], [u.strip() for u in new_units], autojunk=False
+    )
+    opcodes = matcher.get_opcodes()
+    dirty_old = [False] * len(old_units)
+    old_to_new: Dict[int, int] = {}
+    insert_points = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            for k in range(i2 - i1):
+                old_to_new[i1 + k] = j1 + k
+        elif tag in ("replace", "delete"):
+            for i in range(i1, i2):
+                dirty_old[i] = True
+        elif tag == "insert":
+            insert_points.append(i1)
+
+    # 3. 触及修改单元（或中间插入了新内容）的分镜需要重新生成，
+    #    它覆盖的全部单元也随之重新生成，直到不再扩散
+    dirty_panels = [
+        not located or any(first < i <= last for i in insert_points)
+        for first, last, located in panel_spans
+    ]
+    changed = True
+    while changed:
+        changed = False
+        for idx, (first, last, _) in enumerate(panel_spans):
+            if not old_units:
+                continue
+            touched = any(dirty_old[first:last + 1])
+            if dirty_panels[idx] or touched:
+                if not dirty_panels[idx]:
+                    dirty_panels[idx] = True
+                    changed = True
+                for i in range(first, last + 1):
+                    if not dirty_old[i]:
+                        dirty_old[i] = True
+                        changed = True
+
+    # 4. 标记新原文中需要重新生成的单元：新增/替换的单元，以及对应到脏旧单元的相同单元
+    dirty_new = [False] * len(new_units)
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag in ("replace", "insert"):
+            for j in range(j1, j2):
+                dirty_new[j] = True
+    for i, j in old_to_new.items():
+        if dirty_old[i]:
+            dirty_new[j] = True
+
+    # 5. 按新原文位置合并"保留分镜"和"重新生成区域"
+    positioned = []
+    for idx, panel in enumerate(panels):
+        if dirty_panels[idx]:
+            continue
+        new_pos = old_to_new.get(panel_spans[idx][0])
+        if new_pos is None:
+            continue
+        positioned.append((new_pos, 1, idx, {"kind": "keep", "storyboard_id": panel["storyboard_id"]}))
+
+    j = 0
+    while j < len(new_units):
+        if not dirty_new[j]:
+            j += 1
+            continue
+        start = j
+        while j < len(new_units) and dirty_new[j]:
+            j += 1
+        region_text = "".join(new_units[start:j])
+        if region_text.strip():
+            positioned.append((start, 0, -1, {"kind": "regenerate", "text": region_text}))
+
+    positioned.sort(key=lambda item: item[:3])
+    items = [item[3] for item in positioned]
+    kept_ids = {item["storyboard_id"] for item in items if item["kind"] == "keep"}
+    removed_ids = [p["storyboard_id"] for p in panels if p["storyboard_id"] not in kept_ids]
+
+    return {"items": items, "removed_ids": removed_ids}
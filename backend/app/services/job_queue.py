@@ -0,0 +1,353 @@
+# backend/app/services/job_queue.py
+#
+# 持久化后台任务队列
+#
+# 这个文件专门负责：
+# 1. 把耗时任务（如文本解析）持久化到本地SQLite，服务重启后任务不会丢失
+# 2. 多个worker进程通过"租约"安全地领取任务，worker崩溃后租约过期会被其他worker接手
+# 3. 任务失败后按指数退避自动重试，超过最大次数后标记为失败
+# 4. 记录任务状态，供API查询
+#
+# 设计原则：
+# - 只依赖标准库sqlite3，WAL模式下支持多进程同时读写
+# - 队列本身不关心任务内容，由 JobWorker 按任务类型分发给注册的处理函数
+# - 处理函数必须可重复执行（重试时会再次调用）
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import sys
+import time
+import traceback
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# 添加 backend 目录到 Python 路径，确保能导入config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import config
+from app.services.sqlite_store import SQLiteStore, resolve_backend_path
+
+
+class JobStatus:
+    """任务状态"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class JobQueue(SQLiteStore):
+    """基于SQLite的持久化任务队列"""
+
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, available_at)")
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    # ---------- 同步实现（在线程中执行，避免阻塞事件循环） ----------
+
+    def _enqueue(self, kind: str, payload: Dict[str, Any], max_attempts: int) -> str:
+        self._ensure_schema()
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, payload, status, attempts, max_attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), JobStatus.QUEUED, max_attempts, now, now, now)
+            )
+        return job_id
+
+    def _enqueue_many(self, kind: str, payloads: List[Dict[str, Any]], max_attempts: int) -> List[str]:
+        self._ensure_schema()
+        job_ids = [str(uuid.uuid4()) for _ in payloads]
+        now = time.time()
+        # available_at 逐个微增，保证同一批任务按入队顺序被领取
+        rows = [
+            (job_id, kind, json.dumps(payload, ensure_ascii=False), JobStatus.QUEUED, max_attempts, now + i * 1e-6, now, now)
+            for i, (job_id, payload) in enumerate(zip(job_ids, payloads))
+        ]
+        with self._connection() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO jobs (job_id, kind, payload, status, attempts, max_attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("COMMIT")
+        return job_ids
+
+    def _claim(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        self._ensure_schema()
+        now = time.time()
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE 获取写锁，保证同一任务只会被一个worker领取
+            conn.execute("BEGIN IMMEDIATE")
+            # 租约过期且已用完执行次数的任务（worker多次崩溃）直接标记为失败
+            conn.execute(
+                "UPDATE jobs SET status = ?, last_error = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_expires_at < ? AND attempts >= max_attempts",
+                (JobStatus.FAILED, "租约过期且已达最大执行次数", now, JobStatus.RUNNING, now)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE "
+                "(status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ?) "
+                "ORDER BY available_at LIMIT 1",
+                (JobStatus.QUEUED, now, JobStatus.RUNNING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires_at = ?, updated_at = ? "
+                "WHERE job_id = ?",
+                (JobStatus.RUNNING, worker_id, now + lease_seconds, now, row["job_id"])
+            )
+            claimed = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone()
+            conn.execute("COMMIT")
+            return self._row_to_dict(claimed)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _extend_lease(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        now = time.time()
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE job_id = ? AND lease_owner = ? AND status = ?",
+                (now + lease_seconds, now, job_id, worker_id, JobStatus.RUNNING)
+            )
+            return cursor.rowcount == 1
+
+    def _complete(self, job_id: str, worker_id: str):
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE job_id = ? AND lease_owner = ?",
+                (JobStatus.COMPLETED, time.time(), job_id, worker_id)
+            )
+
+    def _fail(self, job_id: str, worker_id: str, error: str, retry_delay: float) -> str:
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return JobStatus.FAILED
+            status = JobStatus.QUEUED if row["attempts"] < row["max_attempts"] else JobStatus.FAILED
+            conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, last_error = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                "updated_at = ? WHERE job_id = ? AND lease_owner = ?",
+                (status, now + retry_delay, error, now, job_id, worker_id)
+            )
+            return status
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_schema()
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return self._row_to_dict(row) if row else None
+
+    # ---------- 异步接口 ----------
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any], max_attempts: int = 3) -> str:
+        """
+        添加任务到队列
+
+        参数：
+            kind: 任务类型（对应 JobWorker 中注册的处理函数）
+            payload: 任务参数（必须可JSON序列化）
+            max_attempts: 最大执行次数（含首次执行）
+
+        返回：
+            str: 任务ID
+        """
+        return await self._run(self._enqueue, kind, payload, max_attempts)
+
+    async def enqueue_many(self, kind: str, payloads: List[Dict[str, Any]], max_attempts: int = 3) -> List[str]:
+        """
+        在一个事务中批量添加同类任务（如整本小说的各章节解析），按列表顺序执行
+
+        返回：
+            List[str]: 任务ID列表，顺序与 payloads 一致
+        """
+        if not payloads:
+            return []
+        return await self._run(self._enqueue_many, kind, payloads, max_attempts)
+
+    async def claim(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """领取一个可执行的任务（排队中或租约已过期），没有任务时返回None"""
+        return await self._run(self._claim, worker_id, lease_seconds)
+
+    async def extend_lease(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """续租，返回False表示租约已被其他worker接手"""
+        return await self._run(self._extend_lease, job_id, worker_id, lease_seconds)
+
+    async def complete(self, job_id: str, worker_id: str):
+        """标记任务完成"""
+        await self._run(self._complete, job_id, worker_id)
+
+    async def fail(self, job_id: str, worker_id: str, error: str, retry_delay: float = 0) -> str:
+        """标记任务失败，未超过最大次数时重新排队，返回任务的新状态"""
+        return await self._run(self._fail, job_id, worker_id, error, retry_delay)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务"""
+        return await self._run(self._get, job_id)
+
+
+# 续租出错时的重试间隔（秒）
+HEARTBEAT_RETRY_SECONDS = 5.0
+
+# 处理函数以 handler(**payload, attempt=第几次执行, max_attempts=最大执行次数) 的方式调用
+JobHandler = Callable[..., Awaitable[Any]]
+
+
+class JobWorker:
+    """
+    任务执行器
+
+    循环领取任务并调用对应的处理函数，执行期间定期续租。
+    可以嵌入API进程运行，也可以通过 worker.py 作为独立进程运行。
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: Dict[str, JobHandler],
+        concurrency: int = 1,
+        lease_seconds: float = 300,
+        poll_interval: float = 1.0
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stopping = False
+        self._tasks = []
+
+    async def _heartbeat(self, job_id: str, handler_task: asyncio.Task) -> bool:
+        """
+        执行期间每隔 1/3 租约时间续租一次
+
+        租约已被其他worker接手时取消处理函数，避免同一任务被两个worker同时执行；
+        续租出错（如SQLite繁忙）时稍后重试，直到租约即将到期仍未成功才取消处理函数。
+        取消了处理函数时返回True。
+        """
+        retry_delay = min(HEARTBEAT_RETRY_SECONDS, self.lease_seconds / 10)
+        lease_expires_at = time.monotonic() + self.lease_seconds
+        delay = self.lease_seconds / 3
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                extended = await self.queue.extend_lease(job_id, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                if time.monotonic() + retry_delay >= lease_expires_at:
+                    print(f"❌(Worker) 任务 {job_id} 续租持续失败，租约即将过期，停止执行: {e}")
+                    handler_task.cancel()
+                    return True
+                print(f"⚠️(Worker) 任务 {job_id} 续租失败，{retry_delay:.0f} 秒后重试: {e}")
+                delay = retry_delay
+                continue
+            if not extended:
+                print(f"⚠️(Worker) 任务 {job_id} 的租约已丢失，停止执行（任务已由其他worker接手）")
+                handler_task.cancel()
+                return True
+            lease_expires_at = time.monotonic() + self.lease_seconds
+            delay = self.lease_seconds / 3
+
+    async def _run_job(self, job: Dict[str, Any]):
+        job_id = job["job_id"]
+        handler = self.handlers.get(job["kind"])
+        print(f"🔧(Worker) 开始执行任务 {job_id} ({job['kind']})，第 {job['attempts']}/{job['max_attempts']} 次")
+
+        if handler is None:
+            await self.queue.fail(job_id, self.worker_id, f"未知的任务类型: {job['kind']}")
+            return
+
+        handler_task = asyncio.create_task(
+            handler(**job["payload"], attempt=job["attempts"], max_attempts=job["max_attempts"])
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, handler_task))
+        try:
+            await handler_task
+            await self.queue.complete(job_id, self.worker_id)
+            print(f"✅(Worker) 任务完成 {job_id}")
+        except asyncio.CancelledError:
+            # 租约丢失时由心跳取消：任务已不属于本worker，不再更新它的状态
+            if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result():
+                return
+            raise
+        except Exception as e:
+            # 指数退避：10秒、20秒、40秒……
+            retry_delay = 10 * (2 ** (job["attempts"] - 1))
+            status = await self.queue.fail(job_id, self.worker_id, f"{e}\n{traceback.format_exc()}", retry_delay)
+            if status == JobStatus.QUEUED:
+                print(f"⚠️(Worker) 任务 {job_id} 失败，{retry_delay} 秒后重试: {e}")
+            else:
+                print(f"❌(Worker) 任务 {job_id} 失败，已达最大重试次数: {e}")
+        finally:
+            heartbeat.cancel()
+
+    async def _loop(self):
+        while not self._stopping:
+            try:
+                job = await self.queue.claim(self.worker_id, self.lease_seconds)
+            except Exception as e:
+                print(f"❌(Worker) 领取任务失败: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self._run_job(job)
+
+    def start(self):
+        """在当前事件循环中启动 concurrency 个执行循环"""
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+        print(f"✅ 任务执行器已启动: {self.worker_id}，并发数 {self.concurrency}")
+
+    async def stop(self):
+        """停止执行器，正在执行的任务会被取消，租约过期后由其他worker重新执行"""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        print("✅ 任务执行器已停止")
+
+    async def run_forever(self):
+        """独立进程模式：启动并一直运行"""
+        self.start()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# 全局任务队列实例（相对路径相对于 backend 目录）
+job_queue = JobQueue(resolve_backend_path(config.job_queue_path))
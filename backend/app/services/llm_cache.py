@@ -0,0 +1,125 @@
+# backend/app/services/llm_cache.py
+#
+# 大模型响应缓存 - 按内容寻址的分镜生成结果缓存
+#
+# 这个文件专门负责：
+# 1. 用请求内容（模型、温度、系统提示词、段落文本、已有角色集合）的哈希作为缓存键
+# 2. 把解析成功的AI结果保存到本地SQLite，重复解析未修改的段落时直接返回
+# 3. 按过期时间（TTL）丢弃旧结果，按最大条目数淘汰最久未使用的结果（LRU）
+#
+# 设计原则：
+# - 只缓存解析成功的结果，失败的调用下次仍会重新请求
+# - 缓存读写失败时静默降级为直接调用AI，不影响主流程
+# - 多进程（API进程与worker进程）共享同一个SQLite文件
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Optional
+
+# 添加 backend 目录到 Python 路径，确保能导入config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import config
+from app.services.sqlite_store import SQLiteStore, resolve_backend_path
+
+
+def make_cache_key(**parts: Any) -> str:
+    """
+    根据请求内容计算缓存键
+
+    参数以关键字传入（如 model、temperature、system_prompt、segment_text），
+    序列化时按键排序，保证相同内容总是得到相同的哈希。
+    """
+    canonical = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMCache(SQLiteStore):
+    """基于SQLite的大模型响应缓存（TTL + LRU）"""
+
+    def __init__(self, db_path: str, ttl_seconds: float, max_entries: int):
+        super().__init__(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache (last_access)")
+
+    # ---------- 同步实现（在线程中执行，避免阻塞事件循环） ----------
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        self._ensure_schema()
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute("SELECT value, created_at FROM llm_cache WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+                return None
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+            return json.loads(row[0])
+
+    def _set(self, key: str, value: Dict[str, Any]):
+        self._ensure_schema()
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (cache_key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            # 超出容量时淘汰最久未使用的条目
+            conn.execute(
+                "DELETE FROM llm_cache WHERE cache_key IN ("
+                "SELECT cache_key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def _clear(self):
+        self._ensure_schema()
+        with self._connection() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    # ---------- 异步接口 ----------
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，未命中或已过期时返回None"""
+        try:
+            value = await self._run(self._get, key)
+        except Exception as e:
+            print(f"⚠️(缓存) 读取失败: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        """写入缓存"""
+        try:
+            await self._run(self._set, key, value)
+        except Exception as e:
+            print(f"⚠️(缓存) 写入失败: {e}")
+
+    async def clear(self):
+        """清空缓存"""
+        await self._run(self._clear)
+
+
+# 全局缓存实例（相对路径相对于 backend 目录）
+llm_cache = LLMCache(resolve_backend_path(config.llm_cache_path), config.llm_cache_ttl, config.llm_cache_max_entries)
@@ -0,0 +1,245 @@
+# backend/app/services/object_storage.py
+#
+# 图片文件存储后端 - 本地磁盘 / S3兼容对象存储（AWS S3、MinIO等）
+#
+# 这个文件专门负责：
+# 1. 按对象键（如 "ab/abcdef...png"）写入、删除、检查图片文件
+# 2. 根据配置生成图片的公开访问URL，不再硬编码 http://127.0.0.1:8000
+# 3. 根据 config.storage_backend 创建全局存储实例
+#
+# 设计原则：
+# - 接口是同步的，由 image_store 在线程中调用（asyncio.to_thread），上传不阻塞事件循环
+# - local：写入 backend/layout，由 main.py 挂载的静态文件路由提供访问，只适合单节点部署
+# - s3：所有节点写入同一个存储桶，任何节点保存的图片都能被访问，适合多节点部署；
+#   boto3 是可选依赖，只有使用 s3 后端时才需要安装
+# - s3 模式下不删除任何对象（引用表只在单个节点本地），存储桶只增不减，需要时由运维手动清理
+# - 对象内容不可变（按内容寻址），上传时设置长期缓存头
+
+import mimetypes
+import os
+import sys
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+# 添加 backend 目录到 Python 路径，确保能导入config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import config
+
+# 本地存储目录（与 main.py 挂载的静态文件目录一致）
+LOCAL_ROOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "layout")
+
+# 按内容寻址的对象永远不会变化，可以让浏览器和CDN长期缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _content_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class StorageBackend(ABC):
+    """
+    存储后端基类
+
+    shared 为 True 表示多个节点共用同一份存储：单个节点的引用表不完整，
+    image_store 不会在本地判断"无人引用"后删除对象，也不做垃圾回收，
+    存储中的对象只增不减（没有共享的引用表，存储桶的生命周期规则同样无法区分对象是否还在使用）。
+    """
+
+    name = "base"
+    shared = False
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """对象是否存在"""
+
+    @abstractmethod
+    def write(self, key: str, data: bytes):
+        """写入对象（已存在时覆盖）"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """删除对象（不存在时忽略）"""
+
+    @abstractmethod
+    def url_for(self, key: str) -> str:
+        """对象的公开访问URL"""
+
+    def cleanup_temp(self, older_than: float):
+        """清理写入中断留下的临时文件（只有本地存储需要）"""
+
+
+class LocalStorage(StorageBackend):
+    """
+    本地磁盘存储
+
+    参数：
+        root_dir: 存储根目录（静态文件目录 layout）
+        base_url: 根目录对应的访问URL前缀（如 http://127.0.0.1:8000/layout）
+    """
+
+    name = "local"
+
+    def __init__(self, root_dir: str, base_url: str):
+        self.root_dir = root_dir
+        self.base_url = base_url.rstrip("/")
+
+    def full_path(self, key: str) -> str:
+        return os.path.join(self.root_dir, *key.split("/"))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.full_path(key))
+
+    def write(self, key: str, data: bytes):
+        # 原子写入：先写同目录下的临时文件，再 os.replace 替换，读取方不会看到写了一半的文件
+        full_path = self.full_path(key)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.full_path(key))
+        except FileNotFoundError:
+            pass
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def cleanup_temp(self, older_than: float):
+        for directory, _, files in os.walk(self.root_dir):
+            for name in files:
+                path = os.path.join(directory, name)
+                if name.startswith(".tmp-") and os.path.getmtime(path) < older_than:
+                    os.remove(path)
+
+
+class S3Storage(StorageBackend):
+    """
+    S3兼容对象存储（AWS S3、MinIO、七牛Kodo的S3接口等）
+
+    参数：
+        bucket: 存储桶名称（不存在时自动创建）
+        endpoint_url: 服务地址，如本地MinIO的 http://127.0.0.1:9000；为空时使用AWS S3
+        access_key / secret_key / region: 访问凭证和区域
+        public_url: 对象的公开访问URL前缀（如CDN域名）；为空时使用 "{endpoint_url}/{bucket}"
+    """
+
+    name = "s3"
+    shared = True
+
+    def __init__(self, bucket: str, endpoint_url: str = None, access_key: str = None,
+                 secret_key: str = None, region: str = "us-east-1", public_url: str = None):
+        if boto3 is None:
+            raise RuntimeError("使用 s3 存储后端需要安装 boto3：pip install boto3")
+        if not bucket:
+            raise ValueError("使用 s3 存储后端需要配置 storage.s3_bucket")
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        if not public_url:
+            endpoint = (endpoint_url or f"https://s3.{region}.amazonaws.com").rstrip("/")
+            public_url = f"{endpoint}/{bucket}"
+        self.public_url = public_url.rstrip("/")
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        # boto3 客户端是线程安全的，所有线程共用一个（复用连接池）
+        with self._lock:
+            if self._client is None:
+                client = boto3.client(
+                    "s3",
+                    endpoint_url=self.endpoint_url,
+                    aws_access_key_id=self.access_key,
+                    aws_secret_access_key=self.secret_key,
+                    region_name=self.region,
+                    # MinIO等自建服务通常不支持虚拟主机风格的域名，统一使用路径风格
+                    config=BotoConfig(signature_version="s3v4", s3={"addressing_style": "path"})
+                )
+                self._ensure_bucket(client)
+                self._client = client
+            return self._client
+
+    def _ensure_bucket(self, client):
+        try:
+            client.head_bucket(Bucket=self.bucket)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchBucket"):
+                raise
+            # us-east-1 以外的区域必须显式指定 LocationConstraint，否则AWS会拒绝创建
+            if self.region and self.region != "us-east-1":
+                client.create_bucket(
+                    Bucket=self.bucket,
+                    CreateBucketConfiguration={"LocationConstraint": self.region}
+                )
+            else:
+                client.create_bucket(Bucket=self.bucket)
+            print(f"✅(存储) 已创建存储桶: {self.bucket}")
+
+    def exists(self, key: str) -> bool:
+        try:
+            self._get_client().head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def write(self, key: str, data: bytes):
+        started = time.perf_counter()
+        self._get_client().put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=data,
+            ContentType=_content_type(key),
+            CacheControl=IMMUTABLE_CACHE_CONTROL
+        )
+        print(f"☁️(存储) 已上传 {key}（{len(data)} 字节，{(time.perf_counter() - started) * 1000:.0f} ms）")
+
+    def delete(self, key: str):
+        self._get_client().delete_object(Bucket=self.bucket, Key=key)
+
+    def url_for(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+
+def create_storage() -> StorageBackend:
+    """根据配置创建存储后端"""
+    backend = (config.storage_backend or "local").lower()
+    if backend == "local":
+        return LocalStorage(LOCAL_ROOT_DIR, f"{config.public_base_url.rstrip('/')}/layout")
+    if backend == "s3":
+        return S3Storage(
+            bucket=config.s3_bucket,
+            endpoint_url=config.s3_endpoint_url,
+            access_key=config.s3_access_key,
+            secret_key=config.s3_secret_key,
+            region=config.s3_region,
+            public_url=config.s3_public_url
+        )
+    raise ValueError(f"未知的存储后端: {config.storage_backend}（可选 local / s3）")
+
+
+# 全局存储实例
+storage = create_storage()
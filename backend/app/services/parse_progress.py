@@ -0,0 +1,130 @@
+# backend/app/services/parse_progress.py
+#
+# 文本解析进度发布与订阅
+#
+# 这个文件专门负责：
+# 1. 接收 process_text_background 在各阶段发布的进度（分段、逐段生成、写入分镜）
+# 2. 把最新进度快照保存到本地任务队列的SQLite文件中，独立worker进程发布的进度API进程也能读到
+# 3. 为SSE接口提供"等待下一次进度变化"的能力，同进程内发布时立即唤醒，其他进程发布的进度通过轮询SQLite读到
+#
+# 设计原则：
+# - 只保存每个 text_id 的最新快照，订阅者总能拿到完整状态，不怕漏掉中间事件
+# - 不访问远程数据库，订阅进度不会给Supabase带来轮询压力
+
+import asyncio
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+from app.services.job_queue import job_queue
+from app.services.sqlite_store import SQLiteStore
+
+# 进度的终止状态，到达后SSE连接关闭
+TERMINAL_STATUSES = ("completed", "failed")
+
+# 跨进程时读取SQLite的间隔（秒）
+POLL_INTERVAL = 0.5
+
+# 进度快照的保留时间（秒）
+RETENTION_SECONDS = 7 * 24 * 3600
+
+
+class ParseProgress(SQLiteStore):
+    """解析进度快照的发布与订阅"""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self._events: Dict[str, asyncio.Event] = {}
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS parse_progress (
+                text_id TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("DELETE FROM parse_progress WHERE updated_at < ?", (time.time() - RETENTION_SECONDS,))
+
+    def _merge(self, text_id: str, reset: bool, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """在一个写事务中读取旧快照、合并并写回，多个进程同时发布时不会互相覆盖对方的字段"""
+        self._ensure_schema()
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT data FROM parse_progress WHERE text_id = ?", (text_id,)).fetchone()
+            previous = json.loads(row[0]) if row else {"text_id": text_id, "seq": 0}
+            if reset:
+                # 只丢弃旧的进度字段，seq 继续递增：订阅者可能已经看到了旧快照的 seq，
+                # 从1重新计数会让它一直等不到"更大的 seq"
+                snapshot = {"text_id": text_id, "seq": previous["seq"]}
+            else:
+                snapshot = previous
+            snapshot.update(fields)
+            snapshot["seq"] += 1
+            snapshot["updated_at"] = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO parse_progress (text_id, seq, data, updated_at) VALUES (?, ?, ?, ?)",
+                (text_id, snapshot["seq"], json.dumps(snapshot, ensure_ascii=False), snapshot["updated_at"])
+            )
+            conn.execute("COMMIT")
+            return snapshot
+
+    def _load(self, text_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_schema()
+        with self._connection() as conn:
+            row = conn.execute("SELECT data FROM parse_progress WHERE text_id = ?", (text_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+
+    async def publish(self, text_id: str, reset: bool = False, **fields):
+        """
+        发布一次进度更新（与上一次快照合并）
+
+        参数：
+            text_id: 原文ID
+            reset: 是否丢弃旧快照的进度字段重新开始（新任务入队或重试时使用），seq 仍然接着旧快照递增
+            **fields: 要更新的进度字段，如 status、stage、segments_total、segments_done
+        """
+        try:
+            await self._run(self._merge, text_id, reset, fields)
+
+            event = self._events.pop(text_id, None)
+            if event:
+                event.set()
+        except Exception as e:
+            # 进度只是辅助信息，发布失败不能影响解析本身
+            print(f"⚠️ 发布解析进度失败 text_id {text_id}: {e}")
+
+    async def get(self, text_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取最新进度快照，不存在时返回None
+
+        总是读取SQLite：进度可能由独立worker或其他API进程发布，不在内存中缓存快照。
+        """
+        return await self._run(self._load, text_id)
+
+    async def wait_for_update(self, text_id: str, seq: int, timeout: float = 15.0) -> Optional[Dict[str, Any]]:
+        """
+        等待进度快照的 seq 超过给定值
+
+        同进程发布时立即唤醒；其他进程发布的进度每 POLL_INTERVAL 秒从SQLite读取一次。
+        超时后返回当前快照（可能没有变化），调用方可借此发送心跳。
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = await self.get(text_id)
+            if snapshot and snapshot["seq"] > seq:
+                return snapshot
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return snapshot
+            event = self._events.setdefault(text_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(POLL_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+
+# 全局进度实例，与任务队列共用同一个SQLite文件
+parse_progress = ParseProgress(job_queue.db_path)
@@ -0,0 +1,145 @@
+# backend/app/services/render_pool.py
+#
+# 图片渲染进程池 - 把PIL的解码、绘制、合成、PNG编码移出事件循环
+#
+# 这个文件专门负责：
+# 1. 维护一个进程池执行CPU密集的图片渲染（对话框合成等），绕开GIL，不阻塞API进程的事件循环
+# 2. 用信号量实现有界队列：同时在渲染和排队的任务数超过上限时，新任务等待一段时间后被拒绝
+# 3. 统计队列深度、排队时间、渲染时间等指标，供监控接口查询
+#
+# 设计原则：
+# - 进程池按需懒加载，独立脚本和测试中不使用时不会创建子进程
+# - render_workers 为0时退化为线程池执行（仍不阻塞事件循环，但受GIL限制）
+# - 进程池异常退出（子进程崩溃）时自动重建，当前任务报错，后续任务不受影响
+
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 添加 backend 目录到 Python 路径，确保能导入config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import config
+
+
+class RenderQueueFull(Exception):
+    """渲染队列已满，任务在等待时间内没有获得执行机会"""
+
+
+def _timed_call(fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> Tuple[Any, float]:
+    """在子进程中执行渲染函数，返回 (结果, 渲染耗时秒数)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+class RenderPool:
+    """
+    有界的图片渲染进程池
+
+    参数：
+        max_workers: 子进程数（0 表示在线程中执行）
+        max_queue: 除正在渲染的任务外，最多允许排队的任务数
+        queue_timeout: 队列已满时新任务的最长等待时间（秒）
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, queue_timeout: float):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        # 指标
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_render_seconds = 0.0
+        self.max_render_seconds = 0.0
+        self.total_wait_seconds = 0.0
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_workers <= 0:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            print(f"✅(渲染池) 已启动 {self.max_workers} 个渲染进程")
+        return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(max(1, self.max_workers) + self.max_queue)
+        return self._slots
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        在进程池中执行渲染函数并等待结果
+
+        fn 必须是模块级函数，参数和返回值必须可以pickle（如 base64 字符串、字典、bytes）。
+        队列已满且等待超过 queue_timeout 时抛出 RenderQueueFull。
+        """
+        slots = self._get_slots()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RenderQueueFull(f"渲染队列已满（{self.stats()['queue_depth']} 个任务），请稍后重试")
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                result, render_seconds = await loop.run_in_executor(
+                    self._get_executor(), _timed_call, fn, args, kwargs
+                )
+            except BrokenProcessPool:
+                # 子进程崩溃后进程池不可再用，丢弃并在下次使用时重建
+                print(f"❌(渲染池) 渲染进程异常退出，重建进程池")
+                self._executor = None
+                raise
+            wait_seconds = time.perf_counter() - queued_at - render_seconds
+            self.completed += 1
+            self.total_render_seconds += render_seconds
+            self.total_wait_seconds += max(0.0, wait_seconds)
+            self.max_render_seconds = max(self.max_render_seconds, render_seconds)
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """当前指标：队列深度、执行中任务数、平均/最大渲染时间等"""
+        done = max(1, self.completed)
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_render_ms": round(self.total_render_seconds / done * 1000, 1),
+            "max_render_ms": round(self.max_render_seconds * 1000, 1),
+            "avg_wait_ms": round(self.total_wait_seconds / done * 1000, 1)
+        }
+
+    def shutdown(self):
+        """关闭进程池（应用关闭时调用）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# 全局渲染池实例
+render_pool = RenderPool(config.render_workers, config.render_queue_size, config.render_queue_timeout)
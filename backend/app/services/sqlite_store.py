@@ -0,0 +1,83 @@
+# backend/app/services/sqlite_store.py
+#
+# 本地SQLite存储的公共部分
+#
+# 这个文件专门负责：
+# 1. 把配置中的相对路径（如 "jobs.db"）解析到 backend 目录，与启动时的工作目录无关
+# 2. 以统一的方式打开连接：WAL模式（多进程同时读写）、30秒忙等待、查询结果以 sqlite3.Row 返回
+# 3. SQLiteStore 基类：建表只执行一次，同步实现通过 asyncio.to_thread 在线程中执行
+#
+# 设计原则：
+# - 任务队列、解析进度、批量配图任务、图片引用表、大模型缓存都基于它实现
+# - 连接用完即关（每次操作一个连接），可以安全地在多个线程中使用
+# - 自动提交模式（isolation_level=None），需要事务时由调用方显式 BEGIN / COMMIT
+
+import asyncio
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Callable, TypeVar
+
+# backend 目录
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+T = TypeVar("T")
+
+
+def resolve_backend_path(path: str) -> str:
+    """配置中的SQLite文件路径：绝对路径原样使用，相对路径相对于 backend 目录"""
+    if os.path.isabs(path):
+        return path
+    return os.path.join(BACKEND_ROOT, path)
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """打开一个连接（WAL模式、30秒忙等待、自动提交、行以 sqlite3.Row 返回）"""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+class SQLiteStore:
+    """
+    基于本地SQLite文件的存储基类
+
+    子类在 _create_schema 中建表，同步方法开头调用 _ensure_schema，
+    异步接口通过 _run 在线程中执行同步方法。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        return connect(self.db_path)
+
+    @contextmanager
+    def _connection(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        """建表（CREATE TABLE IF NOT EXISTS），每个实例只执行一次"""
+        raise NotImplementedError
+
+    def _ensure_schema(self):
+        if self._initialized:
+            return
+        with self._connection() as conn:
+            self._create_schema(conn)
+        self._initialized = True
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        """在线程中执行同步实现，避免阻塞事件循环"""
+        return await asyncio.to_thread(fn, *args)
@@ -0,0 +1,280 @@
+# backend/app/services/text_segmenter.py
+#
+# 本地文本分段引擎 - 不调用AI，毫秒级把长文本切成适合生成分镜的段落
+#
+# 这个文件专门负责：
+# 1. 中文分句：按句末标点切分，引号内的对话不拆开，换行总是句子边界
+# 2. 为每个可切分位置打分：场景分隔（空行、分隔线）> 段落结束 > 普通句末，
+#    下一句以时间/场景转换词开头时加分，连续对话中间切分时扣分
+# 3. 在目标字数范围内选出得分最高的切分点，生成 800-1200 字左右的段落
+# 4. 对"歧义"切分（范围内没有段落或场景边界）支持可选的AI判断
+#
+# 设计原则：
+# - 无损：所有句子拼接后等于原文，分段内容可以直接在原文中定位
+# - 纯计算、结果确定，相同输入总是得到相同分段
+
+import re
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+# 分段字数目标
+TARGET_SEGMENT_SIZE = 1000
+MIN_SEGMENT_SIZE = 800
+MAX_SEGMENT_SIZE = 1200
+
+_OPEN_QUOTES = "“「『‘"
+_CLOSE_QUOTES = "”」』’"
+_TERMINALS = "。！？!?…"
+_TRAILING = _TERMINALS + _CLOSE_QUOTES + ")）"
+# 超长句子（没有句末标点和换行）拆分时优先使用的分句标点
+_CLAUSE_MARKS = "，；、：,;:"
+
+# 单独成行的场景分隔符，如 ***、---、◇◇◇
+_SEPARATOR_PATTERN = re.compile(r"^[\s*＊\-—=~～·•◇◆○●#]{3,}$")
+
+# 时间/场景转换词，出现在句首时说明这里适合切分
+_TRANSITION_WORDS = (
+    "第二天", "次日", "翌日", "当晚", "当天", "那天", "这天", "清晨", "早上", "傍晚", "深夜", "夜里", "午后",
+    "与此同时", "另一边", "另一方面", "此时", "此刻", "半晌", "片刻后", "不久", "很快", "过了",
+    "几天后", "数日后", "一个月后", "多年后", "后来"
+)
+
+# 切分位置的结构得分
+SCORE_SCENE_BREAK = 3.0
+SCORE_PARAGRAPH = 2.0
+SCORE_SENTENCE = 0.5
+SCORE_TRANSITION_BONUS = 1.0
+SCORE_DIALOGUE_PENALTY = 1.0
+
+# 传给AI判断的切分窗口：(窗口内的句子, 候选切分位置) -> 选中的位置或None
+CutChooser = Callable[[List[str], List[int]], Awaitable[Optional[int]]]
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    中文分句（无损：所有句子拼接后等于原文）
+
+    - 句末标点（。！？…）连同其后的标点、后引号一起结束一个句子
+    - 引号内的句末标点不切分，对白结束的后引号处切分
+    - 换行总是结束句子，换行及空行归入前一句，下一行的缩进归入下一句
+
+    参数：
+        text: 原文
+
+    返回：
+        List[str]: 句子列表
+    """
+    sentences = []
+    start = 0
+    depth = 0
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch in "\r\n":
+            j = i
+            while j < n and text[j].isspace():
+                j += 1
+            end = max(text.rfind("\n", i, j), text.rfind("\r", i, j)) + 1
+            sentences.append(text[start:end])
+            start = i = end
+            depth = 0
+            continue
+
+        sentence_end = False
+        if ch in _OPEN_QUOTES:
+            depth += 1
+        elif ch in _CLOSE_QUOTES:
+            depth = max(0, depth - 1)
+            sentence_end = depth == 0 and i > start and text[i - 1] in _TERMINALS
+        elif ch in _TERMINALS:
+            sentence_end = depth == 0
+        if not sentence_end:
+            i += 1
+            continue
+
+        j = i + 1
+        while j < n and text[j] in _TRAILING:
+            j += 1
+        if j < n and text[j] in "\r\n":
+            # 后面紧跟换行，交给换行处理，让换行归入本句
+            i = j
+            continue
+        sentences.append(text[start:j])
+        start = i = j
+    if start < n:
+        sentences.append(text[start:])
+    return sentences
+
+
+def _split_long_sentences(sentences: List[str], max_size: int) -> List[str]:
+    """
+    把超过 max_size 的句子拆成不超过 max_size 的片段（无损）
+
+    在 max_size 之前最后一个分句标点（，；、：）之后切分；后半段内没有分句标点时
+    在 max_size 处硬切，避免切出很短的片段。保证切分点规划总能找到不超过上限的位置。
+    """
+    result = []
+    for sentence in sentences:
+        while len(sentence) > max_size:
+            cut = max(sentence.rfind(mark, max_size // 2, max_size) for mark in _CLAUSE_MARKS) + 1
+            if cut <= 0:
+                cut = max_size
+            result.append(sentence[:cut])
+            sentence = sentence[cut:]
+        result.append(sentence)
+    return result
+
+
+def _is_dialogue(sentence: str) -> bool:
+    return sentence.lstrip().startswith(tuple(_OPEN_QUOTES) + ('"',))
+
+
+def _boundary_score(sentences: List[str], end: int) -> float:
+    """在第 end 句之前切分的结构得分（不含字数因素）"""
+    prev = sentences[end - 1]
+    nxt = sentences[end] if end < len(sentences) else ""
+
+    if _SEPARATOR_PATTERN.match(prev) or _SEPARATOR_PATTERN.match(nxt):
+        score = SCORE_SCENE_BREAK
+    elif prev.endswith(("\n", "\r")):
+        trailing = prev[len(prev.rstrip()):]
+        score = SCORE_SCENE_BREAK if trailing.count("\n") >= 2 else SCORE_PARAGRAPH
+    elif prev.rstrip().endswith(tuple(_TRAILING)):
+        score = SCORE_SENTENCE
+    else:
+        score = 0.0
+
+    if nxt.lstrip().startswith(_TRANSITION_WORDS):
+        score += SCORE_TRANSITION_BONUS
+    if _is_dialogue(prev) and _is_dialogue(nxt):
+        score -= SCORE_DIALOGUE_PENALTY
+    return score
+
+
+def _plan_next_cut(
+    sentences: List[str],
+    offsets: List[int],
+    start: int,
+    target_size: int,
+    min_size: int,
+    max_size: int
+) -> Tuple[int, List[int], bool]:
+    """
+    从第 start 句开始选择下一个切分点
+
+    返回：
+        (切分位置, 候选切分位置列表, 是否为歧义切分)
+        歧义切分指字数范围内没有段落或场景边界，只能在句子中间切分
+    """
+    total = offsets[-1]
+    remaining = total - offsets[start]
+    if remaining <= max_size:
+        return len(sentences), [], False
+
+    # 剩余不足两段时向中间靠拢，避免最后留下很短的一段
+    target = max(min_size, remaining / 2) if remaining < 2 * target_size else target_size
+
+    candidates = []
+    best_end, best_score, best_structure = None, None, 0.0
+    for end in range(start + 1, len(sentences)):
+        length = offsets[end] - offsets[start]
+        if length < min_size:
+            continue
+        if length > max_size:
+            break
+        structure = _boundary_score(sentences, end)
+        score = structure - abs(length - target) / (max_size - min_size)
+        candidates.append(end)
+        if best_score is None or score > best_score:
+            best_end, best_score, best_structure = end, score, structure
+
+    if best_end is None:
+        # 范围内没有候选切分点（句子都很长），在不超过上限的最后一个句子处切分；
+        # 超长句子已被 _split_long_sentences 拆成不超过上限的片段，至少包含一个完整片段
+        end = start + 1
+        while end < len(sentences) and offsets[end + 1] - offsets[start] <= max_size:
+            end += 1
+        return end, [], False
+
+    return best_end, candidates, best_structure < SCORE_PARAGRAPH
+
+
+def _build_segments(sentences: List[str], cuts: List[Tuple[int, int]]) -> List[dict]:
+    segments = []
+    for start, end in cuts:
+        content = "".join(sentences[start:end]).strip()
+        if content:
+            segments.append({
+                "segment_index": len(segments) + 1,
+                "content": content,
+                "summary": content[:100] + "..."
+            })
+    return segments
+
+
+def _prefix_offsets(sentences: List[str]) -> List[int]:
+    offsets = [0]
+    for sentence in sentences:
+        offsets.append(offsets[-1] + len(sentence))
+    return offsets
+
+
+def segment_text_local(
+    text: str,
+    target_size: int = TARGET_SEGMENT_SIZE,
+    min_size: int = MIN_SEGMENT_SIZE,
+    max_size: int = MAX_SEGMENT_SIZE
+) -> List[dict]:
+    """
+    本地规则分段
+
+    参数：
+        text: 要分段的完整文本
+        target_size / min_size / max_size: 每段的目标、最小、最大字数
+
+    返回：
+        list: 分段列表，每段包含segment_index、content、summary
+    """
+    sentences = _split_long_sentences(split_sentences(text), max_size)
+    offsets = _prefix_offsets(sentences)
+    cuts = []
+    start = 0
+    while start < len(sentences):
+        end, _, _ = _plan_next_cut(sentences, offsets, start, target_size, min_size, max_size)
+        cuts.append((start, end))
+        start = end
+    return _build_segments(sentences, cuts)
+
+
+async def segment_text_refined(
+    text: str,
+    choose_cut: CutChooser,
+    target_size: int = TARGET_SEGMENT_SIZE,
+    min_size: int = MIN_SEGMENT_SIZE,
+    max_size: int = MAX_SEGMENT_SIZE
+) -> List[dict]:
+    """
+    本地规则分段，歧义切分点交给 choose_cut 判断
+
+    choose_cut 收到从当前段开头到最后一个候选位置的句子列表和候选切分位置
+    （相对于该列表，表示在第几句之前切分），返回选中的位置；
+    返回None或不在候选中的位置时使用规则选出的切分点。
+    """
+    sentences = _split_long_sentences(split_sentences(text), max_size)
+    offsets = _prefix_offsets(sentences)
+    cuts = []
+    start = 0
+    while start < len(sentences):
+        end, candidates, ambiguous = _plan_next_cut(sentences, offsets, start, target_size, min_size, max_size)
+        if ambiguous and len(candidates) > 1:
+            relative = [c - start for c in candidates]
+            try:
+                chosen = await choose_cut(sentences[start:candidates[-1]], relative)
+            except Exception as e:
+                print(f"⚠️(分段) 歧义切分判断失败，使用规则切分: {e}")
+                chosen = None
+            if chosen in relative:
+                end = start + chosen
+        cuts.append((start, end))
+        start = end
+    return _build_segments(sentences, cuts)
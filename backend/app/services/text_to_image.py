@@ -13,6 +13,7 @@
 # - 可独立测试和复用
 # - 统一的错误处理
 
+import asyncio
 import httpx
 import json
 import os
@@ -22,11 +23,16 @@ from typing import Optional, Dict, Any, List
 # 添加 backend 目录到 Python 路径，确保能导入config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config import config
+from app.services.http_client import get_http_client
+from app.services.image_handle import ImageHandle
 
 # 七牛云OpenAI兼容API入口
 QINIU_API_BASE = "https://openai.qiniu.com/v1"
 # 备用接入点
 QINIU_API_BASE_BACKUP = "https://api.qnaigc.com/v1"
+# 单个接入点的请求总时长上限（秒）；主接入点失败后还会尝试备用接入点，
+# 所以单张图片最长耗时约为 2 * IMAGE_ATTEMPT_TIMEOUT，config.image_scene_timeout 必须大于它
+IMAGE_ATTEMPT_TIMEOUT = 180.0
 
 
 async def call_qiniu_image_gen_api(prompt: str, 
@@ -87,39 +93,28 @@ async def call_qiniu_image_gen_api(prompt: str,
     print(f"✨ 风格: {style}")
 
     # 发送HTTP请求 - 设置更长的超时时间
-    timeout_config = httpx.Timeout(180.0, connect=30.0)  # 总超时3分钟，连接超时30秒
-    
-    async with httpx.AsyncClient(timeout=timeout_config) as client:
-        try:
-            print(f"📤 发送文生图请求...")
-            print(f"⏱️ 超时配置: 总超时180秒，连接超时30秒")
-            r = await client.post(url, headers=headers, json=payload)
-            print(f"📥 收到响应: {r.status_code}")
-            
-            # 检查HTTP状态码
-            if r.status_code != 200:
-                print(f"❌ API响应错误: {r.status_code}")
-                print(f"📄 响应内容: {r.text}")
-                try:
-                    error_data = r.json()
-                    print(f"🔍 错误详情: {error_data}")
-                except:
-                    print(f"🔍 无法解析错误响应为JSON")
-                
-                # 如果主接入点失败且未使用备用接入点，尝试备用接入点
-                if not use_backup:
-                    print(f"⚠️ 主接入点失败，尝试备用接入点...")
-                    return await call_qiniu_image_gen_api(prompt, size, n, quality, style, True)
-                
-                return None
-            
-            print(f"✅ API调用成功!")
-            data = r.json()
-            return data
-            
-        except httpx.RequestError as e:
-            print(f"❌(文生图服务) 网络请求失败: {e}")
-            print(f"🔍 错误类型: {type(e).__name__}")
+    # httpx 的超时只限制单次读写，服务端持续缓慢输出时不会触发，所以再用 wait_for 限制整次请求的时长
+    timeout_config = httpx.Timeout(IMAGE_ATTEMPT_TIMEOUT, connect=30.0)  # 读写超时3分钟，连接超时30秒
+    
+    client = await get_http_client(api_base)
+    try:
+        print(f"📤 发送文生图请求...")
+        print(f"⏱️ 超时配置: 总超时{IMAGE_ATTEMPT_TIMEOUT:.0f}秒，连接超时30秒")
+        r = await asyncio.wait_for(
+            client.post(url, headers=headers, json=payload, timeout=timeout_config),
+            timeout=IMAGE_ATTEMPT_TIMEOUT
+        )
+        print(f"📥 收到响应: {r.status_code}")
+        
+        # 检查HTTP状态码
+        if r.status_code != 200:
+            print(f"❌ API响应错误: {r.status_code}")
+            print(f"📄 响应内容: {r.text}")
+            try:
+                error_data = r.json()
+                print(f"🔍 错误详情: {error_data}")
+            except:
+                print(f"🔍 无法解析错误响应为JSON")
             
             # 如果主接入点失败且未使用备用接入点，尝试备用接入点
             if not use_backup:
@@ -127,29 +122,43 @@ async def call_qiniu_image_gen_api(prompt: str,
                 return await call_qiniu_image_gen_api(prompt, size, n, quality, style, True)
             
             return None
-        except httpx.ReadTimeout as e:
-            print(f"❌(文生图服务) 请求超时: {e}")
-            # 超时也尝试备用接入点
-            if not use_backup:
-                print(f"⚠️ 主接入点超时，尝试备用接入点...")
-                return await call_qiniu_image_gen_api(prompt, size, n, quality, style, True)
-            return None
-        except Exception as e:
-            print(f"❌(文生图服务) API调用失败: {e}")
-            print(f"🔍 错误类型: {type(e).__name__}")
-            return None
+        
+        print(f"✅ API调用成功!")
+        data = r.json()
+        return data
+        
+    except httpx.RequestError as e:
+        print(f"❌(文生图服务) 网络请求失败: {e}")
+        print(f"🔍 错误类型: {type(e).__name__}")
+        
+        # 如果主接入点失败且未使用备用接入点，尝试备用接入点
+        if not use_backup:
+            print(f"⚠️ 主接入点失败，尝试备用接入点...")
+            return await call_qiniu_image_gen_api(prompt, size, n, quality, style, True)
+        
+        return None
+    except (httpx.ReadTimeout, asyncio.TimeoutError) as e:
+        print(f"❌(文生图服务) 请求超时: {str(e) or f'超过{IMAGE_ATTEMPT_TIMEOUT:.0f}秒'}")
+        # 超时也尝试备用接入点
+        if not use_backup:
+            print(f"⚠️ 主接入点超时，尝试备用接入点...")
+            return await call_qiniu_image_gen_api(prompt, size, n, quality, style, True)
+        return None
+    except Exception as e:
+        print(f"❌(文生图服务) API调用失败: {e}")
+        print(f"🔍 错误类型: {type(e).__name__}")
+        return None
 
 
-async def generate_image(prompt: str,
-                        size: str = "1024x1024",
-                        quality: str = "standard",
-                        style: str = "vivid") -> Optional[Dict[str, Any]]:
+async def generate_image_handle(prompt: str,
+                                size: str = "1024x1024",
+                                quality: str = "standard",
+                                style: str = "vivid") -> Optional[Dict[str, Any]]:
     """
-    生成单张图片
+    生成单张图片，返回二进制图片句柄（供服务内部继续处理，如添加对话框、保存）
     
     功能说明：
-    - 根据文字描述生成一张图片
-    - 返回图片的base64数据
+    - 接口返回的base64只在这里解码一次，之后以字节形式传递，不再拼接 data URL
     
     参数：
         prompt: 图片描述文字
@@ -158,7 +167,7 @@ async def generate_image(prompt: str,
         style: 图片风格
     
     返回：
-        dict: {"url": "data:image/png;base64,...", "revised_prompt": "优化后的提示词"}
+        dict: {"image": ImageHandle, "revised_prompt": "优化后的提示词"}
     """
     print(f"🎨(文生图服务) 开始生成图片...")
     print(f"   提示词: {prompt}")
@@ -168,25 +177,55 @@ async def generate_image(prompt: str,
     
     if result and "data" in result and len(result["data"]) > 0:
         image_data = result["data"][0]
-        print(f"✅(文生图服务) 图片生成成功")
-        
-        # 七牛云返回的是base64编码的图片数据
         b64_json = image_data.get("b64_json")
-        if b64_json:
-            # 转换为data URL格式，便于在浏览器中直接显示
-            image_url = f"data:image/png;base64,{b64_json}"
-            return {
-                "url": image_url,
-                "revised_prompt": image_data.get("revised_prompt", prompt)
-            }
-        else:
+        if not b64_json:
             print(f"❌(文生图服务) 响应中没有b64_json数据")
             return None
+        try:
+            image = ImageHandle.from_base64(b64_json)
+        except ValueError as e:
+            print(f"❌(文生图服务) 图片数据解码失败: {e}")
+            return None
+        print(f"✅(文生图服务) 图片生成成功，{len(image)} 字节")
+        return {
+            "image": image,
+            "revised_prompt": image_data.get("revised_prompt", prompt)
+        }
     else:
         print(f"❌(文生图服务) 图片生成失败")
         return None
 
 
+async def generate_image(prompt: str,
+                        size: str = "1024x1024",
+                        quality: str = "standard",
+                        style: str = "vivid") -> Optional[Dict[str, Any]]:
+    """
+    生成单张图片
+    
+    功能说明：
+    - 根据文字描述生成一张图片
+    - 返回图片的base64数据（data URL，便于在浏览器中直接显示）
+    - 服务内部继续处理图片时使用 generate_image_handle，避免来回编码
+    
+    参数：
+        prompt: 图片描述文字
+        size: 图片尺寸
+        quality: 图片质量
+        style: 图片风格
+    
+    返回：
+        dict: {"url": "data:image/png;base64,...", "revised_prompt": "优化后的提示词"}
+    """
+    result = await generate_image_handle(prompt, size, quality, style)
+    if not result:
+        return None
+    return {
+        "url": result["image"].to_data_url(),
+        "revised_prompt": result["revised_prompt"]
+    }
+
+
 async def generate_multiple_images(prompt: str,
                                    n: int = 4,
                                    size: str = "1024x1024",
@@ -272,76 +311,99 @@ async def generate_image_variations(base_image_url: str,
 
     url = f"{QINIU_API_BASE}/images/variations"
     
-    async with httpx.AsyncClient(timeout=120) as client:
-        try:
-            r = await client.post(url, headers=headers, json=payload)
-            
-            if r.status_code == 200:
-                data = r.json()
-                if "data" in data:
-                    images = [{"url": img.get("url")} for img in data["data"]]
-                    print(f"✅(文生图服务) 成功生成 {len(images)} 个变体")
-                    return images
-            else:
-                print(f"⚠️(文生图服务) 图片变体功能不支持或失败")
-                return None
-                
-        except Exception as e:
-            print(f"⚠️(文生图服务) 图片变体功能异常: {e}")
+    client = await get_http_client(QINIU_API_BASE)
+    try:
+        r = await client.post(url, headers=headers, json=payload, timeout=120)
+        
+        if r.status_code == 200:
+            data = r.json()
+            if "data" in data:
+                images = [{"url": img.get("url")} for img in data["data"]]
+                print(f"✅(文生图服务) 成功生成 {len(images)} 个变体")
+                return images
+        else:
+            print(f"⚠️(文生图服务) 图片变体功能不支持或失败")
             return None
+            
+    except Exception as e:
+        print(f"⚠️(文生图服务) 图片变体功能异常: {e}")
+        return None
 
 
 async def generate_storyboard_images(scenes: List[Dict[str, str]],
                                      size: str = "1024x1024",
-                                     style: str = "vivid") -> List[Dict[str, Any]]:
+                                     style: str = "vivid",
+                                     concurrency: Optional[int] = None,
+                                     scene_timeout: Optional[float] = None) -> List[Dict[str, Any]]:
     """
     为分镜生成配图
     
     功能说明：
-    - 为多个分镜场景批量生成图片
-    - 适用于小说转漫画的场景
-    - 每个场景生成一张配图
+    - 为多个分镜场景并发生成图片，用信号量限制同时进行的请求数
+    - 每个场景单独超时，某个场景失败或超时不影响其他场景
+    - 返回结果与输入场景顺序一致
     
     参数：
         scenes: 场景列表，每项包含 {"index": 1, "description": "场景描述"}
         size: 图片尺寸
         style: 图片风格
+        concurrency: 最大并发数，默认使用 config.image_concurrency
+        scene_timeout: 单个场景的超时时间（秒），默认使用 config.image_scene_timeout
     
     返回：
         list: [{"index": 1, "url": "图片URL", "description": "场景描述"}, ...]
+              失败的场景 url 为 None，并带有 error 字段说明原因
     """
+    concurrency = max(1, concurrency or config.image_concurrency)
+    scene_timeout = scene_timeout or config.image_scene_timeout
+    
     print(f"🎬(文生图服务) 开始为分镜生成配图...")
-    print(f"   场景数量: {len(scenes)}")
+    print(f"   场景数量: {len(scenes)}，并发数: {concurrency}，单场景超时: {scene_timeout}秒")
     
-    results = []
+    semaphore = asyncio.Semaphore(concurrency)
     
-    for i, scene in enumerate(scenes):
+    async def generate_scene(i: int, scene: Dict[str, str]) -> Dict[str, Any]:
         scene_index = scene.get("index", i + 1)
         description = scene.get("description", "")
         
-        print(f"🖼️ 生成第 {scene_index} 个场景配图...")
-        
         # 优化提示词，适合漫画风格
         enhanced_prompt = f"漫画风格，高质量插图。{description}"
         
-        result = await generate_image(enhanced_prompt, size, "standard", style)
+        async with semaphore:
+            print(f"🖼️ 生成第 {scene_index} 个场景配图...")
+            try:
+                result = await asyncio.wait_for(
+                    generate_image(enhanced_prompt, size, "standard", style),
+                    timeout=scene_timeout
+                )
+                error = "生成失败"
+            except asyncio.TimeoutError:
+                result = None
+                error = f"生成超时（超过{scene_timeout}秒）"
+            except Exception as e:
+                result = None
+                error = f"生成失败: {e}"
         
         if result and result.get("url"):
-            results.append({
+            print(f"✅ 第 {scene_index} 个场景配图完成")
+            return {
                 "index": scene_index,
                 "url": result["url"],
                 "description": description,
                 "revised_prompt": result.get("revised_prompt")
-            })
-            print(f"✅ 第 {scene_index} 个场景配图完成")
-        else:
-            print(f"❌ 第 {scene_index} 个场景配图失败")
-            results.append({
-                "index": scene_index,
-                "url": None,
-                "description": description,
-                "error": "生成失败"
-            })
+            }
+        
+        print(f"❌ 第 {scene_index} 个场景配图失败: {error}")
+        return {
+            "index": scene_index,
+            "url": None,
+            "description": description,
+            "error": error
+        }
+    
+    # gather 按输入顺序返回结果
+    results = await asyncio.gather(*[generate_scene(i, scene) for i, scene in enumerate(scenes)])
+    results = list(results)
     
     success_count = sum(1 for r in results if r.get("url"))
     print(f"✅(文生图服务) 分镜配图完成，成功: {success_count}/{len(scenes)}")
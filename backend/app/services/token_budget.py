@@ -0,0 +1,109 @@
+# backend/app/services/token_budget.py
+#
+# Token预算 - 按模型限制计算每个分段最多能放多少原文
+#
+# 这个文件专门负责：
+# 1. 估算文本的token数（安装了 tiktoken 时精确计算，否则按中文字符/其他字符分别估算）
+# 2. 根据上下文窗口、max_tokens、提示词长度和分镜输出量估计值，计算分段的字数上限
+# 3. 根据实际输出（包括被截断的输出）调整"每个原文字符产生多少输出token"的估计值
+#
+# 设计原则：
+# - 输出预算通常比上下文窗口更紧：分镜JSON比原文长得多，超出 max_tokens 会被截断
+# - 只收紧、不放宽原有的分段字数范围（800-1200字），保证分镜粒度不变
+# - 纯计算，不调用AI
+
+import math
+import os
+import re
+import sys
+from typing import Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 添加 backend 目录到 Python 路径，确保能导入config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import config
+from app.services import text_segmenter
+
+# 只用 max_tokens 的一部分作为预期输出，给推理内容和估算误差留出余量
+OUTPUT_SAFETY_MARGIN = 0.85
+# 分段目标/最小字数相对上限的比例（与 1000/800/1200 一致）
+TARGET_RATIO = text_segmenter.TARGET_SEGMENT_SIZE / text_segmenter.MAX_SEGMENT_SIZE
+MIN_RATIO = text_segmenter.MIN_SEGMENT_SIZE / text_segmenter.MAX_SEGMENT_SIZE
+# 分段上限的下限，避免极端配置下切出过碎的段落
+MIN_BUDGET_CHARS = 200
+# 输出量估计值的平滑系数，以及参与调整的最小原文字数（太短的段落波动太大）
+OBSERVE_ALPHA = 0.2
+OBSERVE_MIN_CHARS = 200
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+_encoding = None
+if tiktoken is not None:
+    try:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"⚠️(Token预算) tiktoken 编码加载失败，使用估算: {e}")
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数：中文字符约1个token，其他字符约3个字符1个token"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 3)
+
+
+class TokenBudget:
+    """分镜生成的token预算"""
+
+    def __init__(self, context_window: int, max_output_tokens: int, output_tokens_per_char: float):
+        self.context_window = context_window
+        self.max_output_tokens = max_output_tokens
+        self.default_output_tokens_per_char = output_tokens_per_char
+        # 当前估计值，随实际输出调整，限制在默认值的 0.5-4 倍之间
+        self.output_tokens_per_char = output_tokens_per_char
+
+    def observe(self, input_chars: int, output_tokens: int):
+        """记录一次生成的原文字数和输出token数（截断时传入已覆盖的原文字数）"""
+        if input_chars < OBSERVE_MIN_CHARS or output_tokens <= 0:
+            return
+        ratio = output_tokens / input_chars
+        updated = (1 - OBSERVE_ALPHA) * self.output_tokens_per_char + OBSERVE_ALPHA * ratio
+        self.output_tokens_per_char = min(
+            max(updated, self.default_output_tokens_per_char * 0.5),
+            self.default_output_tokens_per_char * 4
+        )
+
+    def max_segment_chars(self, prompt_tokens: int, input_tokens_per_char: float = 1.0) -> int:
+        """
+        计算一个分段最多能放多少字原文
+
+        参数：
+            prompt_tokens: 不含原文的提示词token数（系统提示词、已有角色等）
+            input_tokens_per_char: 原文每个字符的token数
+        """
+        output_limit = self.max_output_tokens * OUTPUT_SAFETY_MARGIN / self.output_tokens_per_char
+        input_limit = (self.context_window - self.max_output_tokens - prompt_tokens) / max(input_tokens_per_char, 0.1)
+        return max(MIN_BUDGET_CHARS, int(min(output_limit, input_limit)))
+
+    def segment_limits(self, prompt_tokens: int, text: Optional[str] = None) -> Tuple[int, int, int]:
+        """
+        计算分段的 (目标, 最小, 最大) 字数，传给 text_segmenter
+
+        参数：
+            prompt_tokens: 不含原文的提示词token数
+            text: 要分段的原文（用于估算原文每字符的token数，不传时按1计算）
+        """
+        input_tokens_per_char = estimate_tokens(text) / len(text) if text else 1.0
+        max_size = min(text_segmenter.MAX_SEGMENT_SIZE, self.max_segment_chars(prompt_tokens, input_tokens_per_char))
+        return int(max_size * TARGET_RATIO), int(max_size * MIN_RATIO), max_size
+
+
+# 全局预算实例（worker进程内的观测结果在各任务之间共享）
+token_budget = TokenBudget(config.context_window, config.max_tokens, config.output_tokens_per_char)
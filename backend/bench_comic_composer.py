@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+漫画合成器（对话框渲染）基准测试
+
+对比长对话下的两项开销：
+1. 字体加载：每次调用 ImageFont.truetype（旧实现） vs 按 (路径, 字号) 缓存（新实现）
+2. 自动换行：对逐渐变长的整行反复计算 getbbox（旧实现，平方复杂度）
+   vs 累加缓存的字形宽度（新实现，线性复杂度）
+最后给出在 1024x1024 图片上合成长对话的端到端耗时。
+
+字体优先使用命令行参数指定的字体文件，其次是合成器找到的中文字体，都没有时使用Pillow默认字体。
+
+使用方法:
+    python bench_comic_composer.py [字体文件路径]
+"""
+
+import base64
+import io
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageFont
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.comic_composer import comic_composer, _load_font
+
+FONT_SIZE = 28
+MAX_WIDTH = 1024 // 3          # 与合成器一致：最大宽度为图片的1/3
+DIALOGUE_LENGTHS = [50, 200, 1000, 3000]
+ROUNDS = 5                     # 每项测试的重复次数（取中位数）
+FONT_LOADS = 200               # 字体加载测试的次数
+
+SAMPLE_TEXT = "你好，很高兴见到你！今天的天气真不错，我们一起去山上看看那座古老的寺庙吧。"
+
+
+def wrap_text_bbox(text: str, font, max_width: int):
+    """旧实现：每加一个字符就对整行重新计算边界框"""
+    lines = []
+    current_line = ""
+    for char in text:
+        test_line = current_line + char
+        bbox = font.getbbox(test_line)
+        if bbox[2] - bbox[0] <= max_width:
+            current_line = test_line
+        else:
+            if current_line:
+                lines.append(current_line)
+            current_line = char
+    if current_line:
+        lines.append(current_line)
+    return lines if lines else [text]
+
+
+def median_ms(fn, rounds: int = ROUNDS) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    font_path = sys.argv[1] if len(sys.argv) > 1 else comic_composer.font_paths.get("normal")
+    if font_path:
+        comic_composer.font_paths["normal"] = font_path
+    print(f"字体: {font_path or 'Pillow默认字体'}，字号 {FONT_SIZE}，行宽 {MAX_WIDTH}px")
+
+    # 1. 字体加载
+    def load_uncached():
+        for _ in range(FONT_LOADS):
+            ImageFont.truetype(font_path, FONT_SIZE) if font_path else ImageFont.load_default()
+
+    def load_cached():
+        for _ in range(FONT_LOADS):
+            comic_composer._get_font(FONT_SIZE)
+
+    _load_font.cache_clear()
+    print(f"\n字体加载 x{FONT_LOADS}:")
+    print(f"  每次加载: {median_ms(load_uncached):8.2f} ms")
+    print(f"  LRU缓存:  {median_ms(load_cached):8.2f} ms")
+
+    # 2. 自动换行
+    font = comic_composer._get_font(FONT_SIZE)
+    print(f"\n自动换行（中位数，{ROUNDS} 轮）:")
+    print(f"  {'字数':>6} {'getbbox整行':>12} {'字形宽度缓存':>12} {'加速比':>8} {'行数':>10}")
+    for length in DIALOGUE_LENGTHS:
+        text = (SAMPLE_TEXT * (length // len(SAMPLE_TEXT) + 1))[:length]
+        old_ms = median_ms(lambda: wrap_text_bbox(text, font, MAX_WIDTH))
+        new_ms = median_ms(lambda: comic_composer._wrap_text(text, font, MAX_WIDTH))
+        old_lines = len(wrap_text_bbox(text, font, MAX_WIDTH))
+        new_lines = len(comic_composer._wrap_text(text, font, MAX_WIDTH))
+        print(f"  {length:>6} {old_ms:>10.2f}ms {new_ms:>10.2f}ms {old_ms / max(new_ms, 1e-6):>7.1f}x {old_lines:>4}/{new_lines:<4}")
+
+    # 3. 端到端合成
+    buffer = io.BytesIO()
+    Image.new("RGB", (1024, 1024), (180, 200, 220)).save(buffer, format="PNG")
+    image_base64 = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("utf-8")
+    dialogues = [
+        {"text": (SAMPLE_TEXT * 10)[:300], "speaker": f"角色{i}", "bubble_type": "speech"}
+        for i in range(3)
+    ]
+    # 合成器会打印每个对话框的日志，计时期间屏蔽输出
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        compose_ms = median_ms(lambda: comic_composer.add_dialogue_bubbles(image_base64, dialogues))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    print(f"\n端到端合成（1024x1024，3 条 300 字对话）: {compose_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
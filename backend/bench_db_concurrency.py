@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+数据库并发延迟基准测试
+
+对比两种数据访问方式在并发请求下的延迟：
+1. 旧实现：async 方法内部调用同步 Supabase SDK 的 execute()（阻塞事件循环）
+2. 新实现：SupabaseClient 使用异步 SDK（await execute()）
+
+测试不依赖真实的Supabase，会在本地启动一个模拟 PostgREST 服务，
+每个查询固定延迟 DB_LATENCY 秒。
+
+使用方法:
+    python bench_db_concurrency.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import config
+from app.db.client import SupabaseClient
+
+MOCK_HOST = "127.0.0.1"
+MOCK_PORT = 8765
+DB_LATENCY = 0.1       # 模拟每次数据库往返耗时（秒）
+CONCURRENCY = 20       # 并发请求数
+# 格式合法的伪造JWT，仅用于通过SDK的key格式校验
+FAKE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench"
+
+mock_app = FastAPI()
+
+
+@mock_app.get("/rest/v1/{table}")
+async def mock_select(table: str):
+    """模拟 PostgREST 查询接口"""
+    await asyncio.sleep(DB_LATENCY)
+    return [{"id": 1, "table": table}]
+
+
+def start_mock_server() -> uvicorn.Server:
+    """在后台线程中启动模拟服务"""
+    server = uvicorn.Server(uvicorn.Config(mock_app, host=MOCK_HOST, port=MOCK_PORT, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run_concurrent(select_func) -> dict:
+    """并发执行查询，并统计每个请求从提交到完成的延迟"""
+    latencies = []
+    start = time.perf_counter()
+
+    async def one_request():
+        await select_func("users")
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[one_request() for _ in range(CONCURRENCY)])
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "total": total,
+        "p50": latencies[len(latencies) // 2],
+        "max": latencies[-1]
+    }
+
+
+async def main():
+    start_mock_server()
+    mock_url = f"http://{MOCK_HOST}:{MOCK_PORT}"
+
+    # 旧实现：同步SDK
+    from supabase import create_client
+    sync_client = create_client(mock_url, FAKE_KEY)
+
+    async def blocking_select(table: str):
+        return sync_client.table(table).select("*").execute().data
+
+    # 新实现：异步SDK
+    config.supabase_url = mock_url
+    config.supabase_service_role_key = FAKE_KEY
+    async_client = SupabaseClient()
+    await async_client.connect()
+
+    # 预热连接
+    await blocking_select("users")
+    await async_client.select("users")
+
+    before = await run_concurrent(blocking_select)
+    after = await run_concurrent(async_client.select)
+    await async_client.close()
+
+    print("=" * 60)
+    print(f"📊 并发请求数: {CONCURRENCY}，模拟数据库延迟: {DB_LATENCY * 1000:.0f}ms")
+    print("=" * 60)
+    for name, stats in (("同步SDK（旧）", before), ("异步SDK（新）", after)):
+        print(f"{name}: 总耗时 {stats['total'] * 1000:.0f}ms, "
+              f"p50 {stats['p50'] * 1000:.0f}ms, 最大 {stats['max'] * 1000:.0f}ms")
+    print(f"🚀 加速比: {before['total'] / after['total']:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
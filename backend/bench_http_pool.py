@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+七牛云API连接池基准测试
+
+对比两种HTTP调用方式的单次调用延迟：
+1. 旧实现：每次请求新建 httpx.AsyncClient（重新建立连接、创建SSL上下文）
+2. 新实现：通过 http_client_manager 复用长连接
+
+测试不依赖真实的七牛云API，会在本地启动一个模拟 /chat/completions 服务。
+注意：本地模拟服务为明文HTTP，线上HTTPS还会额外节省TLS握手，实际收益更大。
+
+使用方法:
+    python bench_http_pool.py
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.http_client import http_client_manager
+
+MOCK_HOST = "127.0.0.1"
+MOCK_PORT = 8766
+MOCK_BASE = f"http://{MOCK_HOST}:{MOCK_PORT}/v1"
+CALLS = 200            # 每种方式的调用次数
+
+PAYLOAD = {"model": "mock", "messages": [{"role": "user", "content": "hi"}]}
+
+mock_app = FastAPI()
+
+
+@mock_app.post("/v1/chat/completions")
+async def mock_chat_completions():
+    """模拟 OpenAI 兼容的对话接口"""
+    return {"choices": [{"message": {"content": "{\"ok\": true}"}}]}
+
+
+def start_mock_server() -> uvicorn.Server:
+    """在后台线程中启动模拟服务"""
+    server = uvicorn.Server(uvicorn.Config(mock_app, host=MOCK_HOST, port=MOCK_PORT, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def call_with_fresh_client():
+    """旧实现：每次调用新建客户端"""
+    async with httpx.AsyncClient(timeout=60) as client:
+        r = await client.post(f"{MOCK_BASE}/chat/completions", json=PAYLOAD)
+        return r.json()
+
+
+async def call_with_shared_client():
+    """新实现：复用共享客户端"""
+    client = await http_client_manager.get_client(MOCK_BASE)
+    r = await client.post(f"{MOCK_BASE}/chat/completions", json=PAYLOAD, timeout=60)
+    return r.json()
+
+
+async def measure(call_func) -> list:
+    """顺序调用 CALLS 次，返回每次调用的耗时（毫秒）"""
+    latencies = []
+    for _ in range(CALLS):
+        start = time.perf_counter()
+        await call_func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main():
+    start_mock_server()
+
+    # 预热
+    await call_with_fresh_client()
+    await call_with_shared_client()
+
+    before = await measure(call_with_fresh_client)
+    after = await measure(call_with_shared_client)
+    await http_client_manager.close()
+
+    print("=" * 60)
+    print(f"📊 每种方式调用 {CALLS} 次")
+    print("=" * 60)
+    for name, latencies in (("每次新建客户端（旧）", before), ("共享连接池（新）", after)):
+        print(f"{name}: 平均 {statistics.mean(latencies):.2f}ms, "
+              f"p50 {statistics.median(latencies):.2f}ms, 最大 {max(latencies):.2f}ms")
+    saved = statistics.mean(before) - statistics.mean(after)
+    print(f"🚀 每次调用平均节省: {saved:.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
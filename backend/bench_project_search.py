@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+公开项目分页与搜索基准测试（本地SQLite替身）
+
+用本地SQLite模拟 projects 表，对比 crud 中新旧两种查询方式：
+1. 分页：读取全部公开项目后在Python中切片（旧实现）
+   vs 数据库 LIMIT/OFFSET vs 游标分页（(created_at, project_id) < 上一页最后一行）
+2. 搜索：读取整张表后在Python中做子串匹配（旧实现）
+   vs 数据库中的全文索引（FTS5 trigram，对应Postgres的 pg_trgm 索引，见 sql/project_search.sql）
+
+不依赖Supabase，数据量可以通过命令行参数指定。
+
+使用方法:
+    python bench_project_search.py [项目数量]
+"""
+
+import random
+import sqlite3
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+PROJECT_COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+PAGE_SIZE = 20
+DEEP_PAGE = 500                # 深翻页测试的页码
+ROUNDS = 5
+KEYWORDS = ["修仙传", "末日", "侦探"]
+
+WORDS = ["修仙", "末日", "侦探", "校园", "都市", "武侠", "科幻", "悬疑", "恋爱", "冒险", "宫廷", "重生"]
+
+
+def build_database() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE projects (
+            project_id TEXT PRIMARY KEY, user_id TEXT, title TEXT, description TEXT,
+            visibility TEXT, created_at TEXT
+        )
+    """)
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+    rows = []
+    for i in range(PROJECT_COUNT):
+        title = rng.choice(WORDS) + rng.choice(WORDS) + ("传" if rng.random() < 0.2 else "录")
+        description = "一部关于" + "、".join(rng.sample(WORDS, 3)) + "的小说改编项目"
+        rows.append((
+            str(uuid.UUID(int=rng.getrandbits(128))), f"user{i % 500}", title, description,
+            "public" if rng.random() < 0.7 else "private",
+            (start + timedelta(seconds=rng.randrange(300 * 24 * 3600))).isoformat()
+        ))
+    conn.executemany("INSERT INTO projects VALUES (?, ?, ?, ?, ?, ?)", rows)
+    # 与 sql/project_search.sql 对应的索引
+    conn.execute("CREATE INDEX idx_public_created ON projects (visibility, created_at DESC, project_id DESC)")
+    conn.execute("CREATE VIRTUAL TABLE projects_fts USING fts5(title, description, content='projects', tokenize='trigram')")
+    conn.execute("INSERT INTO projects_fts (rowid, title, description) SELECT rowid, title, description FROM projects")
+    return conn
+
+
+def median_ms(fn) -> float:
+    samples = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    print(f"构建 {PROJECT_COUNT} 个项目的本地数据库...")
+    conn = build_database()
+    offset = DEEP_PAGE * PAGE_SIZE
+
+    # 1. 分页
+    def page_python_slice():
+        rows = conn.execute("SELECT * FROM projects WHERE visibility = 'public'").fetchall()
+        rows.sort(key=lambda row: (row[5], row[0]), reverse=True)
+        return rows[offset:offset + PAGE_SIZE]
+
+    def page_db_offset():
+        return conn.execute(
+            "SELECT * FROM projects WHERE visibility = 'public' "
+            "ORDER BY created_at DESC, project_id DESC LIMIT ? OFFSET ?",
+            (PAGE_SIZE, offset)
+        ).fetchall()
+
+    last = page_db_offset()[0]
+
+    def page_db_keyset():
+        return conn.execute(
+            "SELECT * FROM projects WHERE visibility = 'public' AND (created_at, project_id) < (?, ?) "
+            "ORDER BY created_at DESC, project_id DESC LIMIT ?",
+            (last[5], last[0], PAGE_SIZE)
+        ).fetchall()
+
+    assert [row[0] for row in page_python_slice()] == [row[0] for row in page_db_offset()]
+    print(f"\n分页（第 {DEEP_PAGE} 页，每页 {PAGE_SIZE} 个，中位数）:")
+    print(f"  读取全部后切片: {median_ms(page_python_slice):8.2f} ms")
+    print(f"  数据库OFFSET:   {median_ms(page_db_offset):8.2f} ms")
+    print(f"  游标分页:       {median_ms(page_db_keyset):8.2f} ms")
+
+    # 2. 搜索
+    print(f"\n搜索（前 {PAGE_SIZE} 个结果，中位数）:")
+    for keyword in KEYWORDS:
+        def search_python_scan():
+            rows = conn.execute("SELECT * FROM projects").fetchall()
+            matched = [
+                row for row in rows
+                if (keyword in row[2] or keyword in row[3]) and row[4] == "public"
+            ]
+            return matched[:PAGE_SIZE]
+
+        def search_db_index():
+            # trigram 索引要求关键词至少3个字符，更短的关键词退化为数据库中的 LIKE 扫描
+            if len(keyword) >= 3:
+                return conn.execute(
+                    "SELECT p.* FROM projects_fts f JOIN projects p ON p.rowid = f.rowid "
+                    "WHERE projects_fts MATCH ? AND p.visibility = 'public' LIMIT ?",
+                    (f'"{keyword}"', PAGE_SIZE)
+                ).fetchall()
+            return conn.execute(
+                "SELECT * FROM projects WHERE visibility = 'public' "
+                "AND (title LIKE ? OR description LIKE ?) LIMIT ?",
+                (f"%{keyword}%", f"%{keyword}%", PAGE_SIZE)
+            ).fetchall()
+
+        print(f"  {keyword:<6} 读取整表后匹配: {median_ms(search_python_scan):8.2f} ms   "
+              f"数据库索引: {median_ms(search_db_index):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+S3存储后端冒烟测试（本地MinIO）
+
+用 object_storage.S3Storage 对一个临时存储桶依次执行：
+1. write：上传一张按内容寻址的小图片，记录耗时
+2. exists：刚上传的对象存在，没有上传过的对象不存在
+3. url_for：生成的公开URL以 "{endpoint}/{bucket}/" 开头
+4. delete：删除后 exists 返回 False（删除不存在的对象不报错）
+结束后删除临时存储桶。
+
+没有安装 boto3 或连不上MinIO时跳过（退出码 0），断言失败时退出码为 1。
+
+本地启动MinIO:
+    docker run -p 9000:9000 -e MINIO_ROOT_USER=minioadmin -e MINIO_ROOT_PASSWORD=minioadmin minio/minio server /data
+
+使用方法:
+    python bench_s3_storage.py [endpoint_url]
+环境变量 S3_ACCESS_KEY / S3_SECRET_KEY / S3_REGION 可覆盖默认的MinIO凭证和区域。
+"""
+
+import hashlib
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINT_URL = sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:9000"
+ACCESS_KEY = os.environ.get("S3_ACCESS_KEY", "minioadmin")
+SECRET_KEY = os.environ.get("S3_SECRET_KEY", "minioadmin")
+REGION = os.environ.get("S3_REGION", "us-east-1")
+BUCKET = f"smoke-{uuid.uuid4().hex[:12]}"
+
+# 1x1 透明PNG
+PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)
+
+
+def skip(reason: str):
+    print(f"⏭️  跳过: {reason}")
+    sys.exit(0)
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        print(f"❌ {message}")
+        sys.exit(1)
+    print(f"✅ {message}")
+
+
+def main():
+    try:
+        import boto3  # noqa: F401
+        from botocore.exceptions import BotoCoreError, EndpointConnectionError
+    except ImportError:
+        skip("未安装 boto3（pip install boto3）")
+
+    from app.services.object_storage import S3Storage
+
+    storage = S3Storage(
+        bucket=BUCKET,
+        endpoint_url=ENDPOINT_URL,
+        access_key=ACCESS_KEY,
+        secret_key=SECRET_KEY,
+        region=REGION
+    )
+    try:
+        # 第一次调用时检查并创建存储桶
+        client = storage._get_client()
+    except (EndpointConnectionError, BotoCoreError) as e:
+        skip(f"无法连接 {ENDPOINT_URL}: {e}")
+
+    digest = hashlib.sha256(PNG_BYTES).hexdigest()
+    key = f"{digest[:2]}/{digest}.png"
+    missing_key = f"00/{uuid.uuid4().hex}.png"
+    print(f"存储桶: {BUCKET}  服务地址: {ENDPOINT_URL}\n")
+
+    try:
+        started = time.perf_counter()
+        storage.write(key, PNG_BYTES)
+        print(f"   write: {(time.perf_counter() - started) * 1000:.1f} ms")
+        started = time.perf_counter()
+        found = storage.exists(key)
+        print(f"   exists: {(time.perf_counter() - started) * 1000:.1f} ms")
+        check(found, "write 后 exists 返回 True")
+        check(not storage.exists(missing_key), "没有上传过的对象 exists 返回 False")
+
+        head = client.head_object(Bucket=BUCKET, Key=key)
+        check(head["ContentType"] == "image/png", f"ContentType 为 image/png（{head['ContentType']}）")
+
+        url = storage.url_for(key)
+        check(url == f"{ENDPOINT_URL.rstrip('/')}/{BUCKET}/{key}", f"url_for: {url}")
+
+        storage.delete(key)
+        check(not storage.exists(key), "delete 后 exists 返回 False")
+        storage.delete(missing_key)
+        check(True, "删除不存在的对象不报错")
+    finally:
+        for obj in client.list_objects_v2(Bucket=BUCKET).get("Contents", []):
+            client.delete_object(Bucket=BUCKET, Key=obj["Key"])
+        client.delete_bucket(Bucket=BUCKET)
+
+    print("\n🎉 S3存储后端冒烟测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,45 @@ class Config:
         self.max_tokens: int = 4096
         self.temperature: float = 0.2
         self.timeout: int = 60
+        # 模型上下文窗口（token），以及分镜JSON输出量的估计值（每个原文字符产生的输出token数）
+        # 分段大小按这两项和 max_tokens 计算，保证提示词 + 预期输出不超出模型限制
+        self.context_window: int = 131072
+        self.output_tokens_per_char: float = 3.0
+        # 长文本分段并发生成分镜时的最大并发数
+        self.segment_concurrency: int = 4
+        # 长文本分段是否让AI判断没有段落边界的歧义切分点（默认只用本地分段）
+        self.segment_llm_refine: bool = False
+        # 分镜生成是否使用流式输出（边生成边保存分镜）
+        self.llm_stream: bool = True
+        # 批量生成分镜配图时的最大并发数，以及单张图片的超时时间（秒，需大于主、备用接入点两次请求的总时长 2*180）
+        self.image_concurrency: int = 4
+        self.image_scene_timeout: int = 420
+        # 图片渲染（对话框合成）进程池：子进程数（0 表示在线程中执行）、最大排队数、队列满时的最长等待时间（秒）
+        self.render_workers: int = 2
+        self.render_queue_size: int = 16
+        self.render_queue_timeout: float = 30
+        # 配图存储：按内容寻址的图片引用表（SQLite文件路径，相对backend目录）
+        self.image_store_path: str = "image_store.db"
+        # 配图文件存储后端：local（backend/layout，单节点）或 s3（S3兼容对象存储，如MinIO，多节点共用）
+        # public_base_url 是本服务对外的访问地址，local 后端的图片URL为 "{public_base_url}/layout/..."
+        self.storage_backend: str = "local"
+        self.public_base_url: str = "http://127.0.0.1:8000"
+        self.s3_endpoint_url: Optional[str] = None
+        self.s3_bucket: Optional[str] = None
+        self.s3_access_key: Optional[str] = None
+        self.s3_secret_key: Optional[str] = None
+        self.s3_region: str = "us-east-1"
+        # 图片的公开访问URL前缀（如CDN域名），为空时使用 "{s3_endpoint_url}/{s3_bucket}"
+        self.s3_public_url: Optional[str] = None
+        # 持久化任务队列：SQLite文件路径（相对backend目录）、API进程内嵌的worker数、最大执行次数
+        self.job_queue_path: str = "jobs.db"
+        self.queue_workers: int = 2
+        self.queue_max_attempts: int = 3
+        # 分镜生成结果缓存：是否启用、SQLite文件路径、过期时间（秒）、最大条目数（超出后淘汰最久未使用的）
+        self.llm_cache_enabled: bool = True
+        self.llm_cache_path: str = "llm_cache.db"
+        self.llm_cache_ttl: int = 7 * 24 * 3600
+        self.llm_cache_max_entries: int = 5000
         
         # Supabase配置
         self.supabase_url: Optional[str] = None
@@ -42,6 +81,35 @@ class Config:
                     self.max_tokens = config_data.get('max_tokens', self.max_tokens)
                     self.temperature = config_data.get('temperature', self.temperature)
                     self.timeout = config_data.get('timeout', self.timeout)
+                    self.context_window = config_data.get('context_window', self.context_window)
+                    self.output_tokens_per_char = config_data.get('output_tokens_per_char', self.output_tokens_per_char)
+                    self.segment_concurrency = config_data.get('segment_concurrency', self.segment_concurrency)
+                    self.segment_llm_refine = config_data.get('segment_llm_refine', self.segment_llm_refine)
+                    self.llm_stream = config_data.get('llm_stream', self.llm_stream)
+                    self.image_concurrency = config_data.get('image_concurrency', self.image_concurrency)
+                    self.image_scene_timeout = config_data.get('image_scene_timeout', self.image_scene_timeout)
+                    self.render_workers = config_data.get('render_workers', self.render_workers)
+                    self.render_queue_size = config_data.get('render_queue_size', self.render_queue_size)
+                    self.render_queue_timeout = config_data.get('render_queue_timeout', self.render_queue_timeout)
+                    self.image_store_path = config_data.get('image_store_path', self.image_store_path)
+                    self.job_queue_path = config_data.get('job_queue_path', self.job_queue_path)
+                    self.queue_workers = config_data.get('queue_workers', self.queue_workers)
+                    self.queue_max_attempts = config_data.get('queue_max_attempts', self.queue_max_attempts)
+                    self.llm_cache_enabled = config_data.get('llm_cache_enabled', self.llm_cache_enabled)
+                    self.llm_cache_path = config_data.get('llm_cache_path', self.llm_cache_path)
+                    self.llm_cache_ttl = config_data.get('llm_cache_ttl', self.llm_cache_ttl)
+                    self.llm_cache_max_entries = config_data.get('llm_cache_max_entries', self.llm_cache_max_entries)
+                    
+                    # 加载配图存储配置
+                    storage_config = config_data.get('storage', {})
+                    self.storage_backend = storage_config.get('backend', self.storage_backend)
+                    self.public_base_url = storage_config.get('public_base_url', self.public_base_url)
+                    self.s3_endpoint_url = storage_config.get('s3_endpoint_url')
+                    self.s3_bucket = storage_config.get('s3_bucket')
+                    self.s3_access_key = storage_config.get('s3_access_key')
+                    self.s3_secret_key = storage_config.get('s3_secret_key')
+                    self.s3_region = storage_config.get('s3_region', self.s3_region)
+                    self.s3_public_url = storage_config.get('s3_public_url')
                     
                     # 加载Supabase配置
                     supabase_config = config_data.get('supabase', {})
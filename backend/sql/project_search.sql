@@ -0,0 +1,34 @@
+-- ----------------------------
+-- 公开项目列表与搜索的索引
+--
+-- crud.get_public_projects_page 在数据库中完成过滤、排序和分页：
+--   - 列表：visibility = 'public' ORDER BY created_at DESC NULLS LAST, project_id DESC，
+--     翻页使用游标条件 (created_at, project_id) < (上一页最后一行)，不再读取前面所有行；
+--     排序列为空的项目排在最后（索引必须使用相同的 NULLS LAST 顺序才能用于排序）
+--   - 搜索：title / description ILIKE '%关键词%'，由 pg_trgm 的 GIN 索引加速
+--     （少于3个字符的关键词无法使用三元组索引，仍然在数据库中过滤，但需要扫描）
+-- 在 Supabase 的 SQL Editor 中执行一次即可（可重复执行）
+-- ----------------------------
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 公开项目列表与游标分页（每种排序方式一个部分索引）
+CREATE INDEX IF NOT EXISTS idx_projects_public_created_nulls_last
+    ON "public"."projects" (created_at DESC NULLS LAST, project_id DESC)
+    WHERE visibility = 'public';
+CREATE INDEX IF NOT EXISTS idx_projects_public_updated_nulls_last
+    ON "public"."projects" (updated_at DESC NULLS LAST, project_id DESC)
+    WHERE visibility = 'public';
+CREATE INDEX IF NOT EXISTS idx_projects_public_title
+    ON "public"."projects" (title ASC NULLS LAST, project_id)
+    WHERE visibility = 'public';
+
+-- 按用户查看公开项目
+CREATE INDEX IF NOT EXISTS idx_projects_user_created
+    ON "public"."projects" (user_id, created_at DESC);
+
+-- 标题/描述的包含搜索
+CREATE INDEX IF NOT EXISTS idx_projects_title_trgm
+    ON "public"."projects" USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_projects_description_trgm
+    ON "public"."projects" USING gin (description gin_trgm_ops);
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+持久化任务队列的独立worker进程
+
+从任务队列（config.job_queue_path）中领取解析、批量配图任务并执行，
+可以同时启动多个进程来提高解析吞吐量。进程退出或崩溃后，
+执行中的任务会在租约过期后被其他worker重新执行。
+
+使用方法:
+    python worker.py                 # 默认并发数 2
+    python worker.py --concurrency 4
+
+如果只使用独立worker，可以在 config.json 中设置 "queue_workers": 0，
+关闭API进程内嵌的执行器。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import config
+from app.db import init_database, close_database
+from app.services.http_client import http_client_manager
+from app.services.job_queue import job_queue, JobWorker
+from app.api.storyboard import JOB_HANDLERS
+
+
+async def main(concurrency: int):
+    if not config.is_valid():
+        print(config.get_error_message())
+        sys.exit(1)
+
+    if not await init_database():
+        print("❌ 数据库初始化失败，worker退出")
+        sys.exit(1)
+    await http_client_manager.startup()
+
+    worker = JobWorker(job_queue, JOB_HANDLERS, concurrency=concurrency)
+    print(f"📦 任务队列: {job_queue.db_path}")
+    try:
+        await worker.run_forever()
+    finally:
+        await worker.stop()
+        await http_client_manager.close()
+        await close_database()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="持久化任务队列worker")
+    parser.add_argument("--concurrency", type=int, default=2, help="同时执行的任务数")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.concurrency))
+    except KeyboardInterrupt:
+        print("🛑 worker已停止")